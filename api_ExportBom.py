@@ -1,54 +1,89 @@
-import requests
-import pandas as pd
-from io import BytesIO
+import asyncio
+import csv
+import io
+import itertools
+import json
+import sqlite3
 import time
+from collections import deque
 
-def get_token(client_id, client_secret):
-    token_url = "https://ebusinesscloud.eu.auth0.com/oauth/token"
-    payload = {
-        "grant_type": "client_credentials",
-        "client_name": "API USER",
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "audience": "https://ebusinesscloud.eu.auth0.com/api/v2/",
-        "domain": "https://ebusinesscloud.eu.auth0.com"
-    }
-    headers = {"Content-Type": "application/json"}
-    resp = requests.post(token_url, json=payload, headers=headers)
-    resp.raise_for_status()
-    return resp.json()["access_token"]
+import numpy as np
+import pandas as pd
 
-def get_project_segment_item(access_token, manufacturer_id, segment_item_id):
-    url = f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/projectSegmentItems/{segment_item_id}"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(url, headers=headers)
-    resp.raise_for_status()
-    return resp.json()
+import api_bomcache
+import api_config
+from api_client import HiveClient
+from api_async import AsyncHiveClient, iter_async
+from api_bomsnapshot import content_hash, decode_rows, is_frozen, snapshot_store
+from api_excel import StreamingExcelWriter
+from api_selection import resolve_segment_item_ids
 
-def get_bom_json(access_token, manufacturer_id, configuration_id):
-    url = (
-        f"https://connect.hivecpq.com/api/v1/manufacturers/"
-        f"{manufacturer_id}/configurations/{configuration_id}"
-        f"?outputMode=BOM_ONLY&language=en"
-    )
-    headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(url, headers=headers)
+BOM_COLUMNS = [
+    "ProjectSegmentItemId", "ProjectSegmentItemName", "Level", "Parent", "Project", "Component", "ItemType",
+    "Aantal", "Unit", "ListPrice", "PurchasePrice"
+]
+
+# Kolommen die per configuratie in de snapshot-store bewaard worden; ID en
+# naam van het segment item worden bij het teruglezen ingevuld
+SNAPSHOT_COLUMNS = BOM_COLUMNS[2:]
+
+# Kolommen van de rijen die bom_rollup nodig heeft, en van het resultaat
+ROLLUP_INPUT_COLUMNS = ["Level", "Component", "Unit", "Aantal", "ListPrice", "PurchasePrice"]
+ROLLUP_COLUMNS = ["Component", "Unit", "Aantal", "ListPrice", "PurchasePrice", "Regels"]
+
+def get_project_segment_item(client, segment_item_id):
+    resp = client.get(f"projectSegmentItems/{segment_item_id}")
     resp.raise_for_status()
     return resp.json()
 
+def get_bom_body(client, configuration_id, language="en", fresh_since=None):
+    """
+    BOM_ONLY-output van een configuratie als ruwe JSON-bytes; via
+    api_bomcache (cache-entries van voor `fresh_since` tellen niet).
+    """
+    def fetch():
+        resp = client.get(
+            f"configurations/{configuration_id}",
+            params={"outputMode": "BOM_ONLY", "language": language}
+        )
+        resp.raise_for_status()
+        return resp.content
+
+    key = api_bomcache.cache_key(client, configuration_id, language)
+    return api_bomcache.fetch_cached(key, fetch, fresh_since)
+
+def get_bom_json(client, configuration_id, language="en", refresh=False):
+    """Geparste BOM_ONLY-output; met `refresh` altijd vers van de API."""
+    fresh_since = time.time() if refresh else None
+    return json.loads(get_bom_body(client, configuration_id, language, fresh_since))
+
+_END = object()
+
 def format_price(val):
     if val is None:
         return "0,00"
     val = float(val)
     return f"{val:.2f}".replace('.', ',')
 
-def has_bomitem_descendants(node):
-    for sub in node.get("nodes", []):
-        if sub["type"] == "BOM_ITEM":
-            return True
-        if has_bomitem_descendants(sub):
-            return True
-    return False
+def bomitem_descendant_flags(node):
+    """
+    id(subnode) -> True als er ergens onder die subnode een BOM_ITEM zit,
+    voor alle nodes onder `node`. Eén post-order pass met een expliciete
+    stack: elke node wordt één keer bekeken, ongeacht de diepte.
+    """
+    flags = {}
+    stack = [(node, False)]
+    while stack:
+        current, children_done = stack.pop()
+        children = current.get("nodes", [])
+        if children_done:
+            flags[id(current)] = any(
+                sub["type"] == "BOM_ITEM" or flags[id(sub)] for sub in children
+            )
+        else:
+            stack.append((current, True))
+            stack.extend((sub, False) for sub in children)
+    return flags
 
 def bom_label_for_level(level):
     if level == 1:
@@ -60,10 +95,23 @@ def bom_label_for_level(level):
     else:
         return "SUB_" * (level - 2) + "BOM"
 
-def traverse(node, parent, level, project_code, projectsegmentitem_id, projectsegmentitem_name, rows):
-    for subnode in node.get("nodes", []):
+def traverse(node, parent, level, project_code, projectsegmentitem_id, projectsegmentitem_name):
+    """
+    Yieldt een rij voor elk BOM_ITEM onder `node`, depth-first in
+    documentvolgorde. Iteratief (geen recursielimiet bij diepe BOMs); of
+    een BOM_ITEM zelf BOM_ITEMs bevat komt uit bomitem_descendant_flags.
+    """
+    has_descendants = bomitem_descendant_flags(node)
+    # Per niveau: (iterator over de subnodes, parent-code, level)
+    stack = [(iter(node.get("nodes", [])), parent, level)]
+    while stack:
+        subnodes, parent, level = stack[-1]
+        subnode = next(subnodes, _END)
+        if subnode is _END:
+            stack.pop()
+            continue
         if subnode["type"] == "BOM_ITEM":
-            if has_bomitem_descendants(subnode):
+            if has_descendants[id(subnode)]:
                 item_type = bom_label_for_level(level)
             else:
                 item_type = "Component"
@@ -73,7 +121,7 @@ def traverse(node, parent, level, project_code, projectsegmentitem_id, projectse
             price = subnode.get("price", {}) or {}
             list_price = format_price(price.get("listPrice", 0))
             purchase_price = format_price(price.get("purchasePrice", 0))
-            rows.append({
+            yield {
                 "ProjectSegmentItemId": projectsegmentitem_id,
                 "ProjectSegmentItemName": projectsegmentitem_name,
                 "Level": level,
@@ -85,17 +133,18 @@ def traverse(node, parent, level, project_code, projectsegmentitem_id, projectse
                 "Unit": subnode.get("unit", ""),
                 "ListPrice": list_price,
                 "PurchasePrice": purchase_price,
-            })
-            traverse(subnode, subnode.get("componentCode", ""), level + 1, project_code, projectsegmentitem_id, projectsegmentitem_name, rows)
+            }
+            stack.append((iter(subnode.get("nodes", [])), subnode.get("componentCode", ""), level + 1))
         else:
-            traverse(subnode, parent, level, project_code, projectsegmentitem_id, projectsegmentitem_name, rows)
+            stack.append((iter(subnode.get("nodes", [])), parent, level))
 
-def bom_json_to_rows(data, projectsegmentitem_id, projectsegmentitem_name):
+def iter_bom_rows(data, projectsegmentitem_id, projectsegmentitem_name):
+    """Yieldt de rijen van één BOM: eerst de projectregel, dan de BOM_ITEMs."""
     project_code = data["configuredProduct"]["code"]
     configuration_code = data.get("configurationCode", "")
     project_display = f"{project_code} : {configuration_code}" if configuration_code else project_code
 
-    rows = [{
+    yield {
         "ProjectSegmentItemId": projectsegmentitem_id,
         "ProjectSegmentItemName": projectsegmentitem_name,
         "Level": 0,
@@ -107,53 +156,261 @@ def bom_json_to_rows(data, projectsegmentitem_id, projectsegmentitem_name):
         "Unit": "",
         "ListPrice": "",
         "PurchasePrice": "",
-    }]
+    }
 
     for node in data.get("nodes", []):
-        traverse(node, project_code, 1, project_code, projectsegmentitem_id, projectsegmentitem_name, rows)
-    return rows
+        yield from traverse(node, project_code, 1, project_code, projectsegmentitem_id, projectsegmentitem_name)
+
+def bom_json_to_rows(data, projectsegmentitem_id, projectsegmentitem_name):
+    return list(iter_bom_rows(data, projectsegmentitem_id, projectsegmentitem_name))
+
+def _to_number(values, default):
+    """Kolom met getallen of "12,34"-prijzen -> floats; leeg/ongeldig -> default."""
+    text = values.astype(str).str.replace(",", ".", regex=False)
+    return pd.to_numeric(text, errors="coerce").fillna(default).to_numpy(dtype=float)
+
+def bom_rollup(frame):
+    """
+    Totale (exploded) aantallen per Component en Unit over alle BOMs in
+    `frame` (rijen zoals uit iter_bom_rows, minstens ROLLUP_INPUT_COLUMNS,
+    in exportvolgorde). Het aantal van een BOM_ITEM wordt vermenigvuldigd
+    met de aantallen van alle BOM_ITEMs erboven; ListPrice en PurchasePrice
+    zijn prijzen per stuk en worden met dat totaal vermenigvuldigd. Een
+    BOM_ITEM zonder aantal telt als 1.
+
+    Volledig met arrays: de rijen staan in pre-order, dus de parent van een
+    rij op level L is de laatste rij op level L-1 ervoor. Per level wordt
+    die positie met een forward fill gevonden en het cumulatieve aantal
+    van de parent overgenomen, daarna één groupby.
+    """
+    level = pd.to_numeric(frame["Level"], errors="coerce").to_numpy(dtype=float)
+    quantity = _to_number(frame["Aantal"], 1.0)
+    positions = np.arange(len(frame), dtype=float)
+
+    exploded = quantity.copy()
+    max_level = int(np.nanmax(level)) if len(level) and not np.isnan(level).all() else 0
+    for current in range(2, max_level + 1):
+        at_level = level == current
+        last_parent = pd.Series(np.where(level == current - 1, positions, np.nan)).ffill().to_numpy()
+        exploded[at_level] = quantity[at_level] * exploded[last_parent[at_level].astype(int)]
+
+    # Projectregels (level 0) en FOUT-regels (geen level) tellen niet mee
+    items = level >= 1
+    rollup = pd.DataFrame({
+        "Component": frame["Component"].to_numpy()[items],
+        "Unit": frame["Unit"].to_numpy()[items],
+        "Aantal": exploded[items],
+        "ListPrice": exploded[items] * _to_number(frame["ListPrice"], 0.0)[items],
+        "PurchasePrice": exploded[items] * _to_number(frame["PurchasePrice"], 0.0)[items],
+    })
+    rollup = rollup.groupby(["Component", "Unit"], as_index=False).agg(
+        Aantal=("Aantal", "sum"),
+        ListPrice=("ListPrice", "sum"),
+        PurchasePrice=("PurchasePrice", "sum"),
+        Regels=("Aantal", "size"),
+    )
+    rollup["ListPrice"] = rollup["ListPrice"].map(format_price)
+    rollup["PurchasePrice"] = rollup["PurchasePrice"].map(format_price)
+    return rollup[ROLLUP_COLUMNS]
+
+def error_row(segment_item_id, ex):
+    """Foutregel voor een ID waarvan de BOM niet opgehaald kon worden."""
+    row = {column: "" for column in BOM_COLUMNS}
+    row["ProjectSegmentItemId"] = segment_item_id
+    row["ProjectSegmentItemName"] = f"FOUT: {ex}"
+    return row
+
+async def iter_bom_results_async(client, segment_item_ids, concurrency=None, use_snapshots=True, refresh=False):
+    """
+    BOM-pipeline per ProjectSegmentItemId:
+      1. item ophalen -> configuration ID (max. `concurrency` tegelijk)
+      2. configurations/{id}?outputMode=BOM_ONLY ophalen (max. `concurrency` tegelijk)
+    Terwijl stap 2 van het ene ID loopt, zit het volgende al in stap 1.
+    Hoogstens 4 x concurrency IDs zijn tegelijk onderweg; van elk wordt
+    enkel de ruwe response (bytes) bijgehouden. Het platslaan gebeurt bij
+    de consument (iter_bom_export_rows), één BOM tegelijk.
+
+    Is de configuratie bevroren (api_bomsnapshot.is_frozen) en staat er een
+    snapshot van in de store, dan wordt stap 2 overgeslagen (tenzij
+    `use_snapshots` False is). Met `refresh` of zonder `use_snapshots`
+    komt geen BOM uit de api_bomcache van voor deze batch, en een BOM die
+    als snapshot bewaard wordt nooit; binnen de batch wordt elke
+    configuratie wel maar één keer opgehaald.
 
-def export_bom_to_excel(manufacturer_id, client_id, client_secret, segment_item_ids):
+    Yieldt (segment_item_id, resultaat of exception) in de volgorde van de
+    IDs; resultaat = (naam, configuration ID, bevroren, body, snapshot),
+    met ofwel body ofwel snapshot (gecomprimeerde rijen) ingevuld.
+    """
+    concurrency = concurrency or api_config.MAX_IN_FLIGHT
+    started = time.time()
+    store = snapshot_store()
+    aclient = AsyncHiveClient(client)
+    resolve_limit = asyncio.Semaphore(concurrency)
+    fetch_limit = asyncio.Semaphore(concurrency)
+
+    async def process(segment_item_id):
+        try:
+            async with resolve_limit:
+                project_segment_item = await aclient.run(get_project_segment_item, client, segment_item_id)
+            config_id = project_segment_item["configuration"]["id"]
+            name = project_segment_item.get("name", "")
+            frozen = store is not None and is_frozen(project_segment_item)
+            if frozen and use_snapshots:
+                try:
+                    snapshot = await asyncio.to_thread(store.latest, client.manufacturer_id, config_id)
+                except sqlite3.Error as e:
+                    # Een onleesbare store mag de export niet laten mislukken: dan ophalen
+                    print(f"[⚠️ snapshot] {config_id} niet gelezen uit de snapshot-store ({e}), BOM wordt opgehaald")
+                    snapshot = None
+                if snapshot:
+                    return name, config_id, frozen, None, snapshot[2]
+            # Een snapshot moet de BOM zijn zoals hij nu in HiveCPQ staat
+            fresh_since = started if frozen or refresh or not use_snapshots else None
+            async with fetch_limit:
+                body = await aclient.run(get_bom_body, client, config_id, "en", fresh_since)
+            return name, config_id, frozen, body, None
+        except Exception as e:
+            return e
+
+    ids = iter(segment_item_ids)
+    pending = deque()
+
+    def schedule():
+        for segment_item_id in ids:
+            pending.append((segment_item_id, asyncio.ensure_future(process(segment_item_id))))
+            return
+
+    for _ in range(4 * concurrency):
+        schedule()
+    try:
+        while pending:
+            segment_item_id, task = pending.popleft()
+            result = await task
+            schedule()
+            yield segment_item_id, result
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+def iter_bom_results(client, segment_item_ids, concurrency=None, use_snapshots=True, refresh=False):
+    """Sync versie van iter_bom_results_async (voor de Excel-writer)."""
+    return iter_async(iter_bom_results_async(client, segment_item_ids, concurrency, use_snapshots, refresh))
+
+def iter_snapshot_rows(snapshot, projectsegmentitem_id, projectsegmentitem_name):
+    """Rijen uit een snapshot (zie iter_bom_results_async), met ID en naam van dit item."""
+    for values in decode_rows(snapshot):
+        row = {"ProjectSegmentItemId": projectsegmentitem_id, "ProjectSegmentItemName": projectsegmentitem_name}
+        row.update(zip(SNAPSHOT_COLUMNS, values))
+        yield row
+
+def save_snapshot(client, configuration_id, body, rows):
+    """Bewaart de rijen van een bevroren configuratie in de snapshot-store."""
+    values = [[row[column] for column in SNAPSHOT_COLUMNS] for row in rows]
+    try:
+        snapshot_store().save(client.manufacturer_id, configuration_id, content_hash(body), values)
+    except sqlite3.Error:
+        # Een volle of vergrendelde store mag de export niet laten mislukken
+        pass
+
+def iter_bom_export_rows(client, segment_item_ids, concurrency=None, use_snapshots=True, refresh=False):
+    """
+    Yieldt alle BOM-rijen van de IDs, in inputvolgorde. Elke BOM wordt pas
+    geparsed wanneer hij aan de beurt is en is weer vrij zodra zijn laatste
+    rij weggeschreven is: het geheugen groeit met één configuratie, niet
+    met de hele batch. Een mislukt ID geeft een FOUT-regel; loopt het
+    platslaan halverwege vast, dan volgt die na de rijen die al weg zijn.
+    Bevroren configuraties komen uit de snapshot-store of worden er na het
+    ophalen in bewaard.
+    """
+    for segment_item_id, result in iter_bom_results(client, segment_item_ids, concurrency, use_snapshots,
+                                                    refresh):
+        if isinstance(result, Exception):
+            # Voeg een foutmelding toe voor deze ID
+            yield error_row(segment_item_id, result)
+            continue
+        name, configuration_id, frozen, body, snapshot = result
+        try:
+            if snapshot is not None:
+                yield from iter_snapshot_rows(snapshot, segment_item_id, name)
+            elif frozen:
+                rows = bom_json_to_rows(json.loads(body), segment_item_id, name)
+                save_snapshot(client, configuration_id, body, rows)
+                yield from rows
+            else:
+                yield from iter_bom_rows(json.loads(body), segment_item_id, name)
+        except Exception as e:
+            yield error_row(segment_item_id, e)
+
+def iter_bom_csv(manufacturer_id, client_id, client_secret, segment_item_ids, concurrency=None, chunk_rows=1000,
+                 use_snapshots=True, refresh=False):
+    """
+    Zelfde rijen als export_bom_to_excel, als CSV-tekstblokken van
+    `chunk_rows` rijen (het eerste blok begint met de header).
+    """
+    if isinstance(segment_item_ids, str):
+        segment_item_ids = [segment_item_ids]
+    client = HiveClient(manufacturer_id, client_id, client_secret)
+    client.token()
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=BOM_COLUMNS)
+    writer.writeheader()
+    rows_in_chunk = 0
+    for row in iter_bom_export_rows(client, segment_item_ids, concurrency, use_snapshots, refresh):
+        writer.writerow(row)
+        rows_in_chunk += 1
+        if rows_in_chunk >= chunk_rows:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+            rows_in_chunk = 0
+    yield output.getvalue()
+
+def write_bom_excel(rows, rollup=False):
+    """
+    Schrijft BOM-rijen naar een Excel (tabblad "Sheet1"). Met `rollup`
+    volgt een tabblad "Rollup" met de totale aantallen en prijzen per
+    component over de hele batch (zie bom_rollup).
+    Geeft het bestandsobject terug, of None als er geen rijen waren.
+    """
+    writer = StreamingExcelWriter()
+    writer.add_sheet("Sheet1", BOM_COLUMNS)
+    row_count = 0
+    # Voor de rollup enkel de nodige kolommen bijhouden
+    rollup_input = []
+    for row in rows:
+        writer.append("Sheet1", row)
+        row_count += 1
+        if rollup:
+            rollup_input.append(tuple(row[column] for column in ROLLUP_INPUT_COLUMNS))
+
+    if not row_count:
+        return None
+    if rollup:
+        writer.add_sheet("Rollup", ROLLUP_COLUMNS)
+        frame = pd.DataFrame(rollup_input, columns=ROLLUP_INPUT_COLUMNS)
+        writer.extend("Rollup", bom_rollup(frame).to_dict("records"))
+    return writer.close()
+
+def export_bom_to_excel(manufacturer_id, client_id, client_secret, segment_item_ids, concurrency=None,
+                        rollup=False, use_snapshots=True, refresh=False):
+    """
+    Alle BOMs van de IDs in één Excel (zie write_bom_excel). Met
+    `use_snapshots` False worden ook bevroren configuraties opnieuw opgehaald,
+    met `refresh` komt niets uit de BOM-cache van voor deze export.
+    Retourneert (bestandsobject, bestandsnaam, None) of (None, None, fout).
+    """
     try:
         # Maak van string een lijst
         if isinstance(segment_item_ids, str):
             segment_item_ids = [segment_item_ids]
 
-        access_token = get_token(client_id, client_secret)
-        all_rows = []
-
-        for segment_item_id in segment_item_ids:
-            try:
-                project_segment_item = get_project_segment_item(access_token, manufacturer_id, segment_item_id)
-                config_id = project_segment_item["configuration"]["id"]
-                name = project_segment_item.get("name", "")
-                bom_data = get_bom_json(access_token, manufacturer_id, config_id)
-                all_rows.extend(bom_json_to_rows(bom_data, segment_item_id, name))
-                time.sleep(0.3)  # kleine delay om throttling te voorkomen
-            except Exception as ex:
-                # Voeg een foutmelding toe voor deze ID
-                all_rows.append({
-                    "ProjectSegmentItemId": segment_item_id,
-                    "ProjectSegmentItemName": f"FOUT: {ex}",
-                    "Level": "",
-                    "Parent": "",
-                    "Project": "",
-                    "Component": "",
-                    "ItemType": "",
-                    "Aantal": "",
-                    "Unit": "",
-                    "ListPrice": "",
-                    "PurchasePrice": "",
-                })
-
-        if all_rows:
-            df = pd.DataFrame(all_rows, columns=[
-                "ProjectSegmentItemId", "ProjectSegmentItemName", "Level", "Parent", "Project", "Component", "ItemType",
-                "Aantal", "Unit", "ListPrice", "PurchasePrice"
-            ])
-            output = BytesIO()
-            df.to_excel(output, index=False)
-            output.seek(0)
+        client = HiveClient(manufacturer_id, client_id, client_secret)
+        client.token()
+
+        # Rijen per ID in inputvolgorde wegschrijven zodra ze klaar zijn
+        rows = iter_bom_export_rows(client, segment_item_ids, concurrency, use_snapshots, refresh)
+        output = write_bom_excel(rows, rollup)
+        if output:
             filename = "bom_structuur.xlsx" if len(segment_item_ids) > 1 else f"bom_{segment_item_ids[0]}.xlsx"
             return output, filename, None
         else:
@@ -162,6 +419,39 @@ def export_bom_to_excel(manufacturer_id, client_id, client_secret, segment_item_
     except Exception as e:
         return None, None, str(e)
 
+def export_bom_selection_excel(manufacturer_id, client_id, client_secret, project_ids=(), segment_ids=(),
+                               order_statuses=(), concurrency=None, rollup=False, use_mirror=False,
+                               use_snapshots=True, refresh=False):
+    """
+    Zoals export_bom_to_excel, maar voor alle segment items van een
+    selectie projecten, segmenten en/of orderstatussen (zie
+    api_selection.resolve_segment_item_ids). Projecten of segmenten die
+    niet opgehaald konden worden staan als FOUT-regel bovenaan.
+    Retourneert (bestandsobject, bestandsnaam, None) of (None, None, fout).
+    """
+    try:
+        client = HiveClient(manufacturer_id, client_id, client_secret)
+        client.token()
+
+        segment_item_ids, errors = resolve_segment_item_ids(
+            client, project_ids, segment_ids, order_statuses, concurrency, use_mirror
+        )
+        if not segment_item_ids and not errors:
+            return None, None, "Geen segment items gevonden voor deze selectie."
+
+        rows = itertools.chain(
+            (error_row(selector, ex) for selector, ex in errors),
+            iter_bom_export_rows(client, segment_item_ids, concurrency, use_snapshots, refresh)
+        )
+        output = write_bom_excel(rows, rollup)
+        if output:
+            return output, "bom_selectie.xlsx", None
+        else:
+            return None, None, "Geen data opgehaald!"
+
+    except Exception as e:
+        return None, None, str(e)
+
 # Optioneel: voor standalone gebruik
 if __name__ == "__main__":
     import os
@@ -0,0 +1,220 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import queue
+import threading
+
+import api_config
+
+_limits = {}
+_executors = {}
+_limits_lock = threading.Lock()
+
+
+def manufacturer_limit(manufacturer_id):
+    """
+    Semafoor die het aantal gelijktijdige requests naar één manufacturer
+    begrenst, gedeeld door alle Streamlit-sessies en event loops.
+    """
+    with _limits_lock:
+        limit = _limits.get(manufacturer_id)
+        if limit is None:
+            limit = _limits[manufacturer_id] = threading.BoundedSemaphore(api_config.MAX_IN_FLIGHT)
+        return limit
+
+
+def manufacturer_executor(manufacturer_id):
+    """
+    Threadpool voor de requests naar één manufacturer, even groot als
+    manufacturer_limit. De default executor van asyncio (to_thread) heeft
+    min(32, cpu's + 4) threads en zou de concurrency daar afknijpen.
+    """
+    with _limits_lock:
+        executor = _executors.get(manufacturer_id)
+        if executor is None:
+            executor = _executors[manufacturer_id] = concurrent.futures.ThreadPoolExecutor(
+                max_workers=api_config.MAX_IN_FLIGHT, thread_name_prefix=f"hivecpq-{manufacturer_id}"
+            )
+        return executor
+
+
+class AsyncHiveClient:
+    """
+    Async tegenhanger van HiveClient.
+
+    De requests zelf lopen via de gedeelde, gepoolde Session in een
+    worker-thread; zo delen sync- en async-code dezelfde warme connecties
+    en dezelfde token-cache.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.manufacturer_id = client.manufacturer_id
+
+    async def run(self, func, *args, **kwargs):
+        """Voert een blokkerende functie uit binnen de manufacturer-limiet."""
+        limit = manufacturer_limit(self.manufacturer_id)
+
+        def call():
+            with limit:
+                return func(*args, **kwargs)
+
+        # Zoals asyncio.to_thread: de contextvars (api_metrics) gaan mee
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(manufacturer_executor(self.manufacturer_id), context.run, call)
+
+    async def request(self, method, path, **kwargs):
+        return await self.run(self.client.request, method, path, **kwargs)
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path, **kwargs):
+        return await self.request("PUT", path, **kwargs)
+
+
+async def gather_limited(worker, items, concurrency=None):
+    """
+    Roept `await worker(item)` aan voor alle items met maximaal `concurrency`
+    tegelijk. Resultaten komen in dezelfde volgorde als `items` terug;
+    een exception komt als waarde op de plaats van dat item.
+    """
+    semaphore = asyncio.Semaphore(concurrency or api_config.MAX_IN_FLIGHT)
+
+    async def one(item):
+        async with semaphore:
+            return await worker(item)
+
+    return await asyncio.gather(*(one(item) for item in items), return_exceptions=True)
+
+
+def run_sync(coro):
+    """
+    Draait een coroutine vanuit sync code (zoals streamlit_app.py).
+    Loopt er in deze thread al een event loop, dan gebeurt het in een
+    aparte thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    context = contextvars.copy_context()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(context.run, asyncio.run, coro).result()
+
+
+def iter_pages_parallel(client, path, page_size=None, params=None, concurrency=None):
+    """
+    Zoals HiveClient.iter_pages, maar haalt na de eerste pagina (die het
+    totaal geeft) de overige pagina's gelijktijdig op. Pagina's worden in
+    volgorde geyield; er staan nooit meer dan 2 x concurrency pagina's
+    tegelijk in het geheugen. Geeft de API geen totaal, dan wordt gewoon
+    sequentieel verder gepagineerd (vanaf pagina 2 of het token). Geeft de
+    server minder items dan gevraagd terwijl er meer zijn, dan is dat zijn
+    maximale pagina-grootte en wordt daarmee verder gerekend.
+    """
+    page_size = page_size or api_config.PAGE_SIZE
+    concurrency = concurrency or api_config.MAX_IN_FLIGHT
+    items, total, token = client.get_page(path, page=1, page_size=page_size, params=params)
+    if not items:
+        return
+    if total is None or token:
+        yield from client.iter_pages(path, page_size=page_size, params=params, first_page=(items, total, token))
+        return
+
+    if len(items) < page_size and total > len(items):
+        page_size = len(items)
+    yield items
+    last_page = -(-total // page_size)
+    aclient = AsyncHiveClient(client)
+
+    async def fetch(page):
+        page_items, _, _ = await aclient.run(
+            client.get_page, path, page=page, page_size=page_size, params=params
+        )
+        return page_items
+
+    window = 2 * concurrency
+    for first in range(2, last_page + 1, window):
+        batch = list(range(first, min(first + window, last_page + 1)))
+        for page_items in run_sync(gather_limited(fetch, batch, concurrency)):
+            if isinstance(page_items, Exception):
+                raise page_items
+            if page_items:
+                yield page_items
+
+
+def prefetch(iterable, depth=1):
+    """
+    Itereert `iterable` in een achtergrondthread en houdt maximaal `depth`
+    elementen klaar, zodat bv. de volgende pagina al binnenkomt terwijl de
+    huidige verwerkt wordt. Exceptions uit de iterator komen door bij de
+    consument; stopt de consument vroeger, dan stopt ook de thread.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+            return
+        finally:
+            # Generator netjes afsluiten (ook als de consument vroeger stopt)
+            close = getattr(iterable, "close", None)
+            if close:
+                close()
+        put((done, None))
+
+    # Eigen context: metrics van api_metrics.collect() tellen mee
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(produce,), daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def iter_async(agen, depth=1):
+    """
+    Maakt van een async generator een gewone iterator voor sync code. De
+    generator draait in een eigen event loop in een achtergrondthread (zie
+    prefetch); staan er `depth` elementen klaar, dan pauzeert de loop tot
+    de consument verder leest.
+    """
+    def drive():
+        loop = asyncio.new_event_loop()
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(agen.aclose())
+            loop.close()
+
+    return prefetch(drive(), depth)
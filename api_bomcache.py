@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import api_config
+
+# Cache van de ruwe configurations/{id}?outputMode=BOM_ONLY-responses.
+# In het geheugen een LRU begrensd op BOM_CACHE_MAX_MB; met BOM_CACHE_DIR
+# daarnaast gzip-bestanden op schijf (overleeft een herstart).
+_entries = OrderedDict()   # sleutel -> (opgehaald_om, body)
+_size = 0                  # som van len(body) in _entries
+_inflight = {}             # sleutel -> Future van de lopende fetch
+_lock = threading.Lock()
+
+# Verlopen bestanden op schijf worden hoogstens zo vaak (s) opgeruimd
+DISK_PRUNE_INTERVAL = 600
+_last_prune = 0.0
+
+
+def cache_key(client, configuration_id, language):
+    return (api_config.CONNECT_BASE_URL, client.manufacturer_id, configuration_id, language)
+
+
+def _hash(*parts):
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _manufacturer_dir(manufacturer_id):
+    # Gehasht: de manufacturer ID is gebruikersinput en hoort niet in een pad
+    return os.path.join(api_config.BOM_CACHE_DIR, _hash(manufacturer_id)[:32])
+
+
+def _disk_path(key):
+    base_url, manufacturer_id, configuration_id, language = key
+    return os.path.join(_manufacturer_dir(manufacturer_id), f"{_hash(*key)}.json.gz")
+
+
+def _fresh(fetched_at, fresh_since):
+    if time.time() - fetched_at > api_config.BOM_CACHE_TTL:
+        return False
+    return fresh_since is None or fetched_at >= fresh_since
+
+
+def _read_disk(key, fresh_since):
+    """(opgehaald_om, body) van schijf of None; een verlopen bestand wordt verwijderd."""
+    if not api_config.BOM_CACHE_DIR:
+        return None
+    path = _disk_path(key)
+    try:
+        fetched_at = os.path.getmtime(path)
+        if time.time() - fetched_at > api_config.BOM_CACHE_TTL:
+            os.remove(path)
+            return None
+        if not _fresh(fetched_at, fresh_since):
+            return None
+        with gzip.open(path, "rb") as f:
+            return fetched_at, f.read()
+    except OSError:
+        return None
+
+
+def _write_disk(key, body):
+    if not api_config.BOM_CACHE_DIR:
+        return
+    path = _disk_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(body)
+        # Atomair: een lezer ziet nooit een half geschreven bestand
+        os.replace(tmp_path, path)
+        prune_disk()
+    except OSError as e:
+        # De cache op schijf is optioneel: een volle schijf of een ongeldige
+        # BOM_CACHE_DIR mag een geslaagde fetch niet laten mislukken
+        print(f"[⚠️ bomcache] BOM niet op schijf gecachet ({e})")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def prune_disk(force=False):
+    """Verwijdert verlopen bestanden uit BOM_CACHE_DIR (hoogstens elke DISK_PRUNE_INTERVAL s)."""
+    global _last_prune
+    if not api_config.BOM_CACHE_DIR or not os.path.isdir(api_config.BOM_CACHE_DIR):
+        return
+    now = time.time()
+    with _lock:
+        if not force and now - _last_prune < DISK_PRUNE_INTERVAL:
+            return
+        _last_prune = now
+    for folder in os.listdir(api_config.BOM_CACHE_DIR):
+        folder = os.path.join(api_config.BOM_CACHE_DIR, folder)
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            try:
+                if now - os.path.getmtime(path) > api_config.BOM_CACHE_TTL:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def _remember(key, body, fetched_at):
+    """In het geheugen bewaren; oudste entries eruit tot onder het maximum."""
+    global _size
+    max_bytes = api_config.BOM_CACHE_MAX_MB * 1024 * 1024
+    if len(body) > max_bytes:
+        return
+    with _lock:
+        old = _entries.pop(key, None)
+        if old:
+            _size -= len(old[1])
+        _entries[key] = (fetched_at, body)
+        _size += len(body)
+        while _size > max_bytes:
+            _, (_, evicted) = _entries.popitem(last=False)
+            _size -= len(evicted)
+
+
+def cached_bom(key, fresh_since=None):
+    """
+    De gecachete response-body (geheugen, dan schijf) of None. Met
+    `fresh_since` (time.time()) tellen enkel entries die op of na dat
+    tijdstip opgehaald zijn.
+    """
+    global _size
+    with _lock:
+        entry = _entries.get(key)
+        if entry and _fresh(entry[0], fresh_since):
+            _entries.move_to_end(key)
+            return entry[1]
+        if entry and time.time() - entry[0] > api_config.BOM_CACHE_TTL:
+            del _entries[key]
+            _size -= len(entry[1])
+    entry = _read_disk(key, fresh_since)
+    if entry is None:
+        return None
+    _remember(key, entry[1], entry[0])
+    return entry[1]
+
+
+def fetch_cached(key, fetch, fresh_since=None):
+    """
+    Body voor `key` uit de cache, anders via fetch() (die de body als bytes
+    teruggeeft). Vragen meerdere threads tegelijk dezelfde sleutel op, dan
+    doet er maar één de call en krijgen de anderen hetzelfde resultaat (of
+    dezelfde exception). Enkel geslaagde fetches worden gecachet; met
+    BOM_CACHE_TTL = 0 wordt niets bewaard.
+
+    Met `fresh_since` worden oudere entries genegeerd: een export die
+    fresh_since op zijn starttijd zet haalt elke configuratie vers op,
+    maar slechts één keer per batch.
+    """
+    if api_config.BOM_CACHE_TTL > 0:
+        body = cached_bom(key, fresh_since)
+        if body is not None:
+            return body
+    with _lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        return future.result()
+    try:
+        fetched_at = time.time()
+        body = fetch()
+        if api_config.BOM_CACHE_TTL > 0:
+            _remember(key, body, fetched_at)
+            _write_disk(key, body)
+        future.set_result(body)
+        return body
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def invalidate_boms(manufacturer_id=None):
+    """Vergeet de gecachete BOMs (van één manufacturer), ook op schijf."""
+    global _size
+    with _lock:
+        for key in list(_entries):
+            if manufacturer_id is None or key[1] == manufacturer_id:
+                _size -= len(_entries.pop(key)[1])
+    if not api_config.BOM_CACHE_DIR or not os.path.isdir(api_config.BOM_CACHE_DIR):
+        return
+    if manufacturer_id is None:
+        folders = [os.path.join(api_config.BOM_CACHE_DIR, f) for f in os.listdir(api_config.BOM_CACHE_DIR)]
+    else:
+        folders = [_manufacturer_dir(manufacturer_id)]
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            os.remove(os.path.join(folder, name))
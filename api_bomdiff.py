@@ -0,0 +1,170 @@
+import pandas as pd
+
+from api_client import HiveClient
+from api_ExportBom import BOM_COLUMNS, bom_json_to_rows, get_bom_json, get_project_segment_item
+from api_excel import StreamingExcelWriter
+
+# Velden van een BOM_ITEM die tussen twee versies vergeleken worden
+BOM_COMPARED_FIELDS = ["Aantal", "Unit", "ListPrice", "PurchasePrice"]
+
+BOM_DIFF_COLUMNS = ["Pad", "Level", "Component", "Verschil", "Velden"] + [
+    f"{field} {side}" for field in BOM_COMPARED_FIELDS for side in ("oud", "nieuw")
+]
+
+
+def _value(row, field):
+    """Vergelijkbare waarde: "2", 2 en 2.0 zijn hetzelfde aantal, leeg is ""."""
+    value = row.get(field, "")
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    if field == "Aantal" and value != "":
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return str(value)
+        return int(value) if value.is_integer() else value
+    return str(value)
+
+
+def bom_paths(rows):
+    """
+    {pad: rij} voor alle BOM_ITEM-rijen van één BOM (rijen zoals uit
+    bom_json_to_rows, in pre-order). Het pad is de reeks componentCodes van
+    de top tot de node; komt dezelfde component meermaals onder dezelfde
+    parent voor, dan krijgt hij een volgnummer (A, A#2, ...). Eén pass.
+    """
+    paths = {}
+    stack = []      # pad per level, stack[level - 1]
+    seen = {}       # (parent-pad, component) -> aantal keer gezien
+    for row in rows:
+        try:
+            level = int(row.get("Level"))
+        except (TypeError, ValueError):
+            continue
+        if level < 1:
+            continue
+        del stack[level - 1:]
+        parent = stack[-1] if stack else ()
+        component = str(row.get("Component", ""))
+        occurrence = seen.get((parent, component), 0) + 1
+        seen[(parent, component)] = occurrence
+        path = parent + (component if occurrence == 1 else f"{component}#{occurrence}",)
+        stack.append(path)
+        paths[path] = row
+    return paths
+
+
+def diff_boms(old_rows, new_rows):
+    """
+    Vergelijkt twee BOMs node per node op hun pad (zie bom_paths). Geeft
+    diff-rijen met BOM_DIFF_COLUMNS terug: "toegevoegd" en "gewijzigd" in
+    de volgorde van de nieuwe BOM, daarna "verwijderd" in de volgorde van
+    de oude. Een toegevoegde of verwijderde subboom geeft een rij per node.
+    Lineair in het aantal nodes.
+    """
+    old_paths = bom_paths(old_rows)
+    new_paths = bom_paths(new_rows)
+    diffs = []
+
+    def diff_row(path, row, verschil, fields, old_row, new_row):
+        out = {
+            "Pad": " > ".join(path),
+            "Level": len(path),
+            "Component": row.get("Component", ""),
+            "Verschil": verschil,
+            "Velden": ", ".join(fields),
+        }
+        for field in BOM_COMPARED_FIELDS:
+            out[f"{field} oud"] = _value(old_row, field) if old_row else ""
+            out[f"{field} nieuw"] = _value(new_row, field) if new_row else ""
+        return out
+
+    for path, new_row in new_paths.items():
+        old_row = old_paths.get(path)
+        if old_row is None:
+            diffs.append(diff_row(path, new_row, "toegevoegd", [], None, new_row))
+            continue
+        changed = [f for f in BOM_COMPARED_FIELDS if _value(old_row, f) != _value(new_row, f)]
+        if changed:
+            diffs.append(diff_row(path, new_row, "gewijzigd", changed, old_row, new_row))
+    for path, old_row in old_paths.items():
+        if path not in new_paths:
+            diffs.append(diff_row(path, old_row, "verwijderd", [], old_row, None))
+    return diffs
+
+
+def bom_rows_from_excel(file, segment_item_id=None):
+    """
+    Rijen van een eerdere export van export_bom_to_excel (tabblad "Sheet1"),
+    om met de huidige BOM te vergelijken. Met `segment_item_id` enkel de
+    rijen van dat ProjectSegmentItemId; zonder mag de export maar één BOM
+    bevatten (anders ValueError), want paden van verschillende BOMs zouden
+    door elkaar lopen.
+    """
+    frame = pd.read_excel(file, sheet_name="Sheet1", dtype=str, keep_default_na=False)
+    if segment_item_id:
+        frame = frame[frame["ProjectSegmentItemId"] == segment_item_id]
+    else:
+        ids = [i for i in frame["ProjectSegmentItemId"].unique() if i]
+        if len(ids) > 1:
+            raise ValueError(
+                f"De export bevat {len(ids)} BOMs; geef het ProjectSegmentItemId op van de BOM om te vergelijken."
+            )
+    return frame.reindex(columns=BOM_COLUMNS, fill_value="").to_dict("records")
+
+
+def current_bom_rows(client, segment_item_id=None, configuration_id=None):
+    """Rijen van de BOM zoals hij nu in HiveCPQ staat (niet uit de cache)."""
+    name = ""
+    if segment_item_id:
+        project_segment_item = get_project_segment_item(client, segment_item_id)
+        configuration_id = project_segment_item["configuration"]["id"]
+        name = project_segment_item.get("name", "")
+    return bom_json_to_rows(get_bom_json(client, configuration_id, refresh=True), segment_item_id or "", name)
+
+
+def write_bom_diff_excel(diffs, old_rows, new_rows, output_path=None):
+    """Excel met tabbladen "Verschillen", "Oud" en "Nieuw"."""
+    writer = StreamingExcelWriter()
+    writer.add_sheet("Verschillen", BOM_DIFF_COLUMNS)
+    writer.extend("Verschillen", diffs)
+    for title, rows in (("Oud", old_rows), ("Nieuw", new_rows)):
+        writer.add_sheet(title, BOM_COLUMNS)
+        writer.extend(title, rows)
+    return writer.close(output_path)
+
+
+def compare_boms_excel(manufacturer_id, client_id, client_secret, old_configuration_id=None,
+                       new_configuration_id=None, old_segment_item_id=None, new_segment_item_id=None,
+                       old_excel=None, output_path=None):
+    """
+    Vergelijkt twee BOMs: de oude is een configuratie, een segment item of
+    een eerdere BOM-export (`old_excel`, bv. om dezelfde configuratie op
+    twee tijdstippen te vergelijken); de nieuwe is een configuratie of een
+    segment item zoals ze nu in HiveCPQ staan. Bevat de oude export meerdere
+    BOMs, dan kiest `old_segment_item_id` welke.
+    Retourneert (bestandsobject, diff-rijen, None) of (None, None, fout).
+    """
+    try:
+        client = HiveClient(manufacturer_id, client_id, client_secret)
+        client.token()
+
+        if old_excel is not None:
+            try:
+                old_rows = bom_rows_from_excel(old_excel, old_segment_item_id)
+            except ValueError as e:
+                return None, None, str(e)
+            if not old_rows:
+                return None, None, "Geen BOM-rijen gevonden in de oude export."
+        elif old_configuration_id or old_segment_item_id:
+            old_rows = current_bom_rows(client, old_segment_item_id, old_configuration_id)
+        else:
+            return None, None, "Geef een oude configuratie, segment item of export op."
+        if not (new_configuration_id or new_segment_item_id):
+            return None, None, "Geef een nieuwe configuratie of segment item op."
+        new_rows = current_bom_rows(client, new_segment_item_id, new_configuration_id)
+
+        diffs = diff_boms(old_rows, new_rows)
+        return write_bom_diff_excel(diffs, old_rows, new_rows, output_path), diffs, None
+    except Exception as e:
+        return None, None, f"Onverwachte fout: {str(e)}"
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+import api_config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bom_snapshots (
+    base_url TEXT NOT NULL,
+    manufacturer_id TEXT NOT NULL,
+    configuration_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    first_fetched_at REAL NOT NULL,
+    fetched_at REAL NOT NULL,
+    row_count INTEGER NOT NULL,
+    rows BLOB NOT NULL,
+    PRIMARY KEY (base_url, manufacturer_id, configuration_id, content_hash)
+);
+CREATE INDEX IF NOT EXISTS bom_snapshots_latest ON bom_snapshots (base_url, manufacturer_id, configuration_id, fetched_at);
+"""
+
+# Paden waarvoor WAL en het schema al ingesteld zijn (één keer per proces)
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def content_hash(body):
+    """Hash van de ruwe BOM_ONLY-response; zelfde hash = zelfde BOM."""
+    return hashlib.sha256(body).hexdigest()
+
+
+def is_frozen(project_segment_item):
+    """
+    Kan de configuratie van dit segment item nog wijzigen? Nee als de
+    orderstatus van zijn segment in BOM_FROZEN_ORDER_STATUSES staat.
+    """
+    status = (project_segment_item.get("projectSegment", {}) or {}).get("orderStatus", "")
+    return bool(status) and status in api_config.BOM_FROZEN_ORDER_STATUSES
+
+
+def encode_rows(rows):
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_rows(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+class BomSnapshotStore:
+    """
+    Platgeslagen BOM-rijen per (manufacturer, configuratie) in SQLite,
+    gecomprimeerd, met het tijdstip van ophalen en een hash van de
+    response. Elke andere inhoud van dezelfde configuratie wordt een
+    nieuwe snapshot; dezelfde inhoud opnieuw opgehaald werkt enkel
+    fetched_at bij. latest() geeft de laatst opgehaalde versie. Snapshots
+    staan per CONNECT_BASE_URL: een mock of staging mengt nooit met productie.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or api_config.BOM_SNAPSHOT_PATH
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        if self.path not in _initialized:
+            with _init_lock:
+                if self.path not in _initialized:
+                    # WAL blijft in het bestand ingesteld, ook voor latere connecties
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    columns = [row[1] for row in conn.execute("PRAGMA table_info(bom_snapshots)")]
+                    if columns and "base_url" not in columns:
+                        # Snapshots van voor de base_url-kolom: van welke omgeving
+                        # ze komen is niet bekend, dus apart bewaard en niet gebruikt
+                        conn.executescript(
+                            "ALTER TABLE bom_snapshots RENAME TO bom_snapshots_zonder_base_url;"
+                            "DROP INDEX IF EXISTS bom_snapshots_latest;"
+                        )
+                    conn.executescript(SCHEMA)
+                    _initialized.add(self.path)
+        return conn
+
+    def latest(self, manufacturer_id, configuration_id):
+        """(content_hash, fetched_at, gecomprimeerde rijen) of None."""
+        conn = self.connect()
+        try:
+            return conn.execute(
+                "SELECT content_hash, fetched_at, rows FROM bom_snapshots "
+                "WHERE base_url = ? AND manufacturer_id = ? AND configuration_id = ? "
+                "ORDER BY fetched_at DESC LIMIT 1",
+                (api_config.CONNECT_BASE_URL, manufacturer_id, configuration_id)
+            ).fetchone()
+        finally:
+            conn.close()
+
+    def save(self, manufacturer_id, configuration_id, body_hash, rows):
+        """Bewaart `rows` (lijst van lijsten) als snapshot met hash `body_hash`."""
+        now = time.time()
+        conn = self.connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO bom_snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (base_url, manufacturer_id, configuration_id, content_hash) DO UPDATE SET "
+                    "fetched_at = excluded.fetched_at",
+                    (api_config.CONNECT_BASE_URL, manufacturer_id, configuration_id, body_hash, now, now,
+                     len(rows), encode_rows(rows))
+                )
+        finally:
+            conn.close()
+
+    def history(self, manufacturer_id, configuration_id):
+        """[(content_hash, first_fetched_at, fetched_at, row_count)], oudste eerst."""
+        conn = self.connect()
+        try:
+            return conn.execute(
+                "SELECT content_hash, first_fetched_at, fetched_at, row_count FROM bom_snapshots "
+                "WHERE base_url = ? AND manufacturer_id = ? AND configuration_id = ? ORDER BY first_fetched_at",
+                (api_config.CONNECT_BASE_URL, manufacturer_id, configuration_id)
+            ).fetchall()
+        finally:
+            conn.close()
+
+
+def snapshot_store():
+    """De BomSnapshotStore uit de configuratie, of None als die uit staat."""
+    if not api_config.BOM_SNAPSHOT_PATH:
+        return None
+    return BomSnapshotStore()
@@ -0,0 +1,193 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import api_config
+import api_metrics
+import api_ratelimit
+import api_token
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=api_config.POOL_SIZE,
+        pool_maxsize=api_config.POOL_SIZE
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Eén gedeelde Session zodat TCP/TLS-connecties hergebruikt worden."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _new_session()
+    return _session
+
+
+def reset_session():
+    """Sluit de gedeelde Session, bv. na configure() met een andere POOL_SIZE."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def http_request(method, url, timeout=None, **kwargs):
+    """
+    requests.request over de gedeelde Session, altijd met een timeout.
+    Elke call wordt in api_metrics geregistreerd (status 0 = geen response).
+    """
+    if timeout is None:
+        timeout = api_config.default_timeout()
+    started = time.perf_counter()
+    try:
+        resp = get_session().request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException:
+        api_metrics.record(method, url, 0, time.perf_counter() - started, 0)
+        raise
+    size = resp.headers.get("Content-Length")
+    if size is None and not kwargs.get("stream"):
+        size = len(resp.content)
+    api_metrics.record(method, url, resp.status_code, time.perf_counter() - started, int(size or 0))
+    return resp
+
+
+def parse_page(payload):
+    """
+    Lijst-response -> (items, totaal of None, continuationToken of None).
+    HiveCPQ geeft een lijst of {"items": [...], ...} terug.
+    """
+    if isinstance(payload, list):
+        return payload, None, None
+    payload = payload or {}
+    items = payload.get("items") or []
+    total = next((payload[k] for k in ("totalCount", "total", "totalItems") if payload.get(k) is not None), None)
+    token = payload.get("continuationToken") or payload.get("nextPageToken")
+    return items, total, token
+
+
+class HiveClient:
+    """
+    Client voor de HiveCPQ API van één manufacturer.
+
+    Paden zijn relatief t.o.v. /manufacturers/{manufacturer_id}/, bv.
+    client.get("projectSegments", params={"pageSize": 100}).
+    Het Bearer-token komt uit de gedeelde token-cache; bij een 401 wordt het
+    één keer vernieuwd en de call herhaald. Elke call gaat door de token
+    bucket van (manufacturer, endpoint-familie); een 429 verlaagt die rate,
+    respecteert Retry-After en wordt tot MAX_THROTTLE_RETRIES keer herhaald.
+    """
+
+    def __init__(self, manufacturer_id, client_id, client_secret, timeout=None):
+        self.manufacturer_id = manufacturer_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = timeout
+
+    def token(self):
+        return api_token.get_access_token(self.client_id, self.client_secret)
+
+    def url(self, path, base_url=None, manufacturer_id=None):
+        base = (base_url or api_config.CONNECT_BASE_URL).rstrip("/")
+        mid = manufacturer_id or self.manufacturer_id
+        return f"{base}/manufacturers/{mid}/{path.lstrip('/')}"
+
+    def request(self, method, path, base_url=None, manufacturer_id=None, headers=None, **kwargs):
+        mid = manufacturer_id or self.manufacturer_id
+        url = self.url(path, base_url=base_url, manufacturer_id=mid)
+        kwargs.setdefault("timeout", self.timeout)
+        bucket = api_ratelimit.bucket_for(mid, api_ratelimit.endpoint_family(path))
+
+        def send():
+            all_headers = {"Authorization": f"Bearer {self.token()}"}
+            all_headers.update(headers or {})
+            return http_request(method, url, headers=all_headers, **kwargs)
+
+        attempt = 0
+        while True:
+            issued_at = bucket.acquire()
+            resp = send()
+            if resp.status_code == 401:
+                api_token.invalidate_token(self.client_id, client_secret=self.client_secret)
+                resp = send()
+            if resp.status_code != 429:
+                bucket.on_success()
+                return resp
+            bucket.on_throttle(api_ratelimit.parse_retry_after(resp.headers.get("Retry-After")), issued_at)
+            if attempt >= api_config.MAX_THROTTLE_RETRIES:
+                return resp
+            attempt += 1
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def get_page(self, path, page=1, page_size=None, params=None, continuation_token=None, **kwargs):
+        """Eén pagina van een lijst-endpoint -> (items, totaal, continuationToken)."""
+        query = dict(params or {})
+        query["pageSize"] = page_size or api_config.PAGE_SIZE
+        if continuation_token:
+            query["continuationToken"] = continuation_token
+        else:
+            query["page"] = page
+        resp = self.get(path, params=query, **kwargs)
+        resp.raise_for_status()
+        return parse_page(resp.json())
+
+    def iter_pages(self, path, page_size=None, params=None, stats=None, first_page=None, **kwargs):
+        """
+        Loopt een lijst-endpoint pagina per pagina af en yieldt de items van
+        elke pagina. Stopt bij een lege pagina, wanneer het opgegeven totaal
+        bereikt is, of bij een onvolledige pagina zonder totaal/token.
+        Met een dict als `stats` komen daar het totaal van de server
+        ("total", of None) en het aantal geyielde items ("seen") in.
+        Met `first_page` (het resultaat van get_page voor pagina 1) wordt
+        die pagina niet opnieuw opgehaald.
+        """
+        page_size = page_size or api_config.PAGE_SIZE
+        page = 1
+        seen = 0
+        token = None
+        first_id = None
+        while True:
+            if first_page is not None:
+                (items, total, token), first_page = first_page, None
+            else:
+                items, total, token = self.get_page(
+                    path, page=page, page_size=page_size, params=params,
+                    continuation_token=token, **kwargs
+                )
+            if not items:
+                return
+            # Server die paginering negeert: dezelfde pagina komt terug. Met
+            # een totaal volstaat seen >= total; zonder "id" kan het niet.
+            if (page > 1 and total is None and first_id is not None
+                    and isinstance(items[0], dict) and items[0].get("id") == first_id):
+                return
+            if page == 1 and isinstance(items[0], dict):
+                first_id = items[0].get("id")
+            seen += len(items)
+            if stats is not None:
+                stats.update(total=total, seen=seen)
+            yield items
+            if total is not None and seen >= total:
+                return
+            if total is None and token is None and len(items) < page_size:
+                return
+            page += 1
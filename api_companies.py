@@ -1,195 +1,435 @@
 import requests
-import pandas as pd
-from io import BytesIO
+import api_config
+from api_client import HiveClient
+from api_async import AsyncHiveClient, gather_limited, prefetch, run_sync
+from api_excel import StreamingExcelWriter
+from api_directory import (
+    belongs_to_distributor, cached_directory, fetch_companies, get_directory, iter_company_pages,
+    store_directory
+)
 
-def get_all_companies_excel(
+COMPANY_COLUMNS = [
+    'id',
+    'companyType',
+    'name',
+    'description',
+    'distributor',
+    'distributorId',
+    'telephone',
+    'vatNumber',
+    'email',
+    'websiteUrl',
+    'preferredLanguage',
+    'addressLine1',
+    'addressLine2',
+    'city',
+    'postalCode',
+    'countryIso',
+    # nieuwe kolommen (exacte benamingen zoals gevraagd)
+    'currency',
+    'customer price group',
+    'company discount group',
+]
+
+# Tabblad "Fouten": één rij per company waarvan de customObject-call faalde
+ERROR_COLUMNS = ['id', 'companyType', 'name', 'customObject', 'fout']
+
+
+def parse_key_values(payload):
+    """customObject-payload -> dict met keys -> values uit keyValues."""
+    key_values = (payload or {}).get("keyValues", []) or []
+    out = {}
+    for kv in key_values:
+        k = (kv.get("key") or "").strip()
+        v = kv.get("value")
+        out[k] = v
+    return out
+
+
+async def fetch_custom_objects_async(client, m_slug, lookups, concurrency=None):
+    """
+    GET /api/v1/manufacturers/{m_slug}/customObjects/distributor-{distributor_id}/{key_id}
+    voor elke (distributor_id, key_id) in `lookups`, met `concurrency` calls tegelijk.
+
+    Retourneert per lookup (zelfde volgorde) een dict keys -> values, of de
+    exception als die call faalde. Een 404 geeft een lege dict.
+    """
+    aclient = AsyncHiveClient(client)
+
+    async def fetch(lookup):
+        distributor_id, key_id = lookup
+        r = await aclient.get(
+            f"customObjects/distributor-{distributor_id}/{key_id}",
+            base_url=api_config.API_BASE_URL,
+            manufacturer_id=m_slug
+        )
+        if r.status_code == 404:
+            # Geen customObject voor deze combinatie; stil terugkeren
+            return {}
+        r.raise_for_status()
+        return parse_key_values(r.json())
+
+    return await gather_limited(fetch, lookups, concurrency)
+
+
+def fetch_custom_objects(client, m_slug, lookups, concurrency=None):
+    """Sync wrapper rond fetch_custom_objects_async."""
+    return run_sync(fetch_custom_objects_async(client, m_slug, lookups, concurrency))
+
+
+class IncompleteListError(Exception):
+    """De lijst-call gaf minder objecten dan het totaal van de server; `index` is wat er wel kwam."""
+
+    def __init__(self, message, index):
+        super().__init__(message)
+        self.index = index
+
+
+def list_custom_objects(client, m_slug, object_type, page_size=None):
+    """
+    GET /api/v1/manufacturers/{m_slug}/customObjects/{object_type}, alle
+    pagina's -> dict objectKey -> keys -> values. Geeft de server een
+    totaal en komen er minder objecten binnen, dan volgt IncompleteListError.
+    """
+    index = {}
+    stats = {}
+    pages = client.iter_pages(
+        f"customObjects/{object_type}",
+        page_size=page_size,
+        stats=stats,
+        base_url=api_config.API_BASE_URL,
+        manufacturer_id=m_slug
+    )
+    for custom_objects in pages:
+        for custom_object in custom_objects:
+            key = custom_object.get("objectKey") or custom_object.get("itemId")
+            if key:
+                index[key] = parse_key_values(custom_object)
+    total = stats.get("total")
+    if total is not None and stats.get("seen", 0) < total:
+        raise IncompleteListError(
+            f"customObjects/{object_type}: {stats.get('seen', 0)} van {total} objecten opgehaald", index
+        )
+    return index
+
+
+async def list_custom_object_types_async(client, m_slug, object_types, concurrency=None):
+    """list_custom_objects voor elk type, gelijktijdig; exceptions als waarde."""
+    aclient = AsyncHiveClient(client)
+
+    async def fetch(object_type):
+        return await aclient.run(list_custom_objects, client, m_slug, object_type)
+
+    return await gather_limited(fetch, object_types, concurrency)
+
+
+def fetch_custom_objects_bulk(client, m_slug, lookups, concurrency=None, indexes=None):
+    """
+    Zelfde resultaat als fetch_custom_objects, maar met één gepagineerde
+    lijst-call per customObject-type (distributor-{distributor_id}) i.p.v.
+    één GET per key. Een key die niet in de lijst staat geeft een lege dict,
+    net als een 404. Faalt de lijst-call van een type (bv. omdat het
+    endpoint niet bestaat), dan worden de keys van dat type alsnog één
+    voor één opgehaald. Was de lijst onvolledig, dan krijgen de keys die
+    er niet in staan de IncompleteListError (-> foutenlijst) i.p.v. {}.
+
+    `indexes` (type -> index of exception) mag over meerdere aanroepen
+    gedeeld worden; types die er al in staan worden niet opnieuw opgelijst.
+    """
+    indexes = {} if indexes is None else indexes
+    object_types = [t for t in dict.fromkeys(f"distributor-{d}" for d, _ in lookups) if t not in indexes]
+    listed = run_sync(list_custom_object_types_async(client, m_slug, object_types, concurrency))
+    indexes.update(zip(object_types, listed))
+
+    results = [None] * len(lookups)
+    fallback = []
+    for n, (distributor_id, key_id) in enumerate(lookups):
+        index = indexes[f"distributor-{distributor_id}"]
+        if isinstance(index, requests.HTTPError):
+            fallback.append(n)
+        elif isinstance(index, IncompleteListError):
+            results[n] = index.index.get(key_id, index)
+        elif isinstance(index, Exception):
+            results[n] = index
+        else:
+            results[n] = index.get(key_id, {})
+
+    if fallback:
+        single = fetch_custom_objects(client, m_slug, [lookups[n] for n in fallback], concurrency)
+        for n, kv in zip(fallback, single):
+            results[n] = kv
+    return results
+
+
+def fill_custom_object_columns(client, m_slug, rows, lookups, lookup_rows, concurrency=None, indexes=None):
+    """
+    Haalt de customObjects voor `lookups` op (per distributor-type in bulk,
+    zie fetch_custom_objects_bulk voor `indexes`) en vult de
+    customObject-kolommen van rows[lookup_rows[i]] in.
+    Rijvolgorde blijft ongewijzigd; bij een mislukte call blijven de
+    kolommen leeg en komt er een rij in de teruggegeven foutenlijst
+    (kolommen ERROR_COLUMNS).
+    """
+    errors = []
+    results = fetch_custom_objects_bulk(client, m_slug, lookups, concurrency, indexes)
+    for row_index, (distributor_id, key_id), kv in zip(lookup_rows, lookups, results):
+        row = rows[row_index]
+        if isinstance(kv, Exception):
+            errors.append({
+                'id': row['id'],
+                'companyType': row['companyType'],
+                'name': row['name'],
+                'customObject': f"distributor-{distributor_id}/{key_id}",
+                'fout': str(kv),
+            })
+            continue
+        # Exacte keys zoals in je voorbeeld
+        row['currency'] = kv.get('currency', '') or ''
+        row['customer price group'] = kv.get('customer price group', '') or ''
+        row['company discount group'] = kv.get('company discount group', '') or ''
+    return errors
+
+
+def companies_excel_writer():
+    """StreamingExcelWriter met het companies-tabblad klaar."""
+    writer = StreamingExcelWriter()
+    writer.add_sheet("Sheet1", COMPANY_COLUMNS)
+    return writer
+
+
+def close_companies_excel(writer, errors=None, output_path=None):
+    """Schrijft (eventueel) het tabblad "Fouten" en sluit de workbook af."""
+    if errors:
+        writer.add_sheet("Fouten", ERROR_COLUMNS)
+        writer.extend("Fouten", errors)
+    return writer.close(output_path)
+
+
+def write_companies_excel(rows, errors=None, output_path=None):
+    """Rijen (+ eventueel tabblad "Fouten") -> Excel als bestandsobject."""
+    writer = companies_excel_writer()
+    writer.extend("Sheet1", rows)
+    return close_companies_excel(writer, errors, output_path)
+
+
+def company_row(company):
+    """
+    Company -> (rij, customObject-lookup of None). De customObject-kolommen
+    blijven leeg; die vult fill_custom_object_columns in.
+
+    Voor SUB_DISTRIBUTOR:
+      /customObjects/distributor-{distributorId}/{subDistributorId}
+
+    Voor DISTRIBUTOR:
+      /customObjects/distributor-{distributorId}/{distributorId}
+    """
+    info = company.get('info', {}) or {}
+    address = info.get('address', {}) or {}
+
+    distributor_name = ''
+    distributor_id = ''
+    key_id_for_custom_object = ''
+
+    ctype = company.get('companyType')
+    cid = company.get('id', '')
+
+    if ctype == 'SUB_DISTRIBUTOR':
+        sub_settings = company.get('subDistributorSettings', {}) or {}
+        distributor = sub_settings.get('distributor', {}) or {}
+        distributor_name = distributor.get('name', '') or ''
+        distributor_id = distributor.get('id', '') or ''
+        # customObject key id is subdistributeur id
+        key_id_for_custom_object = cid
+    elif ctype == 'DISTRIBUTOR':
+        distributor_name = info.get('name', '') or ''
+        distributor_id = cid
+        # customObject key id = distributor id
+        key_id_for_custom_object = cid
+
+    row = {
+        'id': cid,
+        'companyType': ctype or '',
+        'name': (info.get('name') or '').strip(),
+        'description': (info.get('description') or '').strip(),
+        'distributor': distributor_name,
+        'distributorId': distributor_id,
+        'telephone': info.get('telephone', ''),
+        'vatNumber': (info.get('vatNumber') or '').strip(),
+        'email': info.get('email', ''),
+        'websiteUrl': info.get('websiteUrl', ''),
+        'preferredLanguage': info.get('preferredLanguage', ''),
+        'addressLine1': address.get('addressLine1', ''),
+        'addressLine2': address.get('addressLine2', ''),
+        'city': address.get('city', ''),
+        'postalCode': address.get('postalCode', ''),
+        'countryIso': address.get('countryIso', ''),
+        # Nieuwe kolommen uit customObject
+        'currency': '',
+        'customer price group': '',
+        'company discount group': '',
+    }
+    # Andere types: geen customObject-call
+    lookup = (distributor_id, key_id_for_custom_object) if distributor_id and key_id_for_custom_object else None
+    return row, lookup
+
+
+# Servers zonder distributeurfilter: (base_url, manufacturer_id)
+_filter_unsupported = set()
+
+
+def reset_filter_support():
+    """Vergeet welke servers het distributeurfilter niet kennen."""
+    _filter_unsupported.clear()
+
+
+def _companies_via_filter(client, distributor_id):
+    """
+    Vraagt enkel de companies van één distributeur op via het server-side
+    filter COMPANY_DISTRIBUTOR_FILTER. Kent de server dat filter niet (400),
+    dan None; stuurt hij ook andere companies terug, dan is dat de volledige
+    lijst: die wordt als directory gecachet en lokaal gefilterd. Beide
+    gevallen worden per manufacturer onthouden.
+    """
+    param = api_config.COMPANY_DISTRIBUTOR_FILTER
+    key = (api_config.CONNECT_BASE_URL, client.manufacturer_id)
+    if not param or key in _filter_unsupported:
+        return None
+    try:
+        companies = fetch_companies(client, params={param: distributor_id})
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 400:
+            raise
+        _filter_unsupported.add(key)
+        return None
+    if not all(belongs_to_distributor(c, distributor_id) for c in companies):
+        # Filter genegeerd: we hebben de volledige lijst al, niet opnieuw ophalen
+        _filter_unsupported.add(key)
+        return store_directory(client, companies).for_distributor(distributor_id)
+    if not any(c.get('id') == distributor_id for c in companies):
+        # De distributeur zelf is geen subdistributeur van zichzelf
+        r = client.get(f"companies/{distributor_id}")
+        if r.status_code != 404:
+            r.raise_for_status()
+            if belongs_to_distributor(r.json(), distributor_id):
+                companies.insert(0, r.json())
+    return companies
+
+
+def companies_for_distributor(client, distributor_id):
+    """
+    De distributeur + zijn subdistributeurs. Eerst uit een verse
+    CompanyDirectory (api_directory), anders via het server-side filter,
+    anders via de volledige lijst (die dan als directory gecachet wordt).
+    """
+    directory = cached_directory(client)
+    if directory:
+        return directory.for_distributor(distributor_id)
+    companies = _companies_via_filter(client, distributor_id)
+    if companies is not None:
+        return companies
+    return get_directory(client).for_distributor(distributor_id)
+
+
+def iter_company_rows(client, m_slug, distributor_id=None, concurrency=None, errors=None):
+    """
+    Yieldt per pagina de verrijkte company-rijen (kolommen COMPANY_COLUMNS),
+    in API-volgorde. Zonder `distributor_id` alle companies (altijd vers
+    opgehaald, daarna als directory gecachet); met `distributor_id` enkel die
+    DISTRIBUTOR + diens SUB_DISTRIBUTORS (zie companies_for_distributor).
+    Mislukte customObject-calls worden aan `errors` toegevoegd.
+    """
+    errors = [] if errors is None else errors
+
+    # 1. Bedrijven ophalen; alle companies pagina per pagina, met de
+    #    volgende pagina al onderweg terwijl de huidige verrijkt wordt
+    if distributor_id:
+        pages = [companies_for_distributor(client, distributor_id)]
+    else:
+        pages = prefetch(iter_company_pages(client))
+
+    companies = []
+    indexes = {}  # customObject-type -> index, gedeeld over de pagina's
+    for page in pages:
+        companies.extend(page)
+
+        # 2. Rijen opbouwen; customObject-lookups verzamelen
+        page_rows = []
+        lookups = []
+        lookup_rows = []
+        for company in page:
+            row, lookup = company_row(company)
+            if lookup:
+                lookups.append(lookup)
+                lookup_rows.append(len(page_rows))
+            page_rows.append(row)
+
+        # 3. CustomObjects ophalen en invullen
+        errors += fill_custom_object_columns(
+            client, m_slug, page_rows, lookups, lookup_rows, concurrency, indexes
+        )
+        yield page_rows
+
+    if not distributor_id:
+        store_directory(client, companies)
+
+
+def export_companies_excel(
     manufacturer_id,
     client_id,
     client_secret,
+    distributor_id=None,
     output_path=None,
     manufacturer_slug=None,   # bv. "MyAquadeck"
-    timeout=30
+    timeout=30,
+    concurrency=None
 ):
     """
-    Haalt alle companies op en verrijkt met customObject-velden:
+    Exporteert companies naar Excel (kolommen COMPANY_COLUMNS), verrijkt
+    met customObject-velden:
       - currency
       - customer price group
       - company discount group
 
-    Voor SUB_DISTRIBUTOR:
-      /customObjects/distributor-{distributorId}/{subDistributorId}
+    Zonder `distributor_id` alle companies; met `distributor_id` enkel die
+    DISTRIBUTOR + diens SUB_DISTRIBUTORS (zie iter_company_rows). De
+    customObjects worden per distributor-type in bulk opgelijst, met
+    `concurrency` calls tegelijk (standaard MAX_IN_FLIGHT). Mislukte calls
+    komen op het tabblad "Fouten".
 
-    Voor DISTRIBUTOR:
-      /customObjects/distributor-{distributorId}/{distributorId}
+    De rijen gaan per pagina meteen naar een StreamingExcelWriter.
+    Retourneert een (teruggespoeld) bestandsobject, of
+    (None, "Onverwachte fout: ...").
     """
     try:
-        # 0. Hulpfuncties
-        def auth_token():
-            token_url = "https://ebusinesscloud.eu.auth0.com/oauth/token"
-            token_payload = {
-                "grant_type": "client_credentials",
-                "client_name": "API USER",
-                "client_id": client_id,
-                "client_secret": client_secret,
-                "audience": "https://ebusinesscloud.eu.auth0.com/api/v2/",
-                "domain": "https://ebusinesscloud.eu.auth0.com"
-            }
-            headers = {"Content-Type": "application/json"}
-            r = requests.post(token_url, json=token_payload, headers=headers, timeout=timeout)
-            r.raise_for_status()
-            return r.json()["access_token"]
-
-        def fetch_custom_object(session, bearer, m_slug, distributor_id, key_id):
-            """
-            GET /api/v1/manufacturers/{m_slug}/customObjects/distributor-{distributor_id}/{key_id}
-            Retourneert dict met keys -> values uit keyValues.
-            """
-            co_url = (
-                f"https://api.hivecpq.com/api/v1/manufacturers/{m_slug}"
-                f"/customObjects/distributor-{distributor_id}/{key_id}"
-            )
-            headers = {"Authorization": f"Bearer {bearer}"}
-            r = session.get(co_url, headers=headers, timeout=timeout)
-            if r.status_code == 404:
-                # Geen customObject voor deze combinatie; stil terugkeren
-                return {}
-            r.raise_for_status()
-            payload = r.json() or {}
-            key_values = payload.get("keyValues", []) or []
-            out = {}
-            for kv in key_values:
-                k = (kv.get("key") or "").strip()
-                v = kv.get("value")
-                out[k] = v
-            return out
-
-        # 1. Token ophalen
-        access_token = auth_token()
-
-        # 2. Bedrijven ophalen
-        companies_url = f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/companies?pageSize=1000"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        with requests.Session() as s:
-            r = s.get(companies_url, headers=headers, timeout=timeout)
-            r.raise_for_status()
-            companies = r.json()
-
-            # 3. "items" uitpakken indien nodig
-            if isinstance(companies, dict) and "items" in companies:
-                companies = companies["items"]
-
-            m_slug = manufacturer_slug or manufacturer_id
-
-            # 4. Data structureren + customObject per bedrijf
-            data = []
-            for company in companies:
-                info = company.get('info', {}) or {}
-                address = info.get('address', {}) or {}
-
-                distributor_name = ''
-                distributor_id = ''
-                key_id_for_custom_object = ''
-
-                ctype = company.get('companyType')
-                cid = company.get('id', '')
-
-                if ctype == 'SUB_DISTRIBUTOR':
-                    sub_settings = company.get('subDistributorSettings', {}) or {}
-                    distributor = sub_settings.get('distributor', {}) or {}
-                    distributor_name = distributor.get('name', '') or ''
-                    distributor_id = distributor.get('id', '') or ''
-                    # customObject key id is subdistributeur id
-                    key_id_for_custom_object = cid
-                elif ctype == 'DISTRIBUTOR':
-                    distributor_name = info.get('name', '') or ''
-                    distributor_id = cid
-                    # customObject key id = distributor id
-                    key_id_for_custom_object = cid
-                else:
-                    # Andere types: geen customObject-call
-                    distributor_name = ''
-                    distributor_id = ''
-                    key_id_for_custom_object = ''
-
-                # Defaults voor de drie nieuwe kolommen
-                currency = ''
-                customer_price_group = ''
-                company_discount_group = ''
-
-                # 4b. CustomObject-call uitvoeren indien van toepassing
-                if distributor_id and key_id_for_custom_object:
-                    try:
-                        kv = fetch_custom_object(
-                            s, access_token, m_slug, distributor_id, key_id_for_custom_object
-                        )
-                        # Exacte keys zoals in je voorbeeld
-                        currency = kv.get('currency', '') or ''
-                        customer_price_group = kv.get('customer price group', '') or ''
-                        company_discount_group = kv.get('company discount group', '') or ''
-                    except requests.HTTPError as e:
-                        # Als de call faalt, laten we de kolommen leeg en gaan door
-                        pass
-
-                # 4c. Rij opbouwen
-                row = {
-                    'id': cid,
-                    'companyType': ctype or '',
-                    'name': (info.get('name') or '').strip(),
-                    'description': (info.get('description') or '').strip(),
-                    'distributor': distributor_name,
-                    'distributorId': distributor_id,
-                    'telephone': info.get('telephone', ''),
-                    'vatNumber': (info.get('vatNumber') or '').strip(),
-                    'email': info.get('email', ''),
-                    'websiteUrl': info.get('websiteUrl', ''),
-                    'preferredLanguage': info.get('preferredLanguage', ''),
-                    'addressLine1': address.get('addressLine1', ''),
-                    'addressLine2': address.get('addressLine2', ''),
-                    'city': address.get('city', ''),
-                    'postalCode': address.get('postalCode', ''),
-                    'countryIso': address.get('countryIso', ''),
-                    # Nieuwe kolommen uit customObject
-                    'currency': currency,
-                    'customer price group': customer_price_group,
-                    'company discount group': company_discount_group,
-                }
-                data.append(row)
-
-        # 5. Kolomvolgorde
-        columns = [
-            'id',
-            'companyType',
-            'name',
-            'description',
-            'distributor',
-            'distributorId',
-            'telephone',
-            'vatNumber',
-            'email',
-            'websiteUrl',
-            'preferredLanguage',
-            'addressLine1',
-            'addressLine2',
-            'city',
-            'postalCode',
-            'countryIso',
-            # nieuwe kolommen (exacte benamingen zoals gevraagd)
-            'currency',
-            'customer price group',
-            'company discount group',
-        ]
-        df = pd.DataFrame(data, columns=columns)
-
-        # 6. Excel maken in-memory
-        output = BytesIO()
-        df.to_excel(output, index=False)
-        output.seek(0)
-
-        # Optioneel: opslaan op schijf
-        if output_path:
-            with open(output_path, 'wb') as f:
-                f.write(output.getbuffer())
-
-        return output  # succes
+        client = HiveClient(manufacturer_id, client_id, client_secret, timeout=timeout)
+        client.token()
+        m_slug = manufacturer_slug or manufacturer_id
+
+        writer = companies_excel_writer()
+        errors = []
+        for page_rows in iter_company_rows(client, m_slug, distributor_id, concurrency, errors):
+            writer.extend("Sheet1", page_rows)
+
+        # Excel afwerken (tijdelijk bestand, pas boven 8 MB op schijf)
+        return close_companies_excel(writer, errors, output_path)
     except Exception as e:
         return None, f"Onverwachte fout: {str(e)}"
+
+
+def get_all_companies_excel(
+    manufacturer_id,
+    client_id,
+    client_secret,
+    output_path=None,
+    manufacturer_slug=None,   # bv. "MyAquadeck"
+    timeout=30,
+    concurrency=None
+):
+    """Alle companies; zie export_companies_excel."""
+    return export_companies_excel(
+        manufacturer_id, client_id, client_secret,
+        output_path=output_path,
+        manufacturer_slug=manufacturer_slug,
+        timeout=timeout,
+        concurrency=concurrency
+    )
@@ -0,0 +1,142 @@
+import asyncio
+
+from api_client import HiveClient
+from api_async import gather_limited, run_sync
+from api_companies import COMPANY_COLUMNS, ERROR_COLUMNS, iter_company_rows
+from api_directory import normalize_name, normalize_vat
+from api_excel import StreamingExcelWriter
+
+# Velden die tussen manufacturers moeten overeenkomen
+COMPARED_FIELDS = ['currency', 'customer price group', 'company discount group']
+
+DIFF_COLUMNS = ['sleutel', 'name', 'companyType', 'verschil', 'veld']
+
+
+def company_key(row):
+    """
+    Sleutel om dezelfde company in verschillende manufacturers terug te
+    vinden; de company-IDs verschillen per manufacturer. Btw-nummer indien
+    ingevuld, anders de (genormaliseerde) naam.
+    """
+    vat = normalize_vat(row.get('vatNumber'))
+    if vat:
+        return f"vat:{vat}"
+    return f"name:{normalize_name(row.get('name'))}"
+
+
+def collect_company_rows(manufacturer_id, client_id, client_secret, concurrency=None):
+    """Alle verrijkte company-rijen van één manufacturer -> (rijen, fouten)."""
+    client = HiveClient(manufacturer_id, client_id, client_secret)
+    client.token()
+    rows = []
+    errors = []
+    for page_rows in iter_company_rows(client, manufacturer_id, concurrency=concurrency, errors=errors):
+        rows.extend(page_rows)
+    return rows, errors
+
+
+async def collect_manufacturers_async(manufacturer_ids, client_id, client_secret, concurrency=None):
+    """
+    collect_company_rows voor alle manufacturers tegelijk (elk met zijn eigen
+    MAX_IN_FLIGHT-limiet). Resultaten in volgorde; exceptions als waarde.
+    """
+    async def collect(manufacturer_id):
+        return await asyncio.to_thread(
+            collect_company_rows, manufacturer_id, client_id, client_secret, concurrency
+        )
+
+    return await gather_limited(collect, manufacturer_ids, len(manufacturer_ids))
+
+
+def diff_companies(rows_by_manufacturer):
+    """
+    Vergelijkt company-rijen per manufacturer ({manufacturer_id: rijen}) op
+    company_key. Geeft diff-rijen terug met DIFF_COLUMNS plus één kolom per
+    manufacturer:
+      - verschil "ontbreekt": de kolom toont het company-ID of ONTBREEKT
+      - verschil "gewijzigd": één rij per veld uit COMPARED_FIELDS dat
+        verschilt; de kolommen tonen de waarde per manufacturer
+      - verschil "dubbele sleutel": de sleutel komt meermaals voor binnen
+        een manufacturer; enkel de eerste rij wordt vergeleken
+    Volgorde: in de volgorde waarin de sleutels voor het eerst voorkomen.
+    """
+    manufacturer_ids = list(rows_by_manufacturer)
+    indexed = {mid: {} for mid in manufacturer_ids}
+    keys = {}
+    diffs = []
+
+    def diff_row(key, row, verschil, veld, values):
+        out = {
+            'sleutel': key,
+            'name': row.get('name', ''),
+            'companyType': row.get('companyType', ''),
+            'verschil': verschil,
+            'veld': veld,
+        }
+        out.update(values)
+        return out
+
+    for mid, rows in rows_by_manufacturer.items():
+        for row in rows:
+            key = company_key(row)
+            keys.setdefault(key, row)
+            if key in indexed[mid]:
+                diffs.append(diff_row(key, row, 'dubbele sleutel', '', {mid: row.get('id', '')}))
+                continue
+            indexed[mid][key] = row
+
+    for key, first_row in keys.items():
+        present = {mid: indexed[mid][key] for mid in manufacturer_ids if key in indexed[mid]}
+        if len(present) < len(manufacturer_ids):
+            diffs.append(diff_row(key, first_row, 'ontbreekt', '', {
+                mid: present[mid].get('id', '') if mid in present else 'ONTBREEKT'
+                for mid in manufacturer_ids
+            }))
+        if len(present) < 2:
+            continue
+        for field in COMPARED_FIELDS:
+            values = {mid: row.get(field, '') or '' for mid, row in present.items()}
+            if len(set(values.values())) > 1:
+                diffs.append(diff_row(key, first_row, 'gewijzigd', field, values))
+    return diffs
+
+
+def compare_manufacturers_excel(manufacturer_ids, client_id, client_secret, concurrency=None, output_path=None):
+    """
+    Exporteert de companies (met customObject-velden) van meerdere
+    manufacturers tegelijk en vergelijkt ze (zie diff_companies).
+
+    Excel: tabblad "Verschillen", daarna één tabblad per manufacturer met de
+    volledige export en eventueel "Fouten" (mislukte customObject-calls).
+    Retourneert (bestandsobject, diff-rijen, None) of (None, None, fout).
+    """
+    try:
+        manufacturer_ids = list(dict.fromkeys(m.strip() for m in manufacturer_ids if m and m.strip()))
+        if len(manufacturer_ids) < 2:
+            return None, None, "Geef minstens twee manufacturer IDs op."
+
+        results = run_sync(collect_manufacturers_async(manufacturer_ids, client_id, client_secret, concurrency))
+        rows_by_manufacturer = {}
+        errors = []
+        for mid, result in zip(manufacturer_ids, results):
+            if isinstance(result, Exception):
+                return None, None, f"Fout bij ophalen van {mid}: {result}"
+            rows, mid_errors = result
+            rows_by_manufacturer[mid] = rows
+            errors += [dict(error, manufacturer=mid) for error in mid_errors]
+
+        diffs = diff_companies(rows_by_manufacturer)
+
+        writer = StreamingExcelWriter()
+        writer.add_sheet("Verschillen", DIFF_COLUMNS + manufacturer_ids)
+        writer.extend("Verschillen", diffs)
+        for mid, rows in rows_by_manufacturer.items():
+            # Excel: tabbladnamen max. 31 tekens
+            writer.add_sheet(mid[:31], COMPANY_COLUMNS)
+            writer.extend(mid[:31], rows)
+        if errors:
+            writer.add_sheet("Fouten", ['manufacturer'] + ERROR_COLUMNS)
+            writer.extend("Fouten", errors)
+        return writer.close(output_path), diffs, None
+    except Exception as e:
+        return None, None, f"Onverwachte fout: {str(e)}"
@@ -0,0 +1,84 @@
+import os
+
+# Alle endpoints en netwerkinstellingen op één plek. Standaard de echte
+# HiveCPQ/Auth0-omgeving; via omgevingsvariabelen of configure() kan alles
+# naar een andere omgeving (bv. een lokale mock) wijzen.
+AUTH_DOMAIN = os.environ.get("HIVECPQ_AUTH_DOMAIN", "https://ebusinesscloud.eu.auth0.com")
+CONNECT_BASE_URL = os.environ.get("HIVECPQ_BASE_URL", "https://connect.hivecpq.com/api/v1")
+API_BASE_URL = os.environ.get("HIVECPQ_API_BASE_URL", "https://api.hivecpq.com/api/v1")
+
+# (connect, read) timeouts in seconden
+CONNECT_TIMEOUT = float(os.environ.get("HIVECPQ_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("HIVECPQ_READ_TIMEOUT", "60"))
+
+# Aantal keep-alive connecties per host in de gedeelde Session
+POOL_SIZE = int(os.environ.get("HIVECPQ_POOL_SIZE", "20"))
+
+# Standaard pagina-grootte voor lijst-endpoints
+PAGE_SIZE = int(os.environ.get("HIVECPQ_PAGE_SIZE", "1000"))
+
+# Max. gelijktijdige requests per manufacturer (over alle sessies heen)
+MAX_IN_FLIGHT = int(os.environ.get("HIVECPQ_MAX_IN_FLIGHT", "8"))
+
+# Token bucket per (manufacturer, endpoint-familie), in requests/seconde.
+# Start op RATE_START en groeit tot de eerste 429 met x RATE_SLOW_START per
+# geslaagde call, daarna met +RATE_INCREASE, nooit boven RATE_MAX.
+# Bij een 429 x RATE_DECREASE tot minimaal RATE_MIN.
+RATE_START = float(os.environ.get("HIVECPQ_RATE_START", "10"))
+RATE_MIN = float(os.environ.get("HIVECPQ_RATE_MIN", "0.5"))
+RATE_MAX = float(os.environ.get("HIVECPQ_RATE_MAX", "100"))
+RATE_SLOW_START = float(os.environ.get("HIVECPQ_RATE_SLOW_START", "1.1"))
+RATE_INCREASE = float(os.environ.get("HIVECPQ_RATE_INCREASE", "0.5"))
+RATE_DECREASE = float(os.environ.get("HIVECPQ_RATE_DECREASE", "0.5"))
+# Aantal keer dat een 429 opnieuw geprobeerd wordt
+MAX_THROTTLE_RETRIES = int(os.environ.get("HIVECPQ_MAX_THROTTLE_RETRIES", "5"))
+
+# De company directory (api_directory) wordt zoveel seconden gecachet.
+# Per-distributeur-exports zonder verse directory gebruiken het server-side
+# filter ?{COMPANY_DISTRIBUTOR_FILTER}={distributorId} zolang de API het
+# ondersteunt; leeg = nooit proberen.
+COMPANY_DIRECTORY_TTL = float(os.environ.get("HIVECPQ_COMPANY_DIRECTORY_TTL", "300"))
+COMPANY_DISTRIBUTOR_FILTER = os.environ.get("HIVECPQ_COMPANY_DISTRIBUTOR_FILTER", "distributorId")
+
+# Server-side filter op orderstatus voor projectSegments (api_selection);
+# er wordt altijd ook lokaal gefilterd. Leeg = nooit meesturen.
+SEGMENT_ORDER_STATUS_FILTER = os.environ.get("HIVECPQ_SEGMENT_ORDER_STATUS_FILTER", "orderStatus")
+
+# Lokale SQLite-mirror van projectSegments/projectSegmentItems (api_mirror).
+# Na MIRROR_FULL_REFRESH_HOURS wordt alles opnieuw geladen, zodat ook
+# verwijderde records uit de mirror verdwijnen.
+MIRROR_PATH = os.environ.get("HIVECPQ_MIRROR_PATH", "hivecpq_mirror.sqlite3")
+MIRROR_FULL_REFRESH_HOURS = float(os.environ.get("HIVECPQ_MIRROR_FULL_REFRESH_HOURS", "24"))
+
+# Cache van BOM_ONLY-configuraties (api_bomcache): zoveel seconden geldig
+# (0 = niet cachen), in het geheugen max. BOM_CACHE_MAX_MB; met
+# BOM_CACHE_DIR ook op schijf. Kort, want een gewijzigde configuratie geeft
+# zolang nog de oude BOM (tenzij de export met refresh loopt).
+BOM_CACHE_TTL = float(os.environ.get("HIVECPQ_BOM_CACHE_TTL", "60"))
+BOM_CACHE_MAX_MB = float(os.environ.get("HIVECPQ_BOM_CACHE_MAX_MB", "256"))
+BOM_CACHE_DIR = os.environ.get("HIVECPQ_BOM_CACHE_DIR", "")
+
+# Snapshot-store van platgeslagen BOMs (api_bomsnapshot; leeg = uit).
+# Configuraties van segmenten in één van de BOM_FROZEN_ORDER_STATUSES
+# wijzigen niet meer en worden na de eerste export uit de store gelezen.
+BOM_SNAPSHOT_PATH = os.environ.get("HIVECPQ_BOM_SNAPSHOT_PATH", "hivecpq_bom_snapshots.sqlite3")
+BOM_FROZEN_ORDER_STATUSES = tuple(
+    status.strip()
+    for status in os.environ.get("HIVECPQ_BOM_FROZEN_ORDER_STATUSES", "CONFIRMED,IN_PRODUCTION,SHIPPED").split(",")
+    if status.strip()
+)
+
+
+def configure(**settings):
+    """
+    Overschrijft instellingen at runtime, bv.
+    configure(CONNECT_BASE_URL="http://127.0.0.1:8080/api/v1").
+    """
+    for name, value in settings.items():
+        if name not in globals() or not name.isupper():
+            raise ValueError(f"Onbekende instelling: {name}")
+        globals()[name] = value
+
+
+def default_timeout():
+    return (CONNECT_TIMEOUT, READ_TIMEOUT)
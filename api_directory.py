@@ -0,0 +1,183 @@
+import re
+import threading
+import time
+
+import api_config
+
+_cache = {}          # (base_url, manufacturer_id) -> (geldig_tot, CompanyDirectory)
+_key_locks = {}      # (base_url, manufacturer_id) -> threading.Lock
+_registry_lock = threading.Lock()
+
+
+def normalize_name(value):
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def normalize_vat(value):
+    return re.sub(r"[^0-9A-Za-z]", "", str(value or "")).upper()
+
+
+def normalize_email(value):
+    return str(value or "").strip().lower()
+
+
+def parent_distributor_id(company):
+    """ID van de distributeur boven een SUB_DISTRIBUTOR, anders ''."""
+    sub_settings = company.get('subDistributorSettings', {}) or {}
+    return (sub_settings.get('distributor', {}) or {}).get('id', '') or ''
+
+
+def belongs_to_distributor(company, distributor_id):
+    """De distributeur zelf of één van zijn subdistributeurs."""
+    ctype = company.get('companyType')
+    if ctype == 'DISTRIBUTOR':
+        return company.get('id', '') == distributor_id
+    if ctype == 'SUB_DISTRIBUTOR':
+        return parent_distributor_id(company) == distributor_id
+    return False
+
+
+def iter_company_pages(client, params=None, page_size=None):
+    """
+    Yieldt de companies pagina per pagina tot het einde van de lijst
+    (HiveCPQ geeft max. 1000 per pagina). Met api_async.prefetch() errond
+    wordt de volgende pagina al opgehaald terwijl de huidige verwerkt wordt.
+    """
+    return client.iter_pages("companies", page_size=page_size, params=params)
+
+
+def fetch_companies(client, params=None):
+    """Alle companies (alle pagina's) als één lijst."""
+    companies = []
+    for page in iter_company_pages(client, params):
+        companies.extend(page)
+    return companies
+
+
+class CompanyDirectory:
+    """
+    Alle companies van één manufacturer in API-volgorde, geïndexeerd op id,
+    naam, btw-nummer en e-mail, plus distributeur -> subdistributeurs.
+    Namen, btw-nummers en e-mails worden genormaliseerd vergeleken; die
+    lookups geven een lijst terug omdat ze niet uniek hoeven te zijn.
+    """
+
+    def __init__(self, companies):
+        self.companies = companies
+        self.by_id = {}
+        self.by_name = {}
+        self.by_vat = {}
+        self.by_email = {}
+        self.distributors = {}   # distributor_id -> positie
+        self.children = {}       # distributor_id -> [posities van subdistributeurs]
+        for n, company in enumerate(companies):
+            info = company.get('info', {}) or {}
+            self.by_id[company.get('id', '')] = company
+            for index, key in (
+                (self.by_name, normalize_name(info.get('name'))),
+                (self.by_vat, normalize_vat(info.get('vatNumber'))),
+                (self.by_email, normalize_email(info.get('email'))),
+            ):
+                if key:
+                    index.setdefault(key, []).append(company)
+            ctype = company.get('companyType')
+            if ctype == 'DISTRIBUTOR':
+                self.distributors[company.get('id', '')] = n
+            elif ctype == 'SUB_DISTRIBUTOR':
+                self.children.setdefault(parent_distributor_id(company), []).append(n)
+
+    def get(self, company_id):
+        return self.by_id.get(company_id)
+
+    def find_by_name(self, name, company_type=None):
+        return _of_type(self.by_name.get(normalize_name(name), []), company_type)
+
+    def find_by_vat(self, vat_number, company_type=None):
+        return _of_type(self.by_vat.get(normalize_vat(vat_number), []), company_type)
+
+    def find_by_email(self, email, company_type=None):
+        return _of_type(self.by_email.get(normalize_email(email), []), company_type)
+
+    def resolve(self, company_id=None, name=None, vat_number=None, email=None, company_type=None):
+        """
+        Eén company: op id, anders de enige match op btw-nummer, e-mail of
+        naam (in die volgorde). None als er geen eenduidige match is.
+        """
+        if company_id:
+            company = self.get(company_id)
+            if company and (company_type is None or company.get('companyType') == company_type):
+                return company
+            return None
+        for matches in (
+            self.find_by_vat(vat_number, company_type) if vat_number else [],
+            self.find_by_email(email, company_type) if email else [],
+            self.find_by_name(name, company_type) if name else [],
+        ):
+            if len(matches) == 1:
+                return matches[0]
+        return None
+
+    def for_distributor(self, distributor_id):
+        """De distributeur en zijn subdistributeurs, in API-volgorde."""
+        positions = list(self.children.get(distributor_id, []))
+        if distributor_id in self.distributors:
+            positions.append(self.distributors[distributor_id])
+        return [self.companies[n] for n in sorted(positions)]
+
+
+def _of_type(companies, company_type):
+    if company_type is None:
+        return list(companies)
+    return [c for c in companies if c.get('companyType') == company_type]
+
+
+def _cache_key(client):
+    return (api_config.CONNECT_BASE_URL, client.manufacturer_id)
+
+
+def _lock_for(key):
+    with _registry_lock:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def cached_directory(client):
+    """De gecachete directory als die nog vers is, anders None (geen API-call)."""
+    entry = _cache.get(_cache_key(client))
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def get_directory(client, refresh=False):
+    """
+    CompanyDirectory van client.manufacturer_id, COMPANY_DIRECTORY_TTL
+    seconden gecachet (over alle Streamlit-sessies heen). Vragen meerdere
+    threads tegelijk een verlopen directory op, dan haalt er maar één de
+    lijst op. Met `refresh` wordt altijd opnieuw opgehaald.
+    """
+    key = _cache_key(client)
+    directory = None if refresh else cached_directory(client)
+    if directory:
+        return directory
+    with _lock_for(key):
+        directory = None if refresh else cached_directory(client)
+        if directory:
+            return directory
+        return store_directory(client, fetch_companies(client))
+
+
+def store_directory(client, companies):
+    """Cachet een directory over een volledig opgehaalde companies-lijst."""
+    directory = CompanyDirectory(companies)
+    _cache[_cache_key(client)] = (time.monotonic() + api_config.COMPANY_DIRECTORY_TTL, directory)
+    return directory
+
+
+def invalidate_directory(manufacturer_id=None):
+    """Vergeet de directory (van één manufacturer); aanroepen na elke company-write."""
+    for key in list(_cache):
+        if manufacturer_id is None or key[1] == manufacturer_id:
+            _cache.pop(key, None)
@@ -1,7 +1,9 @@
 import requests
-import json
 import pandas as pd
 import re
+from api_client import HiveClient
+from api_directory import get_directory, invalidate_directory
+from api_token import token_error_text
 
 def get_country_code(country_str):
     COUNTRY_MAP = {
@@ -82,26 +84,23 @@ def verwerk_distributeur(df, row_number, manufacturer_id, client_id, client_secr
 
         # Token ophalen
         l("🔐 Token ophalen...")
-        token_response = requests.post(
-            "https://ebusinesscloud.eu.auth0.com/oauth/token",
-            headers={"Content-Type": "application/json"},
-            json={
-                "grant_type": "client_credentials",
-                "client_id": client_id,
-                "client_secret": client_secret,
-                "audience": "https://ebusinesscloud.eu.auth0.com/api/v2/"
-            }
-        )
-        if token_response.status_code != 200:
-            return f"❌ Token ophalen mislukt: {token_response.text}"
-        access_token = token_response.json()["access_token"]
-        api_headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
+        client = HiveClient(manufacturer_id, client_id, client_secret)
+        try:
+            client.token()
+        except requests.HTTPError as e:
+            return f"❌ Token ophalen mislukt: {token_error_text(e)}"
 
         url = val("Link of the distributor as known in Hive (copy link from your URL and paste it in the response field beneath)", row)
         company_id = extract_company_id_from_url(url)
+        if not company_id:
+            # Geen bruikbare URL: opzoeken in de (gecachete) company directory
+            company = get_directory(client).resolve(
+                name=val("Company Name of Distributor", row),
+                vat_number=val("VAT Number", row),
+                email=val("Email address of the company (please provide ONLY 1 mail-address)", row),
+                company_type="DISTRIBUTOR"
+            )
+            company_id = company["id"] if company else None
         if not company_id:
             return "❌ Ongeldige Hive-URL voor company ID."
 
@@ -132,9 +131,8 @@ def verwerk_distributeur(df, row_number, manufacturer_id, client_id, client_secr
                 "companyName": val("Company Name of Distributor", row)
             }
 
-            resp = requests.post(
-                f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/companies/{company_id}/defaultAddresses",
-                headers=api_headers,
+            resp = client.post(
+                f"companies/{company_id}/defaultAddresses",
                 json=invoice_payload
             )
             l(f"📥 INVOICE status: {resp.status_code}")
@@ -174,15 +172,18 @@ def verwerk_distributeur(df, row_number, manufacturer_id, client_id, client_secr
                 "canChangeAddressOnPlaceOrder": True
             }
 
-            resp = requests.post(
-                f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/companies/{company_id}/defaultAddresses",
-                headers=api_headers,
+            resp = client.post(
+                f"companies/{company_id}/defaultAddresses",
                 json=delivery_payload
             )
             l(f"📦 DELIVERY status: {resp.status_code}")
             if resp.status_code != 201:
                 return f"❌ Fout bij toevoegen delivery-adres: {resp.text}"
 
+        if not basic_data_ready:
+            # Adressen gewijzigd: gecachete company directory vernieuwen
+            invalidate_directory(manufacturer_id)
+
         l("🧩 Custom object toevoegen...")
         price_group_stripped = strip_before_parenthesis(val("Price Group for Distributor", row))
         discount_group_stripped = strip_before_parenthesis(val("Discount Group for Distributor (Aquadeck)", row))
@@ -205,9 +206,8 @@ def verwerk_distributeur(df, row_number, manufacturer_id, client_id, client_secr
             ]
         }
 
-        resp = requests.post(
-            f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/customObjects/distributor-{company_id}/bulkUpsert",
-            headers=api_headers,
+        resp = client.post(
+            f"customObjects/distributor-{company_id}/bulkUpsert",
             json=bulk_payload
         )
         l(f"🔁 bulkUpsert status: {resp.status_code}")
@@ -215,8 +215,10 @@ def verwerk_distributeur(df, row_number, manufacturer_id, client_id, client_secr
             return f"❌ Fout bij bulk upsert: {resp.text}"
 
         l("♻️ Reset custom object timestamp...")
-        reset_url = f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/resetCustomObjectUpdateTimestamp"
-        reset_resp = requests.post(reset_url, headers=api_headers)
+        reset_resp = client.post(
+            "resetCustomObjectUpdateTimestamp",
+            headers={"Content-Type": "application/json"}
+        )
         l(f"🔁 Reset status: {reset_resp.status_code}")
         if reset_resp.status_code != 204:
             return f"❌ Fout bij reset timestamp: {reset_resp.text}"
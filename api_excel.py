@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+
+from openpyxl import Workbook
+
+
+def open_temp_file(path):
+    """
+    Opent een tijdelijk bestand als BufferedReader (dat aanvaardt
+    st.download_button, een SpooledTemporaryFile niet) en verwijdert het
+    pad meteen; het bestand zelf blijft leesbaar tot het gesloten wordt.
+    Waar dat niet kan (Windows) blijft het in de temp-map staan.
+    """
+    output = open(path, "rb")
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return output
+
+
+def spool_chunks(chunks):
+    """
+    Schrijft tekstblokken uit een generator (bv. een CSV-export) als UTF-8
+    weg naar een tijdelijk bestand en geeft dat als BufferedReader terug
+    (zie open_temp_file); het geheugen groeit niet met de export.
+    """
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk.encode("utf-8"))
+    except BaseException:
+        os.remove(path)
+        raise
+    return open_temp_file(path)
+
+
+class StreamingExcelWriter:
+    """
+    Schrijft een .xlsx rij per rij met openpyxl in write_only-modus: de
+    rijen gaan meteen naar een tijdelijk bestand per tabblad, zodat het
+    geheugengebruik niet groeit met het aantal rijen.
+
+        writer = StreamingExcelWriter()
+        writer.add_sheet("Sheet1", COLUMNS)
+        for row in rows:
+            writer.append("Sheet1", row)
+        output = writer.close()   # BufferedReader, klaar om te lezen
+
+    Tabbladen verschijnen in de volgorde waarin ze aangemaakt worden.
+    """
+
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+        self.sheets = {}   # titel -> (worksheet, kolommen)
+
+    def add_sheet(self, title, columns):
+        worksheet = self.workbook.create_sheet(title)
+        worksheet.append(list(columns))
+        self.sheets[title] = (worksheet, list(columns))
+
+    def append(self, title, row):
+        """Voegt een dict-rij toe; ontbrekende kolommen blijven leeg."""
+        worksheet, columns = self.sheets[title]
+        worksheet.append([_cell(row.get(column)) for column in columns])
+
+    def extend(self, title, rows):
+        for row in rows:
+            self.append(title, row)
+
+    def close(self, output_path=None):
+        """
+        Bewaart de workbook in een tijdelijk bestand en geeft dat geopend
+        als BufferedReader terug (zie open_temp_file). Met `output_path`
+        wordt ook een kopie op schijf gezet.
+        """
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        try:
+            self.workbook.save(path)
+            # Optioneel: opslaan op schijf
+            if output_path:
+                shutil.copyfile(path, output_path)
+        except BaseException:
+            os.remove(path)
+            raise
+        return open_temp_file(path)
+
+
+def _cell(value):
+    # Zoals pandas: lege waarden worden lege cellen
+    if value is None or value == "":
+        return None
+    return value
@@ -1,49 +1,66 @@
-import requests
 import csv
 import io
+from api_client import HiveClient
+from api_mirror import iter_mirrored_pages
 
-def get_all_project_segment_items_csv(manufacturer_id, client_id, client_secret):
-    try:
-        token_url = "https://ebusinesscloud.eu.auth0.com/oauth/token"
-        token_payload = {
-            "grant_type": "client_credentials",
-            "client_name": "API USER",
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "audience": "https://ebusinesscloud.eu.auth0.com/api/v2/",
-            "domain": "https://ebusinesscloud.eu.auth0.com"
-        }
-        token_headers = {"Content-Type": "application/json"}
-        token_resp = requests.post(token_url, json=token_payload, headers=token_headers)
-        token_resp.raise_for_status()
-        access_token = token_resp.json()["access_token"]
+SEGMENT_ITEM_FIELDS = [
+    'id', 'name', 'list_price', 'discount', 'purchase_price',
+    'sales_price', 'currency', 'markup', 'status'
+]
+
+def segment_item_row(item):
+    price = item.get('price', {}) or {}
+    return {
+        'id': item.get('id', ''),
+        'name': item.get('name', ''),
+        'list_price': price.get('listPrice', ''),
+        'discount': price.get('discount', ''),
+        'purchase_price': price.get('purchasePrice', ''),
+        'sales_price': price.get('salesPrice', ''),
+        'currency': price.get('currency', ''),
+        'markup': price.get('markup', ''),
+        'status': (item.get('projectSegment', {}) or {}).get('orderStatus', ''),
+    }
 
-        data_url = f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/projectSegmentItems?pageSize=10000"
-        data_headers = {"Authorization": f"Bearer {access_token}"}
-        data_resp = requests.get(data_url, headers=data_headers)
-        data_resp.raise_for_status()
-        items = data_resp.json()
-        if isinstance(items, dict) and "items" in items:
-            items = items["items"]
-        output = io.StringIO()
-        fieldnames = [
-            'id', 'name', 'list_price', 'discount', 'purchase_price',
-            'sales_price', 'currency', 'markup', 'status'
-        ]
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
+def iter_project_segment_item_rows(client, page_size=None, use_mirror=False):
+    """
+    Yieldt een CSV-rij (dict) per projectSegmentItem, over alle pagina's.
+    Met `use_mirror` komen de items uit de lokale mirror (api_mirror), die
+    eerst enkel de gewijzigde items ophaalt.
+    """
+    if use_mirror:
+        pages = iter_mirrored_pages(client, "projectSegmentItems", page_size=page_size)
+    else:
+        pages = client.iter_pages("projectSegmentItems", page_size=page_size)
+    for items in pages:
         for item in items:
-            writer.writerow({
-                'id': item.get('id', ''),
-                'name': item.get('name', ''),
-                'list_price': item.get('price', {}).get('listPrice', ''),
-                'discount': item.get('price', {}).get('discount', ''),
-                'purchase_price': item.get('price', {}).get('purchasePrice', ''),
-                'sales_price': item.get('price', {}).get('salesPrice', ''),
-                'currency': item.get('price', {}).get('currency', ''),
-                'markup': item.get('price', {}).get('markup', ''),
-                'status': item.get('projectSegment', {}).get('orderStatus', ''),
-            })
-        return output.getvalue()
+            yield segment_item_row(item)
+
+def iter_project_segment_items_csv(manufacturer_id, client_id, client_secret, page_size=None, chunk_rows=1000,
+                                   use_mirror=False):
+    """
+    Yieldt de CSV als tekstblokken van `chunk_rows` rijen (het eerste blok
+    begint met de header). Er zit nooit meer dan één pagina in het geheugen.
+    """
+    client = HiveClient(manufacturer_id, client_id, client_secret)
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=SEGMENT_ITEM_FIELDS)
+    writer.writeheader()
+    rows_in_chunk = 0
+    for row in iter_project_segment_item_rows(client, page_size, use_mirror=use_mirror):
+        writer.writerow(row)
+        rows_in_chunk += 1
+        if rows_in_chunk >= chunk_rows:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+            rows_in_chunk = 0
+    yield output.getvalue()
+
+def get_all_project_segment_items_csv(manufacturer_id, client_id, client_secret, use_mirror=False):
+    try:
+        return "".join(iter_project_segment_items_csv(
+            manufacturer_id, client_id, client_secret, use_mirror=use_mirror
+        ))
     except Exception as e:
         return None, f"Onverwachte fout: {str(e)}"
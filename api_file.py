@@ -1,66 +1,72 @@
-import requests
 import csv
 import io
+from api_client import HiveClient
+from api_async import iter_pages_parallel
+from api_mirror import iter_mirrored_pages
 
-def get_all_project_segments_csv(manufacturer_id, client_id, client_secret):
-    try:
-        # 1. Token ophalen
-        token_url = "https://ebusinesscloud.eu.auth0.com/oauth/token"
-        token_payload = {
-            "grant_type": "client_credentials",
-            "client_name": "API USER",
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "audience": "https://ebusinesscloud.eu.auth0.com/api/v2/",
-            "domain": "https://ebusinesscloud.eu.auth0.com"
-        }
-        token_headers = {"Content-Type": "application/json"}
-        token_resp = requests.post(token_url, json=token_payload, headers=token_headers)
-        token_resp.raise_for_status()
-        access_token = token_resp.json()["access_token"]
+SEGMENT_FIELDS = [
+    'root.id',  # Nieuw: rootobject ID
+    'project.id', 'project.name', 'listPrice', 'purchasePrice', 'subDistributorPurchasePrice', 'salesPrice',
+    'currency', 'orderStatus', 'status', 'projectSegmentItems'
+]
+
+def segment_row(seg):
+    order = seg.get('order', {}) or {}
+    price = seg.get('price', {}) or {}
+    project = seg.get('project', {}) or {}
+    segment_items = seg.get('projectSegmentItems', []) or []
 
-        # 2. Data ophalen
-        data_url = f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/projectSegments?pageSize=10000"
-        data_headers = {"Authorization": f"Bearer {access_token}"}
-        data_resp = requests.get(data_url, headers=data_headers)
-        data_resp.raise_for_status()
-        segments = data_resp.json()
+    return {
+        'root.id': seg.get('id', ''),  # Vul het rootobject ID in
+        'project.id': project.get('id', ''),
+        'project.name': project.get('name', ''),
+        'listPrice': price.get('listPrice', ''),
+        'purchasePrice': price.get('purchasePrice', ''),
+        'subDistributorPurchasePrice': price.get('subDistributorPurchasePrice', ''),
+        'salesPrice': price.get('salesPrice', ''),
+        'currency': price.get('currency', ''),
+        'orderStatus': order.get('orderStatus', ''),
+        'status': seg.get('status', ''),
+        'projectSegmentItems': "; ".join(
+            item.get('id', '') for item in segment_items
+        )
+    }
 
-        # 3. Items uit de lijst halen
-        if isinstance(segments, dict) and "items" in segments:
-            segments = segments["items"]
+def iter_project_segments_csv(manufacturer_id, client_id, client_secret, page_size=None, concurrency=None,
+                              use_mirror=False):
+    """
+    Yieldt de segments-CSV als tekstblokken: eerst de header, daarna één blok
+    per pagina, in paginavolgorde. Pagina 1 levert het totaal; de rest wordt
+    met maximaal `concurrency` requests tegelijk opgehaald. Met `use_mirror`
+    komen de segments uit de lokale mirror (api_mirror), die eerst enkel de
+    gewijzigde segments ophaalt.
+    """
+    # 1. Client (token wordt gecachet)
+    client = HiveClient(manufacturer_id, client_id, client_secret)
 
-        # 4. CSV schrijven (naar in-memory string)
-        output = io.StringIO()
-        fieldnames = [
-            'root.id',  # Nieuw: rootobject ID
-            'project.id', 'project.name', 'listPrice', 'purchasePrice', 'subDistributorPurchasePrice', 'salesPrice',
-            'currency', 'orderStatus', 'status', 'projectSegmentItems'
-        ]
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
+    # 2. CSV-header
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=SEGMENT_FIELDS)
+    writer.writeheader()
+    yield output.getvalue()
 
-        for seg in segments:
-            order = seg.get('order', {})
-            price = seg.get('price', {})
-            project = seg.get('project', {})
-            segment_items = seg.get('projectSegmentItems', [])
+    # 3. Pagina's ophalen en in volgorde wegschrijven
+    if use_mirror:
+        pages = iter_mirrored_pages(client, "projectSegments", page_size=page_size, concurrency=concurrency)
+    else:
+        pages = iter_pages_parallel(client, "projectSegments", page_size=page_size, concurrency=concurrency)
+    for segments in pages:
+        output.seek(0)
+        output.truncate()
+        writer.writerows(segment_row(seg) for seg in segments)
+        yield output.getvalue()
 
-            writer.writerow({
-                'root.id': seg.get('id', ''),  # Vul het rootobject ID in
-                'project.id': project.get('id', ''),
-                'project.name': project.get('name', ''),
-                'listPrice': price.get('listPrice', ''),
-                'purchasePrice': price.get('purchasePrice', ''),
-                'subDistributorPurchasePrice': price.get('subDistributorPurchasePrice', ''),
-                'salesPrice': price.get('salesPrice', ''),
-                'currency': price.get('currency', ''),
-                'orderStatus': order.get('orderStatus', ''),
-                'status': seg.get('status', ''),
-                'projectSegmentItems': "; ".join(
-                    item.get('id', '') for item in segment_items
-                )
-            })
-        return output.getvalue()
+def get_all_project_segments_csv(manufacturer_id, client_id, client_secret, page_size=None, concurrency=None,
+                                 use_mirror=False):
+    try:
+        return "".join(iter_project_segments_csv(
+            manufacturer_id, client_id, client_secret, page_size=page_size, concurrency=concurrency,
+            use_mirror=use_mirror
+        ))
     except Exception as e:
         return None, f"Onverwachte fout: {str(e)}"
@@ -0,0 +1,225 @@
+import contextlib
+import contextvars
+import os
+import re
+import threading
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Histogram-grenzen (seconden) voor de Prometheus-export
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Aantal recente latencies per endpoint waaruit percentielen berekend worden
+SAMPLE_SIZE = 2048
+
+_HEX_ID = r"[0-9a-fA-F]{32}"
+_MANUFACTURER_PREFIX = re.compile(r"^.*?/manufacturers/[^/]+")
+
+
+def endpoint_template(url):
+    """
+    Herleidt een URL tot zijn endpoint-template, bv.
+    .../manufacturers/X/customObjects/distributor-ab12.../cd34...
+    -> /customObjects/distributor-{id}/{key}
+    """
+    path = urlsplit(url).path
+    path = _MANUFACTURER_PREFIX.sub("", path)
+    segments = path.strip("/").split("/")
+    out = []
+    for n, segment in enumerate(segments):
+        previous = segments[n - 1] if n else ""
+        if n >= 2 and segments[n - 2] == "customObjects" and segment != "bulkUpsert":
+            segment = "{key}"
+        elif re.fullmatch(_HEX_ID, segment):
+            segment = "{id}"
+        elif re.fullmatch(r"distributor-" + _HEX_ID, segment):
+            segment = "distributor-{id}"
+        elif previous == "versions":
+            segment = "{version}"
+        elif n >= 1 and previous in ("projects", "projectSegments", "projectSegmentItems",
+                                     "configurations", "companies", "components"):
+            segment = "{id}"
+        out.append(segment)
+    return "/" + "/".join(out)
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.total_seconds = 0.0
+        self.statuses = Counter()
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, status, seconds, size):
+        self.count += 1
+        self.bytes += size
+        self.total_seconds += seconds
+        self.statuses[status] += 1
+        self.samples.append(seconds)
+        for n, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[n] += 1
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+
+class MetricsRegistry:
+    """Request-statistieken per (method, endpoint-template)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, method, endpoint, status, seconds, size):
+        with self.lock:
+            stats = self.endpoints.get((method, endpoint))
+            if stats is None:
+                stats = self.endpoints[(method, endpoint)] = EndpointStats()
+            stats.add(status, seconds, size)
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def total_requests(self):
+        with self.lock:
+            return sum(stats.count for stats in self.endpoints.values())
+
+    def table(self):
+        """Eén dict per endpoint, gesorteerd op totale tijd (traagste eerst)."""
+        with self.lock:
+            rows = []
+            for (method, endpoint), stats in self.endpoints.items():
+                rows.append({
+                    "endpoint": endpoint,
+                    "method": method,
+                    "count": stats.count,
+                    "errors": sum(n for status, n in stats.statuses.items() if status >= 400),
+                    "statuses": ", ".join(f"{s}: {n}" for s, n in sorted(stats.statuses.items())),
+                    "bytes": stats.bytes,
+                    "total_s": round(stats.total_seconds, 3),
+                    "p50_ms": round(stats.percentile(0.50) * 1000, 1),
+                    "p90_ms": round(stats.percentile(0.90) * 1000, 1),
+                    "p99_ms": round(stats.percentile(0.99) * 1000, 1),
+                    "max_ms": round(max(stats.samples, default=0.0) * 1000, 1),
+                })
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def prometheus_text(self):
+        """Dump in het Prometheus text exposition format."""
+        lines = [
+            "# HELP hivecpq_requests_total HTTP requests naar HiveCPQ/Auth0.",
+            "# TYPE hivecpq_requests_total counter",
+        ]
+        with self.lock:
+            items = sorted(self.endpoints.items())
+            for (method, endpoint), stats in items:
+                for status, n in sorted(stats.statuses.items()):
+                    labels = _labels(method=method, endpoint=endpoint, status=str(status))
+                    lines.append(f"hivecpq_requests_total{{{labels}}} {n}")
+            lines += [
+                "# HELP hivecpq_response_bytes_total Ontvangen response bytes.",
+                "# TYPE hivecpq_response_bytes_total counter",
+            ]
+            for (method, endpoint), stats in items:
+                lines.append(f"hivecpq_response_bytes_total{{{_labels(method=method, endpoint=endpoint)}}} {stats.bytes}")
+            lines += [
+                "# HELP hivecpq_request_duration_seconds Latency per request.",
+                "# TYPE hivecpq_request_duration_seconds histogram",
+            ]
+            for (method, endpoint), stats in items:
+                base = _labels(method=method, endpoint=endpoint)
+                for bound, n in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append(f'hivecpq_request_duration_seconds_bucket{{{base},le="{bound}"}} {n}')
+                lines.append(f'hivecpq_request_duration_seconds_bucket{{{base},le="+Inf"}} {stats.count}')
+                lines.append(f"hivecpq_request_duration_seconds_sum{{{base}}} {stats.total_seconds:.6f}")
+                lines.append(f"hivecpq_request_duration_seconds_count{{{base}}} {stats.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    def escape(value):
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+# Procesbrede registry (voor /metrics) plus de registries van alle
+# collect()-blokken die in de huidige context actief zijn.
+REGISTRY = MetricsRegistry()
+_active = contextvars.ContextVar("hivecpq_metrics", default=())
+
+
+def record(method, url, status, seconds, size):
+    endpoint = endpoint_template(url)
+    REGISTRY.record(method, endpoint, status, seconds, size)
+    for registry in _active.get():
+        registry.record(method, endpoint, status, seconds, size)
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Verzamelt de requests van één operatie in een eigen registry:
+
+        with api_metrics.collect() as perf:
+            export_bom_to_excel(...)
+        perf.table()
+
+    Werkt ook voor requests uit asyncio.to_thread en uit pools die
+    contextvars.copy_context() gebruiken.
+    """
+    registry = MetricsRegistry()
+    token = _active.set(_active.get() + (registry,))
+    try:
+        yield registry
+    finally:
+        _active.reset(token)
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host="0.0.0.0"):
+    """
+    Serveert REGISTRY als /metrics voor Prometheus. Zonder `port` wordt
+    HIVECPQ_METRICS_PORT gebruikt; is die niet gezet, dan gebeurt er niets.
+    Meermaals aanroepen (bv. bij elke Streamlit-rerun) start maar één server.
+    """
+    global _metrics_server
+    port = port or os.environ.get("HIVECPQ_METRICS_PORT")
+    if not port:
+        return None
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = _serve_metrics(host, int(port))
+        return _metrics_server
+
+
+def _serve_metrics(host, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
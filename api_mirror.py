@@ -0,0 +1,204 @@
+import json
+import sqlite3
+import threading
+import time
+
+import api_config
+from api_async import iter_pages_parallel
+
+# Veld met het wijzigingstijdstip van een record en het filter waarmee de
+# API enkel records teruggeeft die sinds dat tijdstip gewijzigd zijn
+MODIFIED_FIELD = "lastModifiedAt"
+MODIFIED_SINCE_PARAM = "modifiedSince"
+
+ENTITIES = ("projectSegments", "projectSegmentItems")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    base_url TEXT NOT NULL,
+    manufacturer_id TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    modified_at TEXT,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (base_url, manufacturer_id, entity, id)
+);
+CREATE INDEX IF NOT EXISTS records_position ON records (base_url, manufacturer_id, entity, position);
+CREATE TABLE IF NOT EXISTS sync_state (
+    base_url TEXT NOT NULL,
+    manufacturer_id TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    watermark TEXT,
+    full_sync_at REAL NOT NULL,
+    PRIMARY KEY (base_url, manufacturer_id, entity)
+);
+"""
+
+_refresh_locks = {}  # (pad, base_url, manufacturer_id, entity) -> threading.Lock
+_registry_lock = threading.Lock()
+
+
+def _lock_for(key):
+    with _registry_lock:
+        lock = _refresh_locks.get(key)
+        if lock is None:
+            lock = _refresh_locks[key] = threading.Lock()
+        return lock
+
+
+def _max_watermark(watermark, item):
+    modified_at = item.get(MODIFIED_FIELD)
+    if modified_at and (watermark is None or modified_at > watermark):
+        return modified_at
+    return watermark
+
+
+class MirrorStore:
+    """
+    Lokale SQLite-kopie van projectSegments en projectSegmentItems per
+    manufacturer.
+
+    De eerste refresh laadt alles; daarna worden enkel records opgehaald met
+    MODIFIED_FIELD >= de hoogste waarde uit de vorige sync (de watermark) en
+    in de mirror ge-upsert. Alles staat per CONNECT_BASE_URL, zodat een mock
+    of staging nooit met productie door elkaar loopt. Omdat verwijderingen zo niet zichtbaar worden,
+    volgt na MIRROR_FULL_REFRESH_HOURS opnieuw een volledige load. Hebben de
+    records geen MODIFIED_FIELD, dan is elke refresh een volledige load.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or api_config.MIRROR_PATH
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(records)")]
+        if columns and "base_url" not in columns:
+            # Mirror van voor de base_url-kolom: weggooien, de volgende
+            # refresh laadt alles opnieuw
+            conn.executescript("DROP TABLE records; DROP TABLE IF EXISTS sync_state;")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def sync_state(self, manufacturer_id, entity):
+        """(watermark, full_sync_at) van de laatste sync, of (None, None)."""
+        conn = self.connect()
+        try:
+            row = conn.execute(
+                "SELECT watermark, full_sync_at FROM sync_state "
+                "WHERE base_url = ? AND manufacturer_id = ? AND entity = ?",
+                (api_config.CONNECT_BASE_URL, manufacturer_id, entity)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row or (None, None)
+
+    def refresh(self, client, entity, full=False, page_size=None, concurrency=None):
+        """
+        Brengt de mirror van `entity` voor client.manufacturer_id up-to-date.
+        Geeft het aantal opgehaalde records terug.
+        """
+        if entity not in ENTITIES:
+            raise ValueError(f"Onbekende entiteit voor de mirror: {entity}")
+        mid = client.manufacturer_id
+        with _lock_for((self.path, api_config.CONNECT_BASE_URL, mid, entity)):
+            watermark, full_sync_at = self.sync_state(mid, entity)
+            max_age = api_config.MIRROR_FULL_REFRESH_HOURS * 3600
+            if full or watermark is None or time.time() - full_sync_at > max_age:
+                return self._full_load(client, entity, page_size, concurrency)
+            return self._delta_load(client, entity, watermark, page_size)
+
+    def _full_load(self, client, entity, page_size, concurrency):
+        base_url, mid = api_config.CONNECT_BASE_URL, client.manufacturer_id
+        conn = self.connect()
+        try:
+            # Eén transactie: lezers zien tot de commit de vorige stand
+            with conn:
+                conn.execute(
+                    "DELETE FROM records WHERE base_url = ? AND manufacturer_id = ? AND entity = ?",
+                    (base_url, mid, entity)
+                )
+                position = 0
+                watermark = None
+                for items in iter_pages_parallel(client, entity, page_size=page_size, concurrency=concurrency):
+                    rows = []
+                    for item in items:
+                        position += 1
+                        watermark = _max_watermark(watermark, item)
+                        rows.append((base_url, mid, entity, item.get("id", ""), position,
+                                     item.get(MODIFIED_FIELD), json.dumps(item)))
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?)",
+                    (base_url, mid, entity, watermark, time.time())
+                )
+            return position
+        finally:
+            conn.close()
+
+    def _delta_load(self, client, entity, watermark, page_size):
+        base_url, mid = api_config.CONNECT_BASE_URL, client.manufacturer_id
+        conn = self.connect()
+        try:
+            with conn:
+                position = conn.execute(
+                    "SELECT COALESCE(MAX(position), 0) FROM records "
+                    "WHERE base_url = ? AND manufacturer_id = ? AND entity = ?",
+                    (base_url, mid, entity)
+                ).fetchone()[0]
+                changed = 0
+                new_watermark = watermark
+                params = {MODIFIED_SINCE_PARAM: watermark}
+                for items in client.iter_pages(entity, page_size=page_size, params=params):
+                    rows = []
+                    for item in items:
+                        # Nieuwe records achteraan; bestaande houden hun plaats
+                        position += 1
+                        changed += 1
+                        new_watermark = _max_watermark(new_watermark, item)
+                        rows.append((base_url, mid, entity, item.get("id", ""), position,
+                                     item.get(MODIFIED_FIELD), json.dumps(item)))
+                    conn.executemany(
+                        "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (base_url, manufacturer_id, entity, id) DO UPDATE SET "
+                        "modified_at = excluded.modified_at, payload = excluded.payload",
+                        rows
+                    )
+                conn.execute(
+                    "UPDATE sync_state SET watermark = ? WHERE base_url = ? AND manufacturer_id = ? AND entity = ?",
+                    (new_watermark, base_url, mid, entity)
+                )
+            return changed
+        finally:
+            conn.close()
+
+    def iter_pages(self, manufacturer_id, entity, page_size=None):
+        """Yieldt de records uit de mirror per `page_size`, in API-volgorde."""
+        page_size = page_size or api_config.PAGE_SIZE
+        conn = self.connect()
+        try:
+            cursor = conn.execute(
+                "SELECT payload FROM records WHERE base_url = ? AND manufacturer_id = ? AND entity = ? "
+                "ORDER BY position",
+                (api_config.CONNECT_BASE_URL, manufacturer_id, entity)
+            )
+            while True:
+                rows = cursor.fetchmany(page_size)
+                if not rows:
+                    return
+                yield [json.loads(payload) for (payload,) in rows]
+        finally:
+            conn.close()
+
+
+def iter_mirrored_pages(client, entity, page_size=None, concurrency=None, full=False, path=None):
+    """
+    Zelfde vorm als HiveClient.iter_pages, maar eerst wordt de mirror
+    ververst en daarna uit SQLite gelezen.
+    """
+    store = MirrorStore(path)
+    store.refresh(client, entity, full=full, page_size=page_size, concurrency=concurrency)
+    yield from store.iter_pages(client.manufacturer_id, entity, page_size=page_size)
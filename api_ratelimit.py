@@ -0,0 +1,108 @@
+import email.utils
+import threading
+import time
+
+import api_config
+
+# Wachttijd bij een 429 zonder (bruikbare) Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class TokenBucket:
+    """
+    Token bucket met AIMD-bijsturing: elke geslaagde call verhoogt de rate
+    (exponentieel tot de eerste 429, daarna lineair), een 429 halveert ze
+    (RATE_DECREASE) en pauzeert de bucket tot de Retry-After van de server
+    verstreken is. Per venster wordt maar één keer verlaagd: een 429 op een
+    request dat vóór de laatste verlaging vertrok, verlaagt niet opnieuw.
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate or api_config.RATE_START
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.slow_start = True
+        self.decreased_at = float("-inf")
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        capacity = max(self.rate, 1.0)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blokkeert tot er een token vrij is; geeft het tijdstip (monotonic) terug."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return now
+                wait = max(self.blocked_until - now, (1.0 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            if self.slow_start:
+                rate = self.rate * api_config.RATE_SLOW_START
+            else:
+                rate = self.rate + api_config.RATE_INCREASE
+            self.rate = min(api_config.RATE_MAX, rate)
+
+    def on_throttle(self, retry_after=None, issued_at=None):
+        """
+        Verwerkt een 429 op een request dat om `issued_at` (zoals acquire()
+        teruggaf) vertrok. De pauze geldt altijd, de rate verlaagt enkel
+        als het request na de vorige verlaging vertrok.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.slow_start = False
+            if issued_at is None or issued_at >= self.decreased_at:
+                self.rate = max(api_config.RATE_MIN, self.rate * api_config.RATE_DECREASE)
+                self.decreased_at = now
+            pause = retry_after if retry_after is not None else DEFAULT_RETRY_AFTER
+            self.blocked_until = max(self.blocked_until, now + pause)
+            self.tokens = 0.0
+            self.updated = now
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def endpoint_family(path):
+    """Eerste padsegment na /manufacturers/{id}/, bv. 'customObjects'."""
+    return path.lstrip("/").split("/", 1)[0].split("?", 1)[0]
+
+
+def bucket_for(manufacturer_id, family):
+    key = (manufacturer_id, family)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket()
+        return bucket
+
+
+def parse_retry_after(value):
+    """Retry-After in seconden (getal of HTTP-datum), of None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - time.time(), 0.0)
+
+
+def current_rates():
+    """(manufacturer, familie) -> huidige rate; handig om te debuggen."""
+    with _buckets_lock:
+        return {key: bucket.rate for key, bucket in _buckets.items()}
@@ -0,0 +1,137 @@
+import requests
+
+import api_config
+from api_async import AsyncHiveClient, gather_limited, iter_pages_parallel, run_sync
+from api_mirror import iter_mirrored_pages
+
+
+def segment_order_status(segment):
+    return (segment.get('order', {}) or {}).get('orderStatus', '')
+
+
+def segment_item_ids_of(segment):
+    return [item['id'] for item in segment.get('projectSegmentItems', []) or [] if item.get('id')]
+
+
+def get_project_segment_ids(client, project_id):
+    resp = client.get(f"projects/{project_id}")
+    resp.raise_for_status()
+    segments = resp.json().get('projectSegments', []) or []
+    if not segments:
+        raise Exception("Geen segmenten gevonden voor projectId " + project_id)
+    return [segment['id'] for segment in segments]
+
+
+def get_project_segment(client, segment_id):
+    resp = client.get(f"projectSegments/{segment_id}")
+    resp.raise_for_status()
+    return resp.json()
+
+
+# Servers zonder orderstatusfilter: (base_url, manufacturer_id)
+_filter_unsupported = set()
+
+
+def reset_filter_support():
+    """Vergeet welke servers het orderstatusfilter niet kennen."""
+    _filter_unsupported.clear()
+
+
+def _segment_pages(client, order_statuses, concurrency):
+    """
+    Pagina's projectSegments, bij één status met het server-side filter
+    SEGMENT_ORDER_STATUS_FILTER. Weigert de server dat filter (400), dan
+    wordt dat per manufacturer onthouden en alles opgehaald.
+    """
+    param = api_config.SEGMENT_ORDER_STATUS_FILTER
+    key = (api_config.CONNECT_BASE_URL, client.manufacturer_id)
+    if param and len(order_statuses) == 1 and key not in _filter_unsupported:
+        pages = iter_pages_parallel(client, "projectSegments", params={param: order_statuses[0]},
+                                    concurrency=concurrency)
+        try:
+            first = next(pages, None)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 400:
+                raise
+            _filter_unsupported.add(key)
+        else:
+            if first is not None:
+                yield first
+                yield from pages
+            return
+    yield from iter_pages_parallel(client, "projectSegments", concurrency=concurrency)
+
+
+def iter_segments_with_status(client, order_statuses, concurrency=None, use_mirror=False):
+    """
+    Yieldt alle projectSegments met één van de orderstatussen. Bij één
+    status wordt ze als server-side filter meegegeven (zie _segment_pages);
+    er wordt altijd ook lokaal gefilterd, zodat het resultaat klopt als de
+    server het filter negeert. Met `use_mirror` komen de segments uit de
+    lokale mirror (api_mirror).
+    """
+    if use_mirror:
+        pages = iter_mirrored_pages(client, "projectSegments", concurrency=concurrency)
+    else:
+        pages = _segment_pages(client, order_statuses, concurrency)
+    for segments in pages:
+        for segment in segments:
+            if segment_order_status(segment) in order_statuses:
+                yield segment
+
+
+async def resolve_segment_ids_async(client, project_ids, segment_ids, concurrency=None):
+    """
+    Project- en segment-IDs -> segments, met maximaal `concurrency` calls
+    tegelijk. Geeft (segments, fouten) terug; fouten = [(id, melding)].
+    """
+    aclient = AsyncHiveClient(client)
+    errors = []
+
+    async def project_segment_ids(project_id):
+        return await aclient.run(get_project_segment_ids, client, project_id)
+
+    wanted = []
+    for project_id, result in zip(project_ids, await gather_limited(project_segment_ids, project_ids, concurrency)):
+        if isinstance(result, Exception):
+            errors.append((project_id, result))
+        else:
+            wanted += result
+    wanted = list(dict.fromkeys(wanted + list(segment_ids)))
+
+    async def segment(segment_id):
+        return await aclient.run(get_project_segment, client, segment_id)
+
+    segments = []
+    for segment_id, result in zip(wanted, await gather_limited(segment, wanted, concurrency)):
+        if isinstance(result, Exception):
+            errors.append((segment_id, result))
+        else:
+            segments.append(result)
+    return segments, errors
+
+
+def resolve_segment_item_ids(client, project_ids=(), segment_ids=(), order_statuses=(), concurrency=None,
+                             use_mirror=False):
+    """
+    Zet een selectie om naar ProjectSegmentItemIds, zonder omweg via de
+    segments-CSV: eerst die van de projecten en segmenten (in opgegeven
+    volgorde), daarna die van alle segments met één van de orderstatussen
+    (in API-volgorde). Dubbels worden weggelaten.
+
+    Geeft (segment_item_ids, fouten) terug; fouten = [(id, melding)] voor
+    projecten en segmenten die niet opgehaald konden worden.
+    """
+    if isinstance(order_statuses, str):
+        order_statuses = [order_statuses]
+    segments, errors = [], []
+    if project_ids or segment_ids:
+        segments, errors = run_sync(resolve_segment_ids_async(client, list(project_ids), list(segment_ids),
+                                                              concurrency))
+    item_ids = []
+    for segment in segments:
+        item_ids += segment_item_ids_of(segment)
+    if order_statuses:
+        for segment in iter_segments_with_status(client, list(order_statuses), concurrency, use_mirror):
+            item_ids += segment_item_ids_of(segment)
+    return list(dict.fromkeys(item_ids)), errors
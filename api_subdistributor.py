@@ -1,6 +1,42 @@
 import requests
 import pandas as pd
 import re
+from api_client import HiveClient
+from api_directory import CompanyDirectory, get_directory, invalidate_directory
+from api_token import token_error_text
+
+# Distributeurs zoals ze in het formulier heten -> company id + orderEmail.
+# Andere namen worden in de company directory opgezocht.
+KNOWN_DISTRIBUTORS = {
+    "MyAquadeck": {
+        "Golden Coast": {
+            "id": "ef73acdbda854f5485691f38329b306f",
+            "email": "swimmer@goldenc.com"
+        },
+        "Pomaz": {
+            "id": "5d5b62fa8dd94e3c9009929f2682f331",
+            "email": "aquadeck@pomaz.nl"
+        },
+        "PPG BE": {
+            "id": "329c8d4389704462ad43e1748c5f34d3",
+            "email": "info@polletpoolgroup.com"
+        }
+    },
+    "aquadeck_staging": {
+        "Golden Coast": {
+            "id": "5363bfc79e5f42749bee36216f6e76e4",
+            "email": "swimmer@goldenc.com"
+        },
+        "Pomaz": {
+            "id": "075e802cf3e64ee680f20a63d2cee489",
+            "email": "aquadeck@pomaz.nl"
+        },
+        "PPG BE": {
+            "id": "1fd05cd86ca34668bfa3dd3d69618239",
+            "email": "info@polletpoolgroup.com"
+        }
+    }
+}
 
 
 def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_secret):
@@ -40,41 +76,21 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
         "Marocco": "MA"
     }
 
-    def get_distributor_data(manufacturer_id):
-        if manufacturer_id == "MyAquadeck":
-            return {
-                "Golden Coast": {
-                    "id": "ef73acdbda854f5485691f38329b306f",
-                    "email": "swimmer@goldenc.com"
-                },
-                "Pomaz": {
-                    "id": "5d5b62fa8dd94e3c9009929f2682f331",
-                    "email": "aquadeck@pomaz.nl"
-                },
-                "PPG BE": {
-                    "id": "329c8d4389704462ad43e1748c5f34d3",
-                    "email": "info@polletpoolgroup.com"
-                }
-            }
-
-        elif manufacturer_id == "aquadeck_staging":
-            return {
-                "Golden Coast": {
-                    "id": "5363bfc79e5f42749bee36216f6e76e4",
-                    "email": "swimmer@goldenc.com"
-                },
-                "Pomaz": {
-                    "id": "075e802cf3e64ee680f20a63d2cee489",
-                    "email": "aquadeck@pomaz.nl"
-                },
-                "PPG BE": {
-                    "id": "1fd05cd86ca34668bfa3dd3d69618239",
-                    "email": "info@polletpoolgroup.com"
-                }
-            }
+    def get_distributor(client, distributor_name):
+        """
+        Distributeur uit het formulier -> {"id", "email"} (email voor de
+        orderEmails). Eerst de gekende namen (zonder API-calls), daarna de
+        gecachete company directory (DISTRIBUTOR met die naam).
+        """
+        known = KNOWN_DISTRIBUTORS.get(manufacturer_id, {}).get(distributor_name)
+        if known:
+            return known
 
-        else:
-            raise ValueError(f"Onbekende MANUFACTURER_ID: {manufacturer_id}")
+        company = get_directory(client).resolve(name=distributor_name, company_type="DISTRIBUTOR")
+        if not company:
+            return None
+        info = company.get("info", {}) or {}
+        return {"id": company["id"], "email": (info.get("email") or "").strip()}
 
     def val(name, row):
         normalized_name = normalize_col_name(name)
@@ -127,37 +143,18 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
 
         return result
 
-    def get_access_token(client_id, client_secret):
-        token_resp = requests.post(
-            "https://ebusinesscloud.eu.auth0.com/oauth/token",
-            headers={"Content-Type": "application/json"},
-            json={
-                "grant_type": "client_credentials",
-                "client_id": client_id,
-                "client_secret": client_secret,
-                "audience": "https://ebusinesscloud.eu.auth0.com/api/v2/"
-            }
-        )
-
-        if token_resp.status_code != 200:
-            raise RuntimeError(f"Token ophalen mislukt: {token_resp.text}")
+    def get_access_token(client):
+        try:
+            return client.token()
+        except requests.HTTPError as e:
+            raise RuntimeError(f"Token ophalen mislukt: {token_error_text(e)}")
 
-        access_token = token_resp.json().get("access_token")
-
-        if not access_token:
-            raise RuntimeError("Geen access_token ontvangen.")
-
-        return access_token
-
-    def get_company_payload_for_update(api_headers, manufacturer_id, company_id):
+    def get_company_payload_for_update(client, company_id):
         """
         Haalt de huidige company op uit HiveCPQ en bouwt hiervan een veilige PUT-payload.
         Zo vermijden we dat velden leeg worden door een onvolledige of fout gevormde body.
         """
-        resp = requests.get(
-            f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/companies/{company_id}",
-            headers=api_headers
-        )
+        resp = client.get(f"companies/{company_id}")
 
         if resp.status_code != 200:
             raise RuntimeError(f"Company ophalen mislukt: {resp.text}")
@@ -189,8 +186,7 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
         return payload
 
     def bulk_upsert_price_data(
-        api_headers,
-        manufacturer_id,
+        client,
         distributor_id,
         company_id,
         currency,
@@ -234,19 +230,18 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
             ]
         }
 
-        resp = requests.post(
-            f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/customObjects/distributor-{distributor_id}/bulkUpsert",
-            headers=api_headers,
+        resp = client.post(
+            f"customObjects/distributor-{distributor_id}/bulkUpsert",
             json=bulk_payload
         )
 
         if resp.status_code != 200:
             raise RuntimeError(f"Fout bij bulk upsert: {resp.text}")
 
-    def reset_custom_object_timestamp(api_headers, manufacturer_id):
-        reset_resp = requests.post(
-            f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/resetCustomObjectUpdateTimestamp",
-            headers=api_headers
+    def reset_custom_object_timestamp(client):
+        reset_resp = client.post(
+            "resetCustomObjectUpdateTimestamp",
+            headers={"Content-Type": "application/json"}
         )
 
         if reset_resp.status_code != 204:
@@ -255,10 +250,11 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
     try:
         row = df.iloc[row_number]
 
-        distributor_data = get_distributor_data(manufacturer_id)
+        client = HiveClient(manufacturer_id, client_id, client_secret)
+        get_access_token(client)
 
         distributor_name = val("Distributor", row)
-        distributor = distributor_data.get(distributor_name)
+        distributor = get_distributor(client, distributor_name)
 
         if not distributor:
             return f"❌ Distributeur '{distributor_name}' is niet gekend."
@@ -273,13 +269,6 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
             ).lower() == "yes"
         )
 
-        access_token = get_access_token(client_id, client_secret)
-
-        api_headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
-
         discount_group = extract_group_code(
             val(f"Discount Group for subdistributor ({distributor_name})", row)
         )
@@ -307,6 +296,18 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
             url = val("Please add URL from subdistributor underneath", row)
             company_id = extract_company_id_from_url(url)
 
+            if not company_id:
+                # Geen bruikbare URL: opzoeken bij de subdistributeurs van
+                # deze distributeur (nooit een company van een andere)
+                own_companies = CompanyDirectory(get_directory(client).for_distributor(distributor_id))
+                company = own_companies.resolve(
+                    name=val("Company Name of subdistributor (Pool Builder)", row),
+                    vat_number=val("VAT Number", row),
+                    email=val("Email address of the company (please provide ONLY 1 mail-address)", row),
+                    company_type="SUB_DISTRIBUTOR"
+                )
+                company_id = company["id"] if company else None
+
             if not company_id:
                 return "❌ Geen geldige URL voor bestaande subdistributeur."
 
@@ -314,8 +315,7 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
             l("ℹ️ Alleen prijs-/kortingsgegevens worden bijgewerkt.")
 
             bulk_upsert_price_data(
-                api_headers=api_headers,
-                manufacturer_id=manufacturer_id,
+                client=client,
                 distributor_id=distributor_id,
                 company_id=company_id,
                 currency=currency,
@@ -327,10 +327,7 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
             l(f"✅ Price group ingevuld: {price_group}")
             l(f"✅ Discount group ingevuld: {discount_group}")
 
-            reset_custom_object_timestamp(
-                api_headers=api_headers,
-                manufacturer_id=manufacturer_id
-            )
+            reset_custom_object_timestamp(client=client)
 
             l("✅ Timestamp reset uitgevoerd.")
             l("✅ Voltooid zonder fouten.")
@@ -397,11 +394,7 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
             }
         }
 
-        resp = requests.post(
-            f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/companies",
-            headers=api_headers,
-            json=create_payload
-        )
+        resp = client.post("companies", json=create_payload)
 
         if resp.status_code != 201:
             return f"❌ Fout bij aanmaken: {resp.text}"
@@ -413,6 +406,8 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
             return "❌ Company aangemaakt, maar geen company_id teruggekregen."
 
         l(f"✅ Subdistributeur aangemaakt. Company ID: {company_id}")
+        # Nieuwe subdistributeur: gecachete company directory is niet meer juist
+        invalidate_directory(manufacturer_id)
 
         invoice_payload = {
             "type": "INVOICE",
@@ -426,9 +421,8 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
             "vatNumber": company_info["vatNumber"]
         }
 
-        resp = requests.post(
-            f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/companies/{company_id}/defaultAddresses",
-            headers=api_headers,
+        resp = client.post(
+            f"companies/{company_id}/defaultAddresses",
             json=invoice_payload
         )
 
@@ -486,9 +480,8 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
             )
         }
 
-        resp = requests.post(
-            f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/companies/{company_id}/defaultAddresses",
-            headers=api_headers,
+        resp = client.post(
+            f"companies/{company_id}/defaultAddresses",
             json=delivery_payload
         )
 
@@ -498,8 +491,7 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
         l("✅ DELIVERY adres toegevoegd.")
 
         bulk_upsert_price_data(
-            api_headers=api_headers,
-            manufacturer_id=manufacturer_id,
+            client=client,
             distributor_id=distributor_id,
             company_id=company_id,
             currency=currency,
@@ -519,8 +511,7 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
         ])
 
         final_payload = get_company_payload_for_update(
-            api_headers=api_headers,
-            manufacturer_id=manufacturer_id,
+            client=client,
             company_id=company_id
         )
 
@@ -530,21 +521,15 @@ def verwerk_subdistributeur(df, row_number, manufacturer_id, client_id, client_s
         )
         final_payload["subDistributorSettings"]["orderEmails"] = order_emails
 
-        resp = requests.put(
-            f"https://connect.hivecpq.com/api/v1/manufacturers/{manufacturer_id}/companies/{company_id}",
-            headers=api_headers,
-            json=final_payload
-        )
+        resp = client.put(f"companies/{company_id}", json=final_payload)
+        invalidate_directory(manufacturer_id)
 
         if resp.status_code != 204:
             return f"❌ Fout bij invullen orderEmails: {resp.text}"
 
         l(f"✅ orderEmails ingevuld: {order_emails}")
 
-        reset_custom_object_timestamp(
-            api_headers=api_headers,
-            manufacturer_id=manufacturer_id
-        )
+        reset_custom_object_timestamp(client=client)
 
         l("✅ Timestamp reset uitgevoerd.")
         l("✅ Voltooid zonder fouten.")
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+
+import api_client
+import api_config
+
+AUDIENCE = "https://ebusinesscloud.eu.auth0.com/api/v2/"
+
+# Token wordt zoveel seconden vóór `expires_in` al als verlopen beschouwd
+EXPIRY_MARGIN = 60
+# Auth0 stuurt normaal altijd expires_in mee; zoniet gaan we hiervan uit
+DEFAULT_EXPIRES_IN = 3600
+
+_cache = {}          # (client_id, audience, secret-hash) -> (access_token, verloopt_op)
+_key_locks = {}      # (client_id, audience, secret-hash) -> threading.Lock
+_registry_lock = threading.Lock()
+
+
+def _lock_for(key):
+    with _registry_lock:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def _cache_key(client_id, client_secret, audience):
+    # Met een hash van het secret: een verkeerd secret krijgt nooit het
+    # gecachete token van het juiste (en het secret zelf staat niet in de cache)
+    secret_hash = hashlib.sha256((client_secret or "").encode("utf-8")).hexdigest()
+    return client_id, audience, secret_hash
+
+
+def _cached(key):
+    entry = _cache.get(key)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    return None
+
+
+def _request_token(client_id, client_secret, audience, timeout):
+    payload = {
+        "grant_type": "client_credentials",
+        "client_name": "API USER",
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "audience": audience,
+        "domain": api_config.AUTH_DOMAIN
+    }
+    headers = {"Content-Type": "application/json"}
+    token_url = f"{api_config.AUTH_DOMAIN.rstrip('/')}/oauth/token"
+    resp = api_client.http_request("POST", token_url, json=payload, headers=headers, timeout=timeout)
+    resp.raise_for_status()
+    body = resp.json()
+    access_token = body.get("access_token")
+    if not access_token:
+        raise RuntimeError("Geen access_token ontvangen.")
+    expires_in = body.get("expires_in") or DEFAULT_EXPIRES_IN
+    return access_token, float(expires_in)
+
+
+def get_access_token(client_id, client_secret, audience=AUDIENCE, timeout=None):
+    """
+    Geeft een geldig Auth0-token terug voor (client_id, audience).
+
+    Het token wordt per (client_id, audience, client_secret) gecachet tot
+    EXPIRY_MARGIN seconden voor `expires_in`.
+    Vragen meerdere threads tegelijk een verlopen token op, dan doet er maar
+    één de POST naar /oauth/token; de rest wacht en krijgt hetzelfde token.
+    Fouten van Auth0 komen door als requests.HTTPError.
+    """
+    key = _cache_key(client_id, client_secret, audience)
+    access_token = _cached(key)
+    if access_token:
+        return access_token
+
+    with _lock_for(key):
+        # Een andere thread kan intussen al vernieuwd hebben
+        access_token = _cached(key)
+        if access_token:
+            return access_token
+        access_token, expires_in = _request_token(client_id, client_secret, audience, timeout)
+        valid_for = max(expires_in - EXPIRY_MARGIN, 0)
+        _cache[key] = (access_token, time.monotonic() + valid_for)
+        return access_token
+
+
+def invalidate_token(client_id, audience=AUDIENCE, client_secret=None):
+    """
+    Gooit het gecachete token weg, bv. na een 401 van de API. Zonder
+    `client_secret` de tokens van alle secrets van deze client_id.
+    """
+    if client_secret is not None:
+        _cache.pop(_cache_key(client_id, client_secret, audience), None)
+        return
+    for key in list(_cache):
+        if key[:2] == (client_id, audience):
+            _cache.pop(key, None)
+
+
+def token_error_text(exc):
+    """Response-tekst van een mislukte token-call, anders de foutmelding zelf."""
+    response = getattr(exc, "response", None)
+    if response is not None and response.text:
+        return response.text
+    return str(exc)
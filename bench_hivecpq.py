@@ -0,0 +1,250 @@
+"""
+Benchmark van alle exporters/importers tegen de lokale mock (mock_hivecpq).
+
+    python bench_hivecpq.py                     # snelle set
+    python bench_hivecpq.py --level full        # 10k companies, 100k segment items, ...
+    python bench_hivecpq.py --latency 0.05 --output bench_report --compare oud.json
+
+Per functie: wall time, aantal requests (geteld door de mock), requests/s en
+tracemalloc-piek. De mock draait in een apart proces zodat tracemalloc enkel
+het geheugen van de client meet. Resultaat komt in <output>.json en .csv.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import subprocess
+import time
+import tracemalloc
+
+import requests
+
+import api_bomcache
+import api_companies
+import api_config
+import api_selection
+import api_token
+from api_directory import invalidate_directory
+from mock_hivecpq import MockData, MockHiveServer
+
+MANUFACTURER_ID = "bench"
+CLIENT_ID = "bench-client"
+CLIENT_SECRET = "bench-secret"
+
+REPORT_FIELDS = [
+    "commit", "scenario", "function", "wall_s", "requests", "requests_per_s", "peak_mb", "ok", "error"
+]
+
+
+def _companies_cases(data):
+    from api_companies import get_all_companies_excel
+    from get_all_companies_excel import get_companies_for_distributor_excel
+    distributor_id = next(c["id"] for c in data.companies if c["companyType"] == "DISTRIBUTOR")
+    return [
+        ("get_all_companies_excel", lambda: get_all_companies_excel(
+            MANUFACTURER_ID, CLIENT_ID, CLIENT_SECRET)),
+        ("get_companies_for_distributor_excel", lambda: get_companies_for_distributor_excel(
+            MANUFACTURER_ID, CLIENT_ID, CLIENT_SECRET, distributor_id)),
+    ]
+
+
+def _bom_cases(data):
+    from api_ExportBom import export_bom_to_excel
+    ids = [item["id"] for item in data.segment_items]
+    return [
+        ("export_bom_to_excel", lambda: export_bom_to_excel(
+            MANUFACTURER_ID, CLIENT_ID, CLIENT_SECRET, ids)),
+    ]
+
+
+def _segment_cases(data):
+    from api_file import get_all_project_segments_csv
+    from api_fetch import get_all_project_segment_items_csv, iter_project_segment_items_csv
+    return [
+        ("get_all_project_segments_csv", lambda: get_all_project_segments_csv(
+            MANUFACTURER_ID, CLIENT_ID, CLIENT_SECRET)),
+        ("get_all_project_segment_items_csv", lambda: get_all_project_segment_items_csv(
+            MANUFACTURER_ID, CLIENT_ID, CLIENT_SECRET)),
+        ("iter_project_segment_items_csv", lambda: sum(
+            len(chunk) for chunk in iter_project_segment_items_csv(MANUFACTURER_ID, CLIENT_ID, CLIENT_SECRET))),
+    ]
+
+
+def _batch_cases(data):
+    from api_step4 import move_segments_to_step4
+    from api_unit import update_units_of_components
+    step4_input = "salesId\tprojectId\tshippingDateConfirmed\n" + "\n".join(
+        f"SO{n}\t{project_id}\t05/07/25" for n, project_id in enumerate(list(data.projects)[:200])
+    )
+    article_codes = ",".join(c["articleCode"] for c in data.components[:200])
+    return [
+        ("move_segments_to_step4", lambda: move_segments_to_step4(
+            MANUFACTURER_ID, CLIENT_ID, CLIENT_SECRET, step4_input)),
+        ("update_units_of_components", lambda: update_units_of_components(
+            MANUFACTURER_ID, CLIENT_ID, CLIENT_SECRET, article_codes, "PCS", "1.0.0")),
+    ]
+
+
+def scenarios(level):
+    """(naam, MockData-kwargs, cases-factory) per dataset."""
+    quick = [
+        ("companies_1k", dict(companies=1000, distributors=20, segments=0), _companies_cases),
+        ("bom_10k_depth12", dict(companies=0, segments=5, items_per_segment=2,
+                                 bom_nodes=10000, bom_depth=12), _bom_cases),
+        ("segment_items_10k", dict(companies=0, segments=2500, items_per_segment=4), _segment_cases),
+        ("batches_200", dict(companies=0, segments=200, items_per_segment=1, components=3000), _batch_cases),
+    ]
+    if level == "quick":
+        return quick
+    return quick + [
+        ("companies_10k", dict(companies=10000, distributors=50, segments=0), _companies_cases),
+        ("segment_items_100k", dict(companies=0, segments=25000, items_per_segment=4), _segment_cases),
+    ]
+
+
+def _serve(data_kwargs, server_kwargs, queue):
+    server = MockHiveServer(MockData(**data_kwargs), **server_kwargs)
+    queue.put(server.base_url)
+    server.httpd.serve_forever()
+
+
+def start_mock(data_kwargs, server_kwargs):
+    """Start de mock in een apart proces; geeft (proces, base_url) terug."""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_serve, args=(data_kwargs, server_kwargs, queue), daemon=True)
+    process.start()
+    return process, queue.get(timeout=300)
+
+
+def _failed(result):
+    """Zelfde foutcontracten als streamlit_app.py."""
+    if isinstance(result, tuple) and result and result[0] is None:
+        return result[-1]
+    if isinstance(result, tuple) and len(result) == 3 and result[2]:
+        return result[2]
+    if isinstance(result, list) and result and isinstance(result[0], dict) and "error" in result[0] and len(result) == 1:
+        return result[0]["error"]
+    return None
+
+
+def reset_caches():
+    """
+    Elke case begint koud: geen token, company directory, BOMs of
+    onthouden filtersupport van een vorige case.
+    """
+    api_token.invalidate_token(CLIENT_ID)
+    invalidate_directory()
+    api_bomcache.invalidate_boms()
+    api_companies.reset_filter_support()
+    api_selection.reset_filter_support()
+
+
+def run_case(base_url, function):
+    reset_caches()
+    requests.post(f"{base_url}/_mock/reset", timeout=10)
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = function()
+        error = _failed(result)
+    except Exception as e:
+        error = str(e)
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = requests.get(f"{base_url}/_mock/stats", timeout=10).json()
+    count = stats.get("requests", 0)
+    return {
+        "wall_s": round(wall, 3),
+        "requests": count,
+        "requests_per_s": round(count / wall, 1) if wall else 0.0,
+        "peak_mb": round(peak / (1024 * 1024), 2),
+        "ok": error is None,
+        "error": "" if error is None else str(error)[:200],
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def write_report(records, output):
+    with open(f"{output}.json", "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2)
+    with open(f"{output}.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def compare(records, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["scenario"], r["function"]): r for r in json.load(f)}
+    print(f"\nVergelijking met {baseline_path}:")
+    for r in records:
+        old = baseline.get((r["scenario"], r["function"]))
+        if not old:
+            continue
+        wall = (r["wall_s"] / old["wall_s"] - 1) * 100 if old["wall_s"] else 0.0
+        peak = (r["peak_mb"] / old["peak_mb"] - 1) * 100 if old["peak_mb"] else 0.0
+        print(f"  {r['scenario']:<20} {r['function']:<38} tijd {wall:+6.1f}%  piek {peak:+6.1f}%  "
+              f"requests {old['requests']} -> {r['requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tegen de lokale HiveCPQ-mock")
+    parser.add_argument("--level", choices=["quick", "full"], default="quick")
+    parser.add_argument("--only", help="alleen scenario's waarvan de naam dit bevat")
+    parser.add_argument("--latency", type=float, default=0.0, help="gesimuleerde latency per request (s)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="kans op 429")
+    parser.add_argument("--output", default="bench_report")
+    parser.add_argument("--compare", help="eerder JSON-rapport om mee te vergelijken")
+    args = parser.parse_args()
+
+    commit = current_commit()
+    server_kwargs = dict(latency=args.latency, throttle_rate=args.throttle_rate, retry_after=0)
+    records = []
+    for name, data_kwargs, cases in scenarios(args.level):
+        if args.only and args.only not in name:
+            continue
+        process, base_url = start_mock(data_kwargs, server_kwargs)
+        try:
+            api_config.configure(
+                AUTH_DOMAIN=base_url,
+                CONNECT_BASE_URL=f"{base_url}/api/v1",
+                API_BASE_URL=f"{base_url}/api/v1",
+                # Elke run meet de API, niet een snapshot-store of BOM-cache
+                # van een vorige run (en raakt de cache op schijf niet aan)
+                BOM_SNAPSHOT_PATH="",
+                BOM_CACHE_TTL=0,
+                BOM_CACHE_DIR=""
+            )
+            # Zelfde seed en kwargs -> zelfde IDs als in het mock-proces
+            data = MockData(**data_kwargs)
+            for function_name, function in cases(data):
+                record = {"commit": commit, "scenario": name, "function": function_name}
+                record.update(run_case(base_url, function))
+                records.append(record)
+                status = "ok" if record["ok"] else f"FOUT: {record['error']}"
+                print(f"{name:<20} {function_name:<38} {record['wall_s']:>8.2f}s "
+                      f"{record['requests']:>6} req {record['requests_per_s']:>8.1f} req/s "
+                      f"{record['peak_mb']:>8.1f} MB  {status}")
+            del data
+        finally:
+            process.terminate()
+            process.join()
+
+    write_report(records, args.output)
+    print(f"\nRapport: {args.output}.json / {args.output}.csv")
+    if args.compare:
+        compare(records, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,630 @@
+"""
+Lokale stand-in voor HiveCPQ en Auth0, voor tests en benchmarks zonder
+netwerk.
+
+Start bv. met:
+    python mock_hivecpq.py --port 8080 --companies 1000 --latency 0.05 --throttle-rate 0.02
+
+en laat de app ernaar wijzen met:
+    HIVECPQ_AUTH_DOMAIN=http://127.0.0.1:8080
+    HIVECPQ_BASE_URL=http://127.0.0.1:8080/api/v1
+    HIVECPQ_API_BASE_URL=http://127.0.0.1:8080/api/v1
+
+Vanuit Python kan het ook in-process:
+    server = MockHiveServer(MockData(companies=1000)).start()
+    server.configure_clients()
+    ...
+    server.stop()
+
+Lijst-endpoints pagineren met `page` (vanaf 1) en `pageSize` en geven
+{"items", "page", "pageSize", "totalCount"} terug. projectSegments en
+projectSegmentItems hebben een `lastModifiedAt` en filteren op
+`modifiedSince` (inclusief); companies filtert op `distributorId`
+(de subdistributeurs van die distributeur).
+
+Beheer-endpoints (zonder auth, niet meegeteld):
+    GET  /_mock/stats   -> {"requests": n, ...}
+    POST /_mock/reset   -> tellers op nul
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+MANUFACTURER_PREFIX = re.compile(r"^/api/v1/manufacturers/(?P<manufacturer>[^/]+)/(?P<path>.*)$")
+
+ORDER_STATUSES = ["QUOTE", "ORDERED", "CONFIRMED", "IN_PRODUCTION", "SHIPPED"]
+COUNTRIES = ["BE", "NL", "DE", "FR", "ES"]
+UNITS = ["PCS", "MAT", "M", "M2"]
+# lastModifiedAt van de gegenereerde data; wijzigingen krijgen de huidige tijd
+BASE_TIMESTAMP = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def _hex_id(rng):
+    return "%032x" % rng.getrandbits(128)
+
+
+def _timestamp(moment=None):
+    """ISO-8601 in UTC met microseconden; sorteert dus ook als string."""
+    moment = moment or datetime.now(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class MockData:
+    """
+    Synthetische dataset. Alles is deterministisch voor dezelfde `seed`;
+    BOM-bomen worden pas gegenereerd wanneer ze opgevraagd worden.
+    """
+
+    def __init__(
+        self,
+        companies=100,
+        distributors=5,
+        segments=50,
+        items_per_segment=3,
+        bom_nodes=200,
+        bom_depth=5,
+        components=500,
+        seed=0
+    ):
+        self.seed = seed
+        self.bom_nodes = bom_nodes
+        self.bom_depth = bom_depth
+        rng = random.Random(seed)
+
+        self.companies = []
+        self.custom_objects = {}   # type -> objectKey -> customObject
+        distributor_list = []
+        for n in range(companies):
+            cid = _hex_id(rng)
+            if n < distributors:
+                ctype = "DISTRIBUTOR"
+            elif distributor_list and n % 10 != 0:
+                ctype = "SUB_DISTRIBUTOR"
+            else:
+                ctype = "CUSTOMER"
+            company = {
+                "id": cid,
+                "companyType": ctype,
+                "info": {
+                    "name": f"Company {n}",
+                    "description": f"Synthetisch bedrijf {n}",
+                    "telephone": f"+32 9 {n:06d}",
+                    "vatNumber": f"BE0{n:09d}",
+                    "email": f"company{n}@example.com",
+                    "websiteUrl": f"https://company{n}.example.com",
+                    "preferredLanguage": rng.choice(["nl", "en", "de", "fr"]),
+                    "address": {
+                        "addressLine1": f"Straat {n}",
+                        "addressLine2": "",
+                        "city": f"Stad {n % 50}",
+                        "postalCode": f"{1000 + n % 9000}",
+                        "countryIso": rng.choice(COUNTRIES)
+                    }
+                },
+                "productStore": {"enabled": False},
+                "subDistributorSettings": {}
+            }
+            if ctype == "DISTRIBUTOR":
+                distributor_list.append(company)
+                parent = company
+            elif ctype == "SUB_DISTRIBUTOR":
+                parent = rng.choice(distributor_list)
+                company["subDistributorSettings"] = {
+                    "distributor": {"id": parent["id"], "name": parent["info"]["name"]}
+                }
+            else:
+                parent = None
+            self.companies.append(company)
+            if parent is not None and n % 7 != 3:
+                # Niet elk bedrijf heeft een customObject (-> 404 pad)
+                self.upsert_custom_object(f"distributor-{parent['id']}", {
+                    "itemId": cid,
+                    "objectKey": cid,
+                    "keyValues": [
+                        {"key": "currency", "value": rng.choice(["EUR", "GBP"]), "dataType": "STRING"},
+                        {"key": "customer price group", "value": f"PGC{rng.randint(1, 9):02d}", "dataType": "STRING"},
+                        {"key": "company discount group", "value": f"D{rng.randint(1, 6) * 10}", "dataType": "STRING"},
+                        {"key": "hiveCPQId", "value": cid, "dataType": "STRING"},
+                        {"key": "parent_dealerId", "value": parent["id"], "dataType": "STRING"}
+                    ]
+                })
+        self.companies_by_id = {c["id"]: c for c in self.companies}
+
+        self.projects = {}
+        self.segments = []
+        self.segment_items = []
+        for n in range(segments):
+            modified_at = _timestamp(BASE_TIMESTAMP + timedelta(seconds=n))
+            project_id = _hex_id(rng)
+            segment_id = _hex_id(rng)
+            order_status = rng.choice(ORDER_STATUSES)
+            items = []
+            for m in range(items_per_segment):
+                list_price = round(rng.uniform(100, 20000), 2)
+                item = {
+                    "id": _hex_id(rng),
+                    "name": f"Item {n}.{m}",
+                    "price": {
+                        "listPrice": list_price,
+                        "discount": 10.0,
+                        "purchasePrice": round(list_price * 0.9, 2),
+                        "salesPrice": round(list_price * 1.2, 2),
+                        "currency": "EUR",
+                        "markup": 20.0
+                    },
+                    "projectSegment": {"id": segment_id, "orderStatus": order_status},
+                    "configuration": {"id": _hex_id(rng)},
+                    "lastModifiedAt": modified_at
+                }
+                items.append(item)
+            address = {
+                "addressLine1": f"Werf {n}",
+                "city": "Gent",
+                "postalCode": "9000",
+                "countryIso": "BE",
+                "stateIso": ""
+            }
+            segment = {
+                "id": segment_id,
+                "project": {"id": project_id, "name": f"Project {n}"},
+                "price": {
+                    "listPrice": sum(i["price"]["listPrice"] for i in items),
+                    "purchasePrice": sum(i["price"]["purchasePrice"] for i in items),
+                    "subDistributorPurchasePrice": 0,
+                    "salesPrice": sum(i["price"]["salesPrice"] for i in items),
+                    "currency": "EUR"
+                },
+                "order": {
+                    "orderStatus": order_status,
+                    "manufacturerSoRef": f"SO{n:06d}",
+                    "delivery": {"address": dict(address), "companyName": f"Klant {n}", "email": f"klant{n}@example.com"},
+                    "invoice": {"address": dict(address), "companyName": f"Klant {n}", "companyVatNumber": f"BE0{n:09d}"}
+                },
+                "status": "ACTIVE",
+                "projectSegmentItems": [{"id": i["id"]} for i in items],
+                "lastModifiedAt": modified_at
+            }
+            self.segments.append(segment)
+            self.segment_items.extend(items)
+            self.projects[project_id] = {
+                "id": project_id,
+                "name": f"Project {n}",
+                "projectSegments": [{"id": segment_id}]
+            }
+        self.segments_by_id = {s["id"]: s for s in self.segments}
+        self.segment_items_by_id = {i["id"]: i for i in self.segment_items}
+
+        self.components = [
+            {"id": _hex_id(rng), "articleCode": f"ART{n:06d}", "name": f"Component {n}"}
+            for n in range(components)
+        ]
+        self.components_by_id = {c["id"]: c for c in self.components}
+
+    def upsert_custom_object(self, object_type, custom_object):
+        self.custom_objects.setdefault(object_type, {})[custom_object["objectKey"]] = custom_object
+
+    def set_order_status(self, segment, order_status):
+        """Wijzigt de orderstatus van een segment (en zijn items) en bumpt lastModifiedAt."""
+        modified_at = _timestamp()
+        segment["order"]["orderStatus"] = order_status
+        segment["lastModifiedAt"] = modified_at
+        for ref in segment["projectSegmentItems"]:
+            item = self.segment_items_by_id[ref["id"]]
+            item["projectSegment"]["orderStatus"] = order_status
+            item["lastModifiedAt"] = modified_at
+
+    def configuration(self, configuration_id):
+        return _generate_bom(configuration_id, self.bom_nodes, self.bom_depth, self.seed)
+
+
+@lru_cache(maxsize=64)
+def _generate_bom(configuration_id, node_count, depth, seed):
+    """
+    BOM-boom met `node_count` BOM_ITEMs en exact `depth` niveaus. Er zitten
+    ook GROUP-nodes tussen (geen BOM_ITEM), zoals in echte configuraties.
+    """
+    rng = random.Random(f"{seed}:{configuration_id}")
+
+    def new_node(level):
+        return {
+            "type": "BOM_ITEM",
+            "componentCode": f"ART{rng.randint(0, 99999):06d}",
+            "quantity": float(rng.choice([1, 1, 2, 4, 0.5, 2.5])),
+            "unit": rng.choice(UNITS),
+            "price": {
+                "listPrice": round(rng.uniform(1, 500), 2),
+                "purchasePrice": round(rng.uniform(1, 400), 2)
+            },
+            "nodes": [],
+            "_level": level
+        }
+
+    root_nodes = []
+    # Eén keten garandeert de gevraagde diepte
+    chain_parent = None
+    open_nodes = []
+    for level in range(1, min(depth, node_count) + 1):
+        node = new_node(level)
+        (chain_parent["nodes"] if chain_parent else root_nodes).append(node)
+        chain_parent = node
+        if level < depth:
+            open_nodes.append(node)
+    for _ in range(node_count - min(depth, node_count)):
+        if open_nodes and rng.random() < 0.85:
+            parent = rng.choice(open_nodes)
+            node = new_node(parent["_level"] + 1)
+            if rng.random() < 0.1:
+                # BOM_ITEM verpakt in een GROUP-node
+                parent["nodes"].append({"type": "GROUP", "nodes": [node]})
+            else:
+                parent["nodes"].append(node)
+        else:
+            node = new_node(1)
+            root_nodes.append(node)
+        if node["_level"] < depth:
+            open_nodes.append(node)
+
+    # Iteratief strippen: diepe bomen mogen de recursielimiet niet raken
+    stack = list(root_nodes)
+    while stack:
+        node = stack.pop()
+        node.pop("_level", None)
+        stack.extend(node.get("nodes", []))
+
+    return json.dumps({
+        "id": configuration_id,
+        "configurationCode": f"CFG-{configuration_id[:8]}",
+        "configuredProduct": {"code": f"PRODUCT-{configuration_id[:4].upper()}"},
+        "nodes": [{"type": "GROUP", "nodes": root_nodes}]
+    })
+
+
+def modified_since(items, query):
+    since = query.get("modifiedSince", [None])[0]
+    if not since:
+        return items
+    return [item for item in items if item.get("lastModifiedAt", "") >= since]
+
+
+def paginate(items, query):
+    page_size = int(query.get("pageSize", ["100"])[0])
+    page = max(int(query.get("page", ["1"])[0]), 1)
+    start = (page - 1) * page_size
+    return {
+        "items": items[start:start + page_size],
+        "page": page,
+        "pageSize": page_size,
+        "totalCount": len(items)
+    }
+
+
+class MockHiveServer:
+    """
+    HTTP-server rond een MockData-set, met instelbare latency en fouten:
+      latency / jitter  : seconden vertraging per request (+ willekeurige jitter)
+      throttle_rate     : kans op een 429 met Retry-After: retry_after
+      error_rate        : kans op een 500
+    Met `manufacturers` ({manufacturer_id: MockData}) krijgen die
+    manufacturers een eigen dataset; alle andere delen `data`.
+    """
+
+    def __init__(
+        self,
+        data=None,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        jitter=0.0,
+        throttle_rate=0.0,
+        error_rate=0.0,
+        retry_after=1,
+        token_ttl=3600,
+        seed=0,
+        manufacturers=None
+    ):
+        self.data = data or MockData(seed=seed)
+        self.manufacturers = dict(manufacturers or {})
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def configure_clients(self):
+        """Laat api_config (en dus alle api_* modules) naar deze server wijzen."""
+        import api_config
+        api_config.configure(
+            AUTH_DOMAIN=self.base_url,
+            CONNECT_BASE_URL=f"{self.base_url}/api/v1",
+            API_BASE_URL=f"{self.base_url}/api/v1"
+        )
+
+    def request_count(self):
+        with self.lock:
+            return self.stats["requests"]
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats.clear()
+
+    # ------------------------------------------------------------------
+    # Routing
+
+    def handle(self, method, raw_path, headers, body):
+        """Geeft (status, payload, extra_headers) terug."""
+        if raw_path.startswith("/_mock/"):
+            return self.handle_admin(method, raw_path)
+
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats[f"{method} {raw_path.split('?')[0]}"] += 1
+            roll = self.rng.random()
+            roll_error = self.rng.random()
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        parts = urlsplit(raw_path)
+        query = parse_qs(parts.query)
+
+        if parts.path == "/oauth/token" and method == "POST":
+            if not (body or {}).get("client_id"):
+                return 401, {"error": "access_denied"}, {}
+            return 200, {
+                "access_token": f"mock-{self.rng.getrandbits(64):016x}",
+                "expires_in": self.token_ttl,
+                "token_type": "Bearer"
+            }, {}
+
+        if not headers.get("Authorization", "").startswith("Bearer "):
+            return 401, {"message": "Unauthorized"}, {}
+        if roll < self.throttle_rate:
+            return 429, {"message": "Too Many Requests"}, {"Retry-After": str(self.retry_after)}
+        if roll_error < self.error_rate:
+            return 500, {"message": "Injected failure"}, {}
+
+        match = MANUFACTURER_PREFIX.match(parts.path)
+        if not match:
+            return 404, {"message": "Not found"}, {}
+        data = self.manufacturers.get(match.group("manufacturer"), self.data)
+        return self.route(method, match.group("path").strip("/").split("/"), query, body, data)
+
+    def handle_admin(self, method, raw_path):
+        if raw_path == "/_mock/stats" and method == "GET":
+            with self.lock:
+                return 200, dict(self.stats), {}
+        if raw_path == "/_mock/reset" and method == "POST":
+            self.reset_stats()
+            return 204, None, {}
+        return 404, {"message": "Not found"}, {}
+
+    def route(self, method, segments, query, body, data=None):
+        data = data or self.data
+        head = segments[0]
+        n = len(segments)
+
+        if head == "companies":
+            if n == 1 and method == "GET":
+                companies = data.companies
+                distributor_id = query.get("distributorId", [None])[0]
+                if distributor_id:
+                    companies = [
+                        c for c in companies
+                        if (c.get("subDistributorSettings") or {}).get("distributor", {}).get("id") == distributor_id
+                    ]
+                return 200, paginate(companies, query), {}
+            if n == 1 and method == "POST":
+                cid = "%032x" % self.rng.getrandbits(128)
+                company = {"id": cid, "companyType": "SUB_DISTRIBUTOR", **(body or {})}
+                data.companies.append(company)
+                data.companies_by_id[cid] = company
+                return 201, {"id": cid}, {}
+            company = data.companies_by_id.get(segments[1])
+            if company is None:
+                return 404, {"message": "Company not found"}, {}
+            if n == 2 and method == "GET":
+                return 200, company, {}
+            if n == 2 and method == "PUT":
+                company.update(body or {})
+                return 204, None, {}
+            if n == 3 and segments[2] == "defaultAddresses" and method == "POST":
+                return 201, {"id": "%032x" % self.rng.getrandbits(128)}, {}
+
+        elif head == "customObjects" and n == 2 and method == "GET":
+            # Alle customObjects van één type, gepagineerd
+            objects = list(data.custom_objects.get(segments[1], {}).values())
+            return 200, paginate(objects, query), {}
+
+        elif head == "customObjects" and n >= 3:
+            object_type = segments[1]
+            if segments[2] == "bulkUpsert" and method == "POST":
+                custom_objects = (body or {}).get("customObjects", [])
+                for custom_object in custom_objects:
+                    data.upsert_custom_object(object_type, custom_object)
+                return 200, {"upserted": len(custom_objects)}, {}
+            if n == 3 and method == "GET":
+                custom_object = data.custom_objects.get(object_type, {}).get(segments[2])
+                if custom_object is None:
+                    return 404, {"message": "Custom object not found"}, {}
+                return 200, custom_object, {}
+
+        elif head == "resetCustomObjectUpdateTimestamp" and method == "POST":
+            return 204, None, {}
+
+        elif head == "projectSegments":
+            if n == 1 and method == "GET":
+                segments_list = modified_since(data.segments, query)
+                order_status = query.get("orderStatus", [None])[0]
+                if order_status:
+                    segments_list = [s for s in segments_list if s["order"]["orderStatus"] == order_status]
+                return 200, paginate(segments_list, query), {}
+            segment = data.segments_by_id.get(segments[1])
+            if segment is None:
+                return 404, {"message": "Project segment not found"}, {}
+            if n == 2 and method == "GET":
+                return 200, segment, {}
+            if n == 3 and segments[2] == "moveToStep4" and method == "POST":
+                data.set_order_status(segment, "CONFIRMED")
+                return 200, {"id": segment["id"], "orderStatus": "CONFIRMED"}, {}
+
+        elif head == "projectSegmentItems" and method == "GET":
+            if n == 1:
+                return 200, paginate(modified_since(data.segment_items, query), query), {}
+            item = data.segment_items_by_id.get(segments[1])
+            if item is None:
+                return 404, {"message": "Project segment item not found"}, {}
+            return 200, item, {}
+
+        elif head == "projects" and n == 2 and method == "GET":
+            project = data.projects.get(segments[1])
+            if project is None:
+                return 404, {"message": "Project not found"}, {}
+            return 200, project, {}
+
+        elif head == "configurations" and n == 2 and method == "GET":
+            # Al geserialiseerd: grote BOMs niet elke keer opnieuw dumpen
+            return 200, data.configuration(segments[1]), {}
+
+        elif head == "containers" and n >= 5 and segments[4] == "components":
+            if n == 5 and method == "GET":
+                return 200, paginate(data.components, query), {}
+            if n == 6 and method == "PUT":
+                component = data.components_by_id.get(segments[5])
+                if component is None:
+                    return 404, {"message": "Component not found"}, {}
+                component.update({"articleCode": (body or {}).get("articleCode", component["articleCode"])})
+                return 200, component, {}
+
+        return 404, {"message": "Not found"}, {}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers en body in één keer versturen; anders kost Nagle +
+            # delayed ACK tientallen ms per keep-alive request
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+                status, payload, extra_headers = server.handle(method, self.path, self.headers, body)
+                if payload is None:
+                    out = b""
+                elif isinstance(payload, str):
+                    out = payload.encode("utf-8")
+                else:
+                    out = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                if out:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if out:
+                    self.wfile.write(out)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_PUT(self):
+                self._dispatch("PUT")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokale HiveCPQ/Auth0 mock")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--companies", type=int, default=100)
+    parser.add_argument("--distributors", type=int, default=5)
+    parser.add_argument("--segments", type=int, default=50)
+    parser.add_argument("--items-per-segment", type=int, default=3)
+    parser.add_argument("--bom-nodes", type=int, default=200)
+    parser.add_argument("--bom-depth", type=int, default=5)
+    parser.add_argument("--components", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconden per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra willekeurige seconden")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="kans op 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="kans op 500")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data = MockData(
+        companies=args.companies,
+        distributors=args.distributors,
+        segments=args.segments,
+        items_per_segment=args.items_per_segment,
+        bom_nodes=args.bom_nodes,
+        bom_depth=args.bom_depth,
+        components=args.components,
+        seed=args.seed
+    )
+    server = MockHiveServer(
+        data,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    print(f"HIVECPQ_AUTH_DOMAIN={server.base_url}")
+    print(f"HIVECPQ_BASE_URL={server.base_url}/api/v1")
+    print(f"HIVECPQ_API_BASE_URL={server.base_url}/api/v1")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,20 @@
 import streamlit as st
 from api_logic import bulk_upsert
-from api_fetch import get_all_project_segment_items_csv
-from api_file import get_all_project_segments_csv
+from api_fetch import iter_project_segment_items_csv
+from api_file import iter_project_segments_csv
 from api_companies import get_all_companies_excel
 from api_reset import reset_custom_object_cache
 from api_unit import update_units_of_components
 from api_step4 import move_segments_to_step4
-from api_ExportBom import export_bom_to_excel  # aangepast: accepteert nu lijst van ids
+from api_ExportBom import export_bom_to_excel, export_bom_selection_excel, iter_bom_csv  # aangepast: accepteert nu lijst van ids
 from api_distributor import verwerk_distributeur
 from api_subdistributor import verwerk_subdistributeur
 from get_all_companies_excel import get_companies_for_distributor_excel
+from api_compare import compare_manufacturers_excel
+from api_bomdiff import compare_boms_excel
+from api_excel import spool_chunks
+import api_config
+import api_metrics
 
 
 import pandas as pd
@@ -50,6 +55,28 @@ def check_password():
 if not check_password():
     st.stop()
 
+# Prometheus /metrics (alleen als HIVECPQ_METRICS_PORT gezet is)
+api_metrics.start_metrics_server()
+
+
+def show_performance(perf, key):
+    """Expander met de request-statistieken van de zonet uitgevoerde operatie."""
+    rows = perf.table()
+    if not rows:
+        return
+    with st.expander("Performance"):
+        total_requests = sum(r["count"] for r in rows)
+        total_errors = sum(r["errors"] for r in rows)
+        st.caption(f"{total_requests} requests, waarvan {total_errors} met foutstatus")
+        st.dataframe(pd.DataFrame(rows))
+        st.download_button(
+            label="Download Prometheus-metrics",
+            data=perf.prometheus_text(),
+            file_name="hivecpq_metrics.prom",
+            mime="text/plain",
+            key=f"perf_{key}"
+        )
+
 st.set_page_config(page_title="HIVE Tool", layout="centered", page_icon="🛠️")
 
 # Sidebar logo
@@ -82,9 +109,11 @@ functionaliteit = st.sidebar.selectbox(
         "Get all project segments",
         "Get all companies",
         "Get companies (per distributor)",  # <-- NIEUW
+        "Compare manufacturers",
         "Update Units",
         "Move to Step 4",
         "Export BOM",
+        "Compare BOMs",
         "Import Distributor",
         "Import Subdistributor"
     ]
@@ -100,16 +129,18 @@ if functionaliteit == "BulkUpsert":
         if not all([manufacturer_id, client_id, client_secret, json_input.strip()]):
             st.error("Vul alle credentials én JSON in!")
         else:
-            with st.spinner('Verzenden...'):
+            with api_metrics.collect() as perf, st.spinner('Verzenden...'):
                 response = bulk_upsert(manufacturer_id, client_id, client_secret, json_input)
             st.code(response, language='json')
+            show_performance(perf, "bulkupsert")
     if st.button("Reset Custom Object Cache", key="reset_cache_btn"):
         if not all([manufacturer_id, client_id, client_secret]):
             st.error("Vul alle credentials in!")
         else:
-            with st.spinner('Resetten...'):
+            with api_metrics.collect() as perf, st.spinner('Resetten...'):
                 reset_response = reset_custom_object_cache(manufacturer_id, client_id, client_secret)
             st.code(reset_response, language='json')
+            show_performance(perf, "reset_cache")
     st.markdown("""
     <br>
     **Voorbeeld JSON structuur:**
@@ -129,69 +160,94 @@ if functionaliteit == "BulkUpsert":
 elif functionaliteit == "Get all project segment items":
     st.title("Get all project segment items")
     st.markdown("Klik op onderstaande knop om alle project segment items als CSV te downloaden:")
+    use_mirror = st.checkbox(
+        "Lokale mirror gebruiken (enkel wijzigingen sinds de vorige keer ophalen)",
+        key="segment_items_mirror"
+    )
     if st.button("Genereer CSV", key="get_project_segment_items_csv"):
         if not all([manufacturer_id, client_id, client_secret]):
             st.error("Vul alle credentials in!")
         else:
-            with st.spinner('Ophalen en converteren...'):
-                csv_content = get_all_project_segment_items_csv(manufacturer_id, client_id, client_secret)
-                if isinstance(csv_content, tuple) and csv_content[0] is None:
-                    st.error(csv_content[1])
-                elif not csv_content:
-                    st.error("Onbekende fout of geen data opgehaald.")
+            with api_metrics.collect() as perf, st.spinner('Ophalen en converteren...'):
+                # Pagina per pagina ophalen en meteen wegschrijven
+                try:
+                    csv_file = spool_chunks(
+                        iter_project_segment_items_csv(
+                            manufacturer_id, client_id, client_secret, use_mirror=use_mirror
+                        )
+                    )
+                except Exception as e:
+                    st.error(f"Onverwachte fout: {str(e)}")
                 else:
                     st.success("CSV succesvol gegenereerd!")
                     st.download_button(
                         label="Download CSV",
-                        data=csv_content,
+                        data=csv_file,
                         file_name="projectSegmentItems.csv",
                         mime="text/csv"
                     )
+            show_performance(perf, "segment_items")
 
 # 3. Get all project segments
 elif functionaliteit == "Get all project segments":
     st.title("Get all project segments")
     st.markdown("Klik op onderstaande knop om alle project segments als CSV te downloaden:")
+    use_mirror = st.checkbox(
+        "Lokale mirror gebruiken (enkel wijzigingen sinds de vorige keer ophalen)",
+        key="segments_mirror"
+    )
     if st.button("Genereer Segments CSV", key="get_project_segments_csv"):
         if not all([manufacturer_id, client_id, client_secret]):
             st.error("Vul alle credentials in!")
         else:
-            with st.spinner('Ophalen en converteren...'):
-                csv_content = get_all_project_segments_csv(manufacturer_id, client_id, client_secret)
-                if isinstance(csv_content, tuple) and csv_content[0] is None:
-                    st.error(csv_content[1])
-                elif not csv_content:
-                    st.error("Onbekende fout of geen data opgehaald.")
+            with api_metrics.collect() as perf, st.spinner('Ophalen en converteren...'):
+                # Pagina's parallel ophalen, in volgorde wegschrijven
+                try:
+                    csv_file = spool_chunks(
+                        iter_project_segments_csv(
+                            manufacturer_id, client_id, client_secret, use_mirror=use_mirror
+                        )
+                    )
+                except Exception as e:
+                    st.error(f"Onverwachte fout: {str(e)}")
                 else:
                     st.success("CSV succesvol gegenereerd!")
                     st.download_button(
                         label="Download Segments CSV",
-                        data=csv_content,
+                        data=csv_file,
                         file_name="projectSegments.csv",
                         mime="text/csv"
                     )
+            show_performance(perf, "segments")
 
 elif functionaliteit == "Get all companies":
     st.title("Get all companies")
     st.markdown("Klik op onderstaande knop om alle bedrijven als Excel te downloaden:")
+    concurrency = st.number_input(
+        "Gelijktijdige customObject-calls", min_value=1, max_value=64, value=api_config.MAX_IN_FLIGHT,
+        help="Begrensd door HIVECPQ_MAX_IN_FLIGHT per manufacturer.", key="companies_concurrency"
+    )
     if st.button("Genereer Companies Excel", key="get_companies_excel"):
         if not all([manufacturer_id, client_id, client_secret]):
             st.error("Vul alle credentials in!")
         else:
-            with st.spinner('Ophalen en converteren...'):
-                excel_content = get_all_companies_excel(manufacturer_id, client_id, client_secret)
+            with api_metrics.collect() as perf, st.spinner('Ophalen en converteren...'):
+                excel_content = get_all_companies_excel(
+                    manufacturer_id, client_id, client_secret, concurrency=int(concurrency)
+                )
                 if isinstance(excel_content, tuple) and excel_content[0] is None:
                     st.error(excel_content[1])
                 elif not excel_content:
                     st.error("Onbekende fout of geen data opgehaald.")
                 else:
-                    st.success("Excel succesvol gegenereerd!")
+                    st.success("Excel succesvol gegenereerd! Mislukte customObject-calls staan op het tabblad 'Fouten'.")
                     st.download_button(
                         label="Download Companies Excel",
                         data=excel_content,
                         file_name="bedrijven_export.xlsx",
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                     )
+            show_performance(perf, "companies")
 
 
 # 5. Update Units
@@ -210,7 +266,7 @@ elif functionaliteit == "Update Units":
         if not all([manufacturer_id, client_id, client_secret, article_codes_input.strip(), unit_code_input.strip(), version_input.strip()]):
             st.error("Vul alle velden én API-credentials in!")
         else:
-            with st.spinner("Bezig met updaten..."):
+            with api_metrics.collect() as perf, st.spinner("Bezig met updaten..."):
                 results = update_units_of_components(
                     manufacturer_id, client_id, client_secret,
                     article_codes_input, unit_code_input, version_input
@@ -220,6 +276,7 @@ elif functionaliteit == "Update Units":
                 st.write(results)
             else:
                 st.error("Er is iets misgegaan of er zijn geen resultaten.")
+            show_performance(perf, "units")
 
 # 6. Move to Step 4
 elif functionaliteit == "Move to Step 4":
@@ -237,7 +294,7 @@ elif functionaliteit == "Move to Step 4":
         if not all([manufacturer_id, client_id, client_secret, input_content.strip()]):
             st.error("Vul alle velden én API-credentials in!")
         else:
-            with st.spinner("Bezig met verwerken..."):
+            with api_metrics.collect() as perf, st.spinner("Bezig met verwerken..."):
                 resultaten = move_segments_to_step4(
                     manufacturer_id, client_id, client_secret, input_content
                 )
@@ -246,6 +303,7 @@ elif functionaliteit == "Move to Step 4":
                 st.write(resultaten)
             else:
                 st.warning("Er is niets gebeurd of geen resultaat ontvangen.")
+            show_performance(perf, "step4")
 
 
 # 7. Export BOM (meerdere tegelijk!)
@@ -253,18 +311,78 @@ elif functionaliteit == "Export BOM":
     st.title("Export BOM naar Excel")
     st.markdown("""
     Exporteer de volledige stuklijststructuur (BOM) van een of meerdere configuraties naar een Excel-bestand.<br>
-    Vul per regel een <b>ProjectSegmentItemId</b> in en klik op 'Genereer BOM Excel'.<br>
-    <i>Indien je meerdere IDs invult (elk op een nieuwe regel), worden alle BOMs gecombineerd in één Excel-bestand.</i>
+    Vul per regel een <b>ProjectSegmentItemId</b> in en klik op 'Genereer BOM'.<br>
+    <i>Indien je meerdere IDs invult (elk op een nieuwe regel), worden alle BOMs gecombineerd in één Excel-bestand.</i><br>
+    Of selecteer op project, segment of orderstatus: de segment items worden dan zelf opgezocht.
     """, unsafe_allow_html=True)
-    segment_item_ids_input = st.text_area("ProjectSegmentItemId(s) (één per regel)", height=120)
-    segment_item_ids = [x.strip() for x in segment_item_ids_input.splitlines() if x.strip()]
-    if st.button("Genereer BOM Excel"):
-        if not all([manufacturer_id, client_id, client_secret, segment_item_ids]):
-            st.error("Vul alle API-credentials én minimaal één ProjectSegmentItemId in!")
+    bom_selection = st.radio(
+        "Selecteer op", ["ProjectSegmentItemIds", "Projecten", "Segmenten", "Orderstatus"], horizontal=True
+    )
+    bom_use_mirror = False
+    if bom_selection == "Orderstatus":
+        selection_input = st.text_input("Orderstatus(sen), komma-gescheiden (bv. CONFIRMED)")
+        selection = [x.strip() for x in selection_input.split(",") if x.strip()]
+        bom_use_mirror = st.checkbox("Segments uit de lokale mirror lezen (enkel wijzigingen ophalen)")
+    else:
+        selection_input = st.text_area(f"{bom_selection} (één ID per regel)", height=120)
+        selection = [x.strip() for x in selection_input.splitlines() if x.strip()]
+    bom_format = st.radio("Formaat", ["Excel", "CSV"], horizontal=True,
+                          disabled=bom_selection != "ProjectSegmentItemIds")
+    bom_rollup = st.checkbox(
+        "Tabblad 'Rollup': totale aantallen en prijzen per component (enkel Excel)",
+        disabled=bom_selection == "ProjectSegmentItemIds" and bom_format != "Excel"
+    )
+    bom_refresh = st.checkbox("BOMs vers ophalen i.p.v. uit de BOM-cache")
+    bom_refetch = st.checkbox("Ook bevroren BOMs (bevestigde orders) opnieuw ophalen i.p.v. uit de snapshot-store")
+    segment_item_ids = selection if bom_selection == "ProjectSegmentItemIds" else []
+    if st.button("Genereer BOM"):
+        if not all([manufacturer_id, client_id, client_secret, selection]):
+            st.error(f"Vul alle API-credentials én minimaal één waarde voor {bom_selection} in!")
+        elif bom_selection != "ProjectSegmentItemIds":
+            selectors = {
+                "Projecten": "project_ids",
+                "Segmenten": "segment_ids",
+                "Orderstatus": "order_statuses",
+            }
+            with api_metrics.collect() as perf, st.spinner("Segment items en BOMs worden opgehaald..."):
+                excel_bytes, filename, error = export_bom_selection_excel(
+                    manufacturer_id, client_id, client_secret, rollup=bom_rollup, use_mirror=bom_use_mirror,
+                    use_snapshots=not bom_refetch, refresh=bom_refresh, **{selectors[bom_selection]: selection}
+                )
+            if error:
+                st.error(f"Fout bij exporteren van BOM: {error}")
+            else:
+                st.success("Excel-bestand gegenereerd!")
+                st.download_button(
+                    label="Download Excel",
+                    data=excel_bytes,
+                    file_name=filename,
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+            show_performance(perf, "bom")
+        elif bom_format == "CSV":
+            with api_metrics.collect() as perf, st.spinner("BOM wordt opgehaald en verwerkt..."):
+                try:
+                    csv_file = spool_chunks(
+                        iter_bom_csv(manufacturer_id, client_id, client_secret, segment_item_ids,
+                                     use_snapshots=not bom_refetch, refresh=bom_refresh)
+                    )
+                except Exception as e:
+                    st.error(f"Fout bij exporteren van BOM: {str(e)}")
+                else:
+                    st.success("CSV-bestand gegenereerd!")
+                    st.download_button(
+                        label="Download CSV",
+                        data=csv_file,
+                        file_name="bom_structuur.csv",
+                        mime="text/csv"
+                    )
+            show_performance(perf, "bom")
         else:
-            with st.spinner("BOM wordt opgehaald en verwerkt..."):
+            with api_metrics.collect() as perf, st.spinner("BOM wordt opgehaald en verwerkt..."):
                 excel_bytes, filename, error = export_bom_to_excel(
-                    manufacturer_id, client_id, client_secret, segment_item_ids
+                    manufacturer_id, client_id, client_secret, segment_item_ids, rollup=bom_rollup,
+                    use_snapshots=not bom_refetch, refresh=bom_refresh
                 )
             if error:
                 st.error(f"Fout bij exporteren van BOM: {error}")
@@ -278,6 +396,59 @@ elif functionaliteit == "Export BOM":
                 )
             else:
                 st.error("Onbekende fout, geen bestand aangemaakt.")
+            show_performance(perf, "bom")
+
+# Twee BOMs vergelijken
+elif functionaliteit == "Compare BOMs":
+    st.title("Compare BOMs")
+    st.markdown("""
+    Vergelijkt twee stuklijsten node per node (op het pad van componentCodes) en toont
+    toegevoegde, verwijderde en gewijzigde componenten (aantal, unit, prijzen).
+    Kies als oude BOM een eerdere BOM-export om dezelfde configuratie op twee tijdstippen te vergelijken.
+    """)
+    col_old, col_new = st.columns(2)
+    with col_old:
+        old_source = st.radio("Oude BOM", ["Configuratie ID", "ProjectSegmentItemId", "Eerdere export (Excel)"])
+        old_excel = None
+        if old_source == "Eerdere export (Excel)":
+            old_excel = st.file_uploader("BOM-export (.xlsx)", type=["xlsx"], key="bomdiff_old_excel")
+            old_id = st.text_input("ProjectSegmentItemId in de export (leeg als er maar één BOM in staat)", key="bomdiff_old_id")
+        else:
+            old_id = st.text_input(old_source, key="bomdiff_old_id").strip()
+    with col_new:
+        new_source = st.radio("Nieuwe BOM", ["Configuratie ID", "ProjectSegmentItemId"])
+        new_id = st.text_input(new_source, key="bomdiff_new_id").strip()
+
+    if st.button("Vergelijk", key="compare_boms"):
+        if not all([manufacturer_id, client_id, client_secret, new_id]) or not (old_id or old_excel):
+            st.error("Vul alle API-credentials en beide BOMs in!")
+        else:
+            old_kwargs = {"old_excel": old_excel, "old_segment_item_id": old_id.strip() or None}
+            if old_source == "Configuratie ID":
+                old_kwargs = {"old_configuration_id": old_id}
+            elif old_source == "ProjectSegmentItemId":
+                old_kwargs = {"old_segment_item_id": old_id}
+            new_kwargs = {"new_configuration_id": new_id} if new_source == "Configuratie ID" \
+                else {"new_segment_item_id": new_id}
+            with api_metrics.collect() as perf, st.spinner('Ophalen en vergelijken...'):
+                excel_file, diffs, error = compare_boms_excel(
+                    manufacturer_id, client_id, client_secret, **old_kwargs, **new_kwargs
+                )
+            if error:
+                st.error(error)
+            else:
+                if diffs:
+                    st.warning(f"{len(diffs)} verschil(len) gevonden.")
+                    st.dataframe(pd.DataFrame(diffs))
+                else:
+                    st.success("Geen verschillen gevonden.")
+                st.download_button(
+                    label="Download vergelijking (Excel)",
+                    data=excel_file,
+                    file_name="vergelijking_bom.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+            show_performance(perf, "compare_boms")
 
 # 7. Import Distributor"
 elif functionaliteit == "Import Distributor":
@@ -300,10 +471,11 @@ elif functionaliteit == "Import Distributor":
             if not all([manufacturer_id, client_id, client_secret]):
                 st.error("Vul je API-gegevens in!")
             else:
-                with st.spinner("Bezig met verwerken..."):
+                with api_metrics.collect() as perf, st.spinner("Bezig met verwerken..."):
                     resultaat = verwerk_distributeur(df, selected_index, manufacturer_id, client_id, client_secret)
                 st.text_area("Logbestand:", resultaat, height=300)
                 st.download_button("📥 Download log", resultaat, file_name="log_distributor.txt")
+                show_performance(perf, "distributor")
 
 # 8. Import Sub-Distributor"
 elif functionaliteit == "Import Subdistributor":
@@ -320,10 +492,11 @@ elif functionaliteit == "Import Subdistributor":
             if not all([manufacturer_id, client_id, client_secret]):
                 st.error("Vul alle API-gegevens in!")
             else:
-                with st.spinner("Bezig met verwerken..."):
+                with api_metrics.collect() as perf, st.spinner("Bezig met verwerken..."):
                     resultaat = verwerk_subdistributeur(df, selected_index, manufacturer_id, client_id, client_secret)
                 st.text_area("Log:", resultaat, height=300)
                 st.download_button("📥 Download log", resultaat, file_name="log_subdistributor.txt")
+                show_performance(perf, "subdistributor")
 
 # 9. Export sub-distributor and distributor data"
 elif functionaliteit == "Get companies (per distributor)":
@@ -335,21 +508,26 @@ elif functionaliteit == "Get companies (per distributor)":
 
     distributor_id_input = st.text_input("Distributeur ID (verplicht)")
     manufacturer_slug_opt = st.text_input("Manufacturer slug (optioneel, bv. 'MyAquadeck')", value="")
+    concurrency = st.number_input(
+        "Gelijktijdige customObject-calls", min_value=1, max_value=64, value=api_config.MAX_IN_FLIGHT,
+        help="Begrensd door HIVECPQ_MAX_IN_FLIGHT per manufacturer.", key="companies_distributor_concurrency"
+    )
 
     if st.button("Genereer Excel (distributeur + subdistributeurs)"):
         if not all([manufacturer_id, client_id, client_secret, distributor_id_input.strip()]):
             st.error("Vul alle API-credentials én de distributeur ID in!")
         else:
-            with st.spinner('Ophalen en converteren...'):
+            with api_metrics.collect() as perf, st.spinner('Ophalen en converteren...'):
                 excel_content = get_companies_for_distributor_excel(
                     manufacturer_id=manufacturer_id,
                     client_id=client_id,
                     client_secret=client_secret,
                     distributor_id=distributor_id_input.strip(),
-                    manufacturer_slug=(manufacturer_slug_opt.strip() or None)
+                    manufacturer_slug=(manufacturer_slug_opt.strip() or None),
+                    concurrency=int(concurrency)
                 )
 
-            # Zelfde return-contract als elders: BytesIO OF (None, "fout")
+            # Zelfde return-contract als elders: bestandsobject OF (None, "fout")
             if isinstance(excel_content, tuple) and excel_content[0] is None:
                 st.error(excel_content[1])
             elif not excel_content:
@@ -364,6 +542,42 @@ elif functionaliteit == "Get companies (per distributor)":
                     file_name=f"bedrijven_export_{distributor_id_input.strip()}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
+            show_performance(perf, "companies_distributor")
+
+# 10. Companies + customObjects van meerdere manufacturers vergelijken
+elif functionaliteit == "Compare manufacturers":
+    st.title("Compare manufacturers")
+    st.markdown("""
+    Exporteert de bedrijven (met currency, price group en discount group) van meerdere manufacturers
+    **tegelijk** en toont de verschillen: ontbrekende bedrijven en afwijkende waarden.
+    Bedrijven worden gekoppeld op btw-nummer, of op naam als er geen btw-nummer is.
+    De API-credentials uit de zijbalk worden voor alle manufacturers gebruikt.
+    """)
+    manufacturer_ids_input = st.text_input("Manufacturer IDs (komma-gescheiden)", value="MyAquadeck, aquadeck_staging")
+
+    if st.button("Vergelijk", key="compare_manufacturers"):
+        if not all([client_id, client_secret, manufacturer_ids_input.strip()]):
+            st.error("Vul de API-credentials én de manufacturer IDs in!")
+        else:
+            with api_metrics.collect() as perf, st.spinner('Ophalen en vergelijken...'):
+                excel_file, diffs, error = compare_manufacturers_excel(
+                    manufacturer_ids_input.split(","), client_id, client_secret
+                )
+            if error:
+                st.error(error)
+            else:
+                if diffs:
+                    st.warning(f"{len(diffs)} verschil(len) gevonden.")
+                    st.dataframe(pd.DataFrame(diffs))
+                else:
+                    st.success("Geen verschillen gevonden.")
+                st.download_button(
+                    label="Download vergelijking (Excel)",
+                    data=excel_file,
+                    file_name="vergelijking_manufacturers.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+            show_performance(perf, "compare_manufacturers")
 
 
 
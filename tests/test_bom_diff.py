@@ -0,0 +1,134 @@
+import copy
+import random
+
+import pytest
+
+from api_bomdiff import BOM_COMPARED_FIELDS, bom_paths, bom_rows_from_excel, diff_boms
+from api_ExportBom import bom_json_to_rows, format_price, write_bom_excel
+from test_bom_flatten import random_bom, random_node
+
+
+def reference_paths(data):
+    """
+    Pad -> BOM_ITEM rechtstreeks op de boom: de componentCodes van de
+    BOM_ITEMs erboven, met #n voor de n-de gelijke component onder
+    dezelfde parent (andere nodes tellen niet als parent).
+    """
+    paths = {}
+
+    def walk(node, parent, seen):
+        for sub in node.get("nodes", []):
+            if sub["type"] != "BOM_ITEM":
+                walk(sub, parent, seen)
+                continue
+            component = str(sub.get("componentCode", ""))
+            seen[component] = seen.get(component, 0) + 1
+            path = parent + (component if seen[component] == 1 else f"{component}#{seen[component]}",)
+            paths[path] = sub
+            walk(sub, path, {})
+
+    # Alle BOM_ITEMs op level 1 delen dezelfde (lege) parent
+    top_seen = {}
+    for node in data["nodes"]:
+        walk(node, (), top_seen)
+    return paths
+
+
+def reference_values(node):
+    quantity = node.get("quantity", "")
+    price = node.get("price", {}) or {}
+    return {
+        "Aantal": "" if quantity == "" else float(quantity),
+        "Unit": str(node.get("unit", "")),
+        "ListPrice": format_price(price.get("listPrice", 0)),
+        "PurchasePrice": format_price(price.get("purchasePrice", 0)),
+    }
+
+
+def reference_diff(old, new):
+    """[(pad, verschil, velden)] in de volgorde van diff_boms."""
+    old_paths, new_paths = reference_paths(old), reference_paths(new)
+    diffs = []
+    for path, node in new_paths.items():
+        if path not in old_paths:
+            diffs.append((path, "toegevoegd", []))
+            continue
+        old_values, new_values = reference_values(old_paths[path]), reference_values(node)
+        changed = [f for f in BOM_COMPARED_FIELDS if old_values[f] != new_values[f]]
+        if changed:
+            diffs.append((path, "gewijzigd", changed))
+    for path in old_paths:
+        if path not in new_paths:
+            diffs.append((path, "verwijderd", []))
+    return diffs
+
+
+def bom_items(data):
+    stack = list(data["nodes"])
+    while stack:
+        node = stack.pop()
+        stack.extend(node.get("nodes", []))
+        if node["type"] == "BOM_ITEM":
+            yield node
+
+
+def mutate(data, seed):
+    """Kopie met gewijzigde aantallen/prijzen, verwijderde en toegevoegde nodes."""
+    rng = random.Random(seed)
+    data = copy.deepcopy(data)
+    items = [node for top in data["nodes"] for node in bom_items({"nodes": top["nodes"]})]
+    for node in rng.sample(items, 20):
+        choice = rng.random()
+        if choice < 0.3:
+            node["quantity"] = rng.choice([1, 2, 0.5, ""])
+        elif choice < 0.5:
+            node["price"] = {"listPrice": rng.randint(0, 999) / 10, "purchasePrice": 1}
+        elif choice < 0.7:
+            node["unit"] = "doos"
+        elif node["nodes"]:
+            del node["nodes"][rng.randrange(len(node["nodes"]))]
+        else:
+            node["nodes"].append(random_node(rng, rng.randrange(60)))
+    return data
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_bom_paths_match_reference(seed):
+    data = random_bom(seed, nodes=600, depth=20)
+    rows = bom_json_to_rows(data, "PSI", "Item")
+    paths = bom_paths(rows)
+    expected = reference_paths(data)
+    assert list(paths) == list(expected)
+    for path, node in expected.items():
+        assert paths[path]["Component"] == node.get("componentCode", "")
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_diff_matches_reference(seed):
+    old = random_bom(seed, nodes=600, depth=20)
+    new = mutate(old, seed)
+    diffs = diff_boms(bom_json_to_rows(old, "PSI", "Item"), bom_json_to_rows(new, "PSI", "Item"))
+    expected = reference_diff(old, new)
+    assert expected
+    assert [(d["Pad"], d["Verschil"], d["Velden"]) for d in diffs] == [
+        (" > ".join(path), verschil, ", ".join(fields)) for path, verschil, fields in expected
+    ]
+
+
+def test_diff_against_own_export_is_empty(tmp_path):
+    data = random_bom(3, nodes=300, depth=10)
+    rows = bom_json_to_rows(data, "PSI", "Item")
+    export = write_bom_excel(iter(rows))
+    # Teruggelezen is alles tekst ("2" i.p.v. 2.0): geen verschillen
+    assert diff_boms(bom_rows_from_excel(export), rows) == []
+
+
+def test_multi_bom_export_needs_segment_item_id():
+    rows = bom_json_to_rows(random_bom(1, nodes=50, depth=5), "PSI1", "Een")
+    rows += bom_json_to_rows(random_bom(2, nodes=50, depth=5), "PSI2", "Twee")
+    export = write_bom_excel(iter(rows))
+    with pytest.raises(ValueError):
+        bom_rows_from_excel(export)
+    export.seek(0)
+    own = bom_rows_from_excel(export, "PSI2")
+    assert diff_boms(own, [row for row in rows if row["ProjectSegmentItemId"] == "PSI2"]) == []
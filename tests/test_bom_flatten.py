@@ -0,0 +1,184 @@
+import random
+import sys
+import threading
+
+import pytest
+
+from api_ExportBom import bom_json_to_rows, bom_label_for_level, bomitem_descendant_flags, format_price
+
+DEPTH = 1500
+
+
+# De recursieve versie van voor de iteratieve traverse, als referentie
+def old_has_bomitem_descendants(node):
+    for sub in node.get("nodes", []):
+        if sub["type"] == "BOM_ITEM":
+            return True
+        if old_has_bomitem_descendants(sub):
+            return True
+    return False
+
+
+def old_traverse(node, parent, level, project_code, projectsegmentitem_id, projectsegmentitem_name, rows):
+    for subnode in node.get("nodes", []):
+        if subnode["type"] == "BOM_ITEM":
+            if old_has_bomitem_descendants(subnode):
+                item_type = bom_label_for_level(level)
+            else:
+                item_type = "Component"
+            aantal = subnode.get("quantity", "")
+            if isinstance(aantal, float) and aantal.is_integer():
+                aantal = int(aantal)
+            price = subnode.get("price", {}) or {}
+            list_price = format_price(price.get("listPrice", 0))
+            purchase_price = format_price(price.get("purchasePrice", 0))
+            rows.append({
+                "ProjectSegmentItemId": projectsegmentitem_id,
+                "ProjectSegmentItemName": projectsegmentitem_name,
+                "Level": level,
+                "Parent": parent,
+                "Project": project_code if level == 0 else "",
+                "Component": subnode.get("componentCode", ""),
+                "ItemType": item_type,
+                "Aantal": aantal,
+                "Unit": subnode.get("unit", ""),
+                "ListPrice": list_price,
+                "PurchasePrice": purchase_price,
+            })
+            old_traverse(subnode, subnode.get("componentCode", ""), level + 1, project_code,
+                         projectsegmentitem_id, projectsegmentitem_name, rows)
+        else:
+            old_traverse(subnode, parent, level, project_code, projectsegmentitem_id, projectsegmentitem_name, rows)
+
+
+def old_bom_json_to_rows(data, projectsegmentitem_id, projectsegmentitem_name):
+    project_code = data["configuredProduct"]["code"]
+    configuration_code = data.get("configurationCode", "")
+    project_display = f"{project_code} : {configuration_code}" if configuration_code else project_code
+
+    rows = [{
+        "ProjectSegmentItemId": projectsegmentitem_id,
+        "ProjectSegmentItemName": projectsegmentitem_name,
+        "Level": 0,
+        "Parent": "",
+        "Project": project_display,
+        "Component": "",
+        "ItemType": "",
+        "Aantal": "",
+        "Unit": "",
+        "ListPrice": "",
+        "PurchasePrice": "",
+    }]
+
+    for node in data.get("nodes", []):
+        old_traverse(node, project_code, 1, project_code, projectsegmentitem_id, projectsegmentitem_name, rows)
+    return rows
+
+
+def run_deep(func, *args):
+    """Voert de recursieve referentie uit in een thread met genoeg stack."""
+    result = {}
+
+    def target():
+        try:
+            result["value"] = func(*args)
+        except BaseException as e:
+            result["error"] = e
+
+    old_limit = sys.getrecursionlimit()
+    old_stack = threading.stack_size()
+    sys.setrecursionlimit(20 * DEPTH + 1000)
+    threading.stack_size(512 * 1024 * 1024)
+    try:
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(old_stack)
+        sys.setrecursionlimit(old_limit)
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def random_node(rng, n):
+    """BOM_ITEM (met hoeveelheid, eenheid en prijs) of een andere node."""
+    if rng.random() < 0.3:
+        return {"type": rng.choice(["GROUP", "OPTION", "PARAMETER"]), "nodes": []}
+    node = {
+        "type": "BOM_ITEM",
+        "componentCode": f"C{n % 50}",
+        "quantity": rng.choice([1, 2, 2.0, 0.5, 3.25, ""]),
+        "unit": rng.choice(["pcs", "m", "kg", ""]),
+        "nodes": [],
+    }
+    if rng.random() < 0.8:
+        node["price"] = {"listPrice": rng.randint(0, 10000) / 100, "purchasePrice": rng.randint(0, 10000) / 100}
+    return node
+
+
+def random_bom(seed, nodes, depth):
+    """
+    Willekeurige BOM met één keten van `depth` niveaus (met af en toe een
+    niet-BOM_ITEM ertussen) en daarnaast `nodes` nodes op willekeurige
+    plaatsen, zodat zowel diepte als breedte getest worden.
+    """
+    rng = random.Random(seed)
+    top = {"type": "BOM_ITEM", "componentCode": "TOP", "quantity": 1, "unit": "pcs", "nodes": []}
+    all_nodes = [top]
+    parent = top
+    for n in range(depth):
+        child = random_node(rng, n)
+        parent["nodes"].append(child)
+        all_nodes.append(child)
+        parent = child
+    for n in range(nodes):
+        child = random_node(rng, n)
+        rng.choice(all_nodes)["nodes"].append(child)
+        all_nodes.append(child)
+    # De volgorde van de kinderen mag niet gesorteerd zijn
+    for node in all_nodes:
+        rng.shuffle(node["nodes"])
+    return {
+        "configuredProduct": {"code": f"PRJ{seed}"},
+        "configurationCode": f"CFG{seed}" if seed % 2 else "",
+        "nodes": [top, random_node(rng, -1)],
+    }
+
+
+def all_nodes_of(data):
+    stack = list(data["nodes"])
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.get("nodes", []))
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_flatten_matches_recursive_version(seed):
+    data = random_bom(seed, nodes=5000, depth=DEPTH)
+    expected = run_deep(old_bom_json_to_rows, data, "PSI", "Item")
+    rows = bom_json_to_rows(data, "PSI", "Item")
+    assert max(row["Level"] for row in rows) > 1000
+    # Zelfde rijen in dezelfde volgorde (ItemType volgt uit de descendant-vlaggen)
+    assert rows == expected
+
+
+def test_descendant_flags_match_recursive_version():
+    data = random_bom(42, nodes=3000, depth=DEPTH)
+    root = {"type": "ROOT", "nodes": data["nodes"]}
+    flags = bomitem_descendant_flags(root)
+    expected = run_deep(lambda: {id(node): old_has_bomitem_descendants(node) for node in all_nodes_of(data)})
+    assert {id(node): flags[id(node)] for node in all_nodes_of(data)} == expected
+    assert any(expected.values()) and not all(expected.values())
+
+
+def test_flatten_deeper_than_recursion_limit():
+    depth = sys.getrecursionlimit() + DEPTH
+    data = random_bom(7, nodes=0, depth=depth)
+    rows = bom_json_to_rows(data, "PSI", "Item")
+    # De nodes op het hoogste niveau zelf geven geen rij, enkel hun BOM_ITEMs
+    top_level = {id(node) for node in data["nodes"]}
+    bom_items = sum(1 for node in all_nodes_of(data) if node["type"] == "BOM_ITEM" and id(node) not in top_level)
+    assert len(rows) == bom_items + 1
+    assert max(row["Level"] for row in rows) > sys.getrecursionlimit()
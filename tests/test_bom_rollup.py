@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+
+from api_ExportBom import ROLLUP_COLUMNS, ROLLUP_INPUT_COLUMNS, bom_json_to_rows, bom_rollup, error_row, format_price
+from test_bom_flatten import random_bom
+
+
+def _price(value):
+    # Zoals op de rijen: per stuk, afgerond op de cent
+    return float(format_price(value).replace(",", "."))
+
+
+def reference_rollup(boms):
+    """
+    Per-rij referentie rechtstreeks op de BOM-bomen: het aantal van elk
+    BOM_ITEM maal de aantallen van de BOM_ITEMs erboven (leeg = 1).
+    {(component, unit): [aantal, listprice, purchaseprice, regels]}
+    """
+    totals = {}
+
+    def walk(node, factor):
+        for sub in node.get("nodes", []):
+            if sub["type"] != "BOM_ITEM":
+                walk(sub, factor)
+                continue
+            quantity = sub.get("quantity", "")
+            total = factor * (1.0 if quantity == "" else float(quantity))
+            price = sub.get("price", {}) or {}
+            entry = totals.setdefault((sub.get("componentCode", ""), sub.get("unit", "")), [0.0, 0.0, 0.0, 0])
+            entry[0] += total
+            entry[1] += total * _price(price.get("listPrice", 0))
+            entry[2] += total * _price(price.get("purchasePrice", 0))
+            entry[3] += 1
+            walk(sub, total)
+
+    for data in boms:
+        for node in data["nodes"]:
+            walk(node, 1.0)
+    return totals
+
+
+def export_frame(boms, as_text=False):
+    """Rijen zoals write_bom_excel ze voor de rollup bijhoudt, met een FOUT-regel ertussen."""
+    rows = []
+    for n, data in enumerate(boms):
+        rows += bom_json_to_rows(data, f"PSI{n}", f"Item {n}")
+        if n == 0:
+            rows.append(error_row("PSI-fout", "404"))
+    frame = pd.DataFrame([tuple(row[c] for c in ROLLUP_INPUT_COLUMNS) for row in rows],
+                         columns=ROLLUP_INPUT_COLUMNS)
+    # Zoals teruggelezen uit een export: alles tekst, "" voor leeg
+    return frame.astype(str) if as_text else frame
+
+
+def assert_matches_reference(rollup, expected):
+    assert list(rollup.columns) == ROLLUP_COLUMNS
+    got = {(row["Component"], row["Unit"]): row for row in rollup.to_dict("records")}
+    assert set(got) == set(expected)
+    for key, (quantity, list_price, purchase_price, count) in expected.items():
+        row = got[key]
+        assert row["Regels"] == count
+        assert row["Aantal"] == pytest.approx(quantity, rel=1e-9)
+        # Som van floats: op een halve cent na mag de afronding verschillen
+        assert float(row["ListPrice"].replace(",", ".")) == pytest.approx(list_price, abs=0.011)
+        assert float(row["PurchasePrice"].replace(",", ".")) == pytest.approx(purchase_price, abs=0.011)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("as_text", [False, True])
+def test_rollup_matches_reference(seed, as_text):
+    boms = [random_bom(seed * 10 + n, nodes=400, depth=25) for n in range(3)]
+    expected = reference_rollup(boms)
+    assert_matches_reference(bom_rollup(export_frame(boms, as_text)), expected)
+
+
+def test_rollup_empty_and_fractional_quantities():
+    data = {
+        "configuredProduct": {"code": "PRJ"},
+        "nodes": [{"type": "GROUP", "nodes": [
+            {"type": "BOM_ITEM", "componentCode": "A", "quantity": "", "unit": "pcs", "nodes": [
+                {"type": "BOM_ITEM", "componentCode": "B", "quantity": 0.5, "unit": "m",
+                 "price": {"listPrice": 10, "purchasePrice": 4}, "nodes": [
+                     {"type": "OPTION", "nodes": [
+                         {"type": "BOM_ITEM", "componentCode": "C", "quantity": 3.25, "unit": "kg", "nodes": []},
+                     ]},
+                 ]},
+            ]},
+            {"type": "BOM_ITEM", "componentCode": "B", "quantity": 2, "unit": "m",
+             "price": {"listPrice": 10, "purchasePrice": 4}, "nodes": []},
+        ]}],
+    }
+    rollup = bom_rollup(export_frame([data]))
+    got = {(row["Component"], row["Unit"]): row for row in rollup.to_dict("records")}
+    assert got[("A", "pcs")]["Aantal"] == 1.0
+    assert got[("B", "m")]["Aantal"] == 2.5
+    assert got[("B", "m")]["ListPrice"] == "25,00"
+    assert got[("B", "m")]["PurchasePrice"] == "10,00"
+    assert got[("C", "kg")]["Aantal"] == pytest.approx(1.625)
+    assert_matches_reference(rollup, reference_rollup([data]))
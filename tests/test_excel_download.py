@@ -0,0 +1,86 @@
+import io
+
+import pandas as pd
+import pytest
+
+import api_config
+from api_bomdiff import compare_boms_excel
+from api_companies import get_all_companies_excel
+from api_compare import compare_manufacturers_excel
+from api_excel import StreamingExcelWriter, spool_chunks
+from api_ExportBom import export_bom_selection_excel, export_bom_to_excel, iter_bom_csv
+from api_fetch import iter_project_segment_items_csv
+from api_file import iter_project_segments_csv
+from get_all_companies_excel import get_companies_for_distributor_excel
+from mock_hivecpq import MockData, MockHiveServer
+
+# Wat st.download_button als `data` aanvaardt (convert_data_to_bytes_and_infer_mime)
+DOWNLOAD_TYPES = (str, bytes, io.StringIO, io.BytesIO, io.TextIOWrapper, io.BufferedReader, io.RawIOBase)
+
+
+@pytest.fixture(scope="module")
+def server():
+    saved = {name: getattr(api_config, name) for name in (
+        "AUTH_DOMAIN", "CONNECT_BASE_URL", "API_BASE_URL", "BOM_SNAPSHOT_PATH", "BOM_CACHE_TTL"
+    )}
+    server = MockHiveServer(MockData(companies=30, segments=4)).start()
+    server.configure_clients()
+    api_config.configure(BOM_SNAPSHOT_PATH="", BOM_CACHE_TTL=0)
+    yield server
+    server.stop()
+    api_config.configure(**saved)
+
+
+def assert_downloadable(output, sheet="Sheet1"):
+    assert isinstance(output, DOWNLOAD_TYPES)
+    frame = pd.read_excel(output, sheet_name=sheet)
+    assert len(frame.columns)
+
+
+def test_writer_close_gives_download_type(tmp_path):
+    writer = StreamingExcelWriter()
+    writer.add_sheet("Sheet1", ["a", "b"])
+    writer.append("Sheet1", {"a": 1, "b": "x"})
+    output = writer.close(tmp_path / "kopie.xlsx")
+    assert_downloadable(output)
+    assert len(pd.read_excel(tmp_path / "kopie.xlsx")) == 1
+
+
+def test_exporters_give_download_type(server):
+    data = server.data
+    ids = [item["id"] for item in data.segment_items[:3]]
+    distributor_id = next(c["id"] for c in data.companies if c["companyType"] == "DISTRIBUTOR")
+
+    output, _, error = export_bom_to_excel("m", "c", "s", ids)
+    assert error is None
+    assert_downloadable(output)
+
+    output, _, error = export_bom_selection_excel("m", "c", "s", segment_ids=[data.segments[0]["id"]])
+    assert error is None
+    assert_downloadable(output)
+
+    output = get_all_companies_excel("m", "c", "s")
+    assert_downloadable(output, sheet=0)
+
+    output = get_companies_for_distributor_excel("m", "c", "s", distributor_id)
+    assert_downloadable(output, sheet=0)
+
+    output, _, error = compare_manufacturers_excel(["m", "n"], "c", "s")
+    assert error is None
+    assert_downloadable(output, sheet=0)
+
+    output, _, error = compare_boms_excel("m", "c", "s", old_segment_item_id=ids[0], new_segment_item_id=ids[1])
+    assert error is None
+    assert_downloadable(output, sheet="Nieuw")
+
+
+def test_csv_spool_gives_download_type(server):
+    ids = [item["id"] for item in server.data.segment_items[:3]]
+    for chunks in (
+        iter_bom_csv("m", "c", "s", ids, chunk_rows=50),
+        iter_project_segments_csv("m", "c", "s"),
+        iter_project_segment_items_csv("m", "c", "s"),
+    ):
+        output = spool_chunks(chunks)
+        assert isinstance(output, DOWNLOAD_TYPES)
+        assert len(pd.read_csv(output))